@@ -0,0 +1,71 @@
+"""Scaling benchmark of KBNGraph edge construction with a max cost.
+
+The max cost shrinks with the node count so that the expected degree stays constant,
+hence a linear build is expected. Run from the repository root:
+
+    python -m benchmarks.edge_build --sizes 1000 10000 100000 200000
+"""
+import argparse
+import math
+import time
+from typing import List
+
+import numpy as np
+
+from src.random_graph import RandomGraph
+from src.structures.graph import KBNGraph
+
+DEFAULT_SIZES = [1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000]
+
+
+def max_cost_for_degree(n: int, degree: float) -> float:
+    """Radius of the disk containing `degree` nodes on average in the unit square."""
+    return math.sqrt(degree / (math.pi * n))
+
+
+def time_edge_build(n: int, degree: float, random_seed: int = 42) -> dict:
+    random_graph = RandomGraph(n=2, random_seed=random_seed)
+    nodes_list = random_graph.gen_rand_node(n=n)
+    max_cost = max_cost_for_degree(n, degree)
+
+    t0 = time.perf_counter()
+    graph = KBNGraph(nodes_list, max_cost=max_cost)
+    duration = time.perf_counter() - t0
+
+    return {
+        "n": n,
+        "max_cost": max_cost,
+        "edges": len(graph.edges),
+        "duration_s": duration,
+        "us_per_node": duration / n * 1e6,
+    }
+
+
+def scaling_exponent(results: List[dict]) -> float:
+    """Slope of log(duration) against log(n). 1.0 means linear scaling."""
+    log_n = np.log([result["n"] for result in results])
+    log_t = np.log([result["duration_s"] for result in results])
+    return float(np.polyfit(log_n, log_t, 1)[0])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--degree", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'n':>8} {'max_cost':>10} {'edges':>10} {'time (s)':>10} {'us/node':>10}")
+    for n in args.sizes:
+        result = time_edge_build(n, args.degree)
+        results.append(result)
+        print(
+            f"{result['n']:>8} {result['max_cost']:>10.5f} {result['edges']:>10} "
+            f"{result['duration_s']:>10.3f} {result['us_per_node']:>10.2f}"
+        )
+    if len(results) > 1:
+        print(f"Scaling exponent: {scaling_exponent(results):.2f} (1.0 is linear)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Import time benchmark of the core modules, in fresh interpreters.
+
+The core (`Node`, graphs and the greedy solver) should only import NumPy: pandas, scipy and OSM support
+are loaded on first use. Exits with status 1 when a core module imports a heavy dependency or when
+the import is slower than `--max-seconds`. Run from the repository root:
+
+    python -m benchmarks.import_time --max-seconds 0.5
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List
+
+CORE_MODULES = [
+    "src.structures.node",
+    "src.structures.graph",
+    "src.structures.csr_graph",
+    "src.kbn",
+]
+HEAVY_MODULES = ["pandas", "scipy", "osmnx"]
+
+_MEASURE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+duration = time.perf_counter() - t0
+print(json.dumps({{"time_s": duration, "heavy_modules": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, repeat: int) -> Dict:
+    """Best import time of `module` over `repeat` fresh interpreters, and the heavy modules it loaded"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _MEASURE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output))
+    return {
+        "module": module,
+        "time_s": min(run["time_s"] for run in runs),
+        "heavy_modules": runs[0]["heavy_modules"],
+    }
+
+
+def check(results: List[Dict], max_seconds: float) -> List[str]:
+    failures = []
+    for result in results:
+        if result["heavy_modules"]:
+            failures.append(
+                f"{result['module']} imports {', '.join(result['heavy_modules'])}"
+            )
+        if result["time_s"] > max_seconds:
+            failures.append(
+                f"{result['module']} imports in {result['time_s']:.3f} s > {max_seconds} s"
+            )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=CORE_MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.repeat) for module in args.modules]
+    for result in results:
+        print(
+            f"{result['module']:>26} {result['time_s']:>8.4f} s "
+            f"heavy modules: {result['heavy_modules'] or 'none'}"
+        )
+    failures = check(results, args.max_seconds)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Micro-benchmark of the Node and Edge hot paths against the previous dataclass implementations.
+
+Measures the per-call cost of `Edge.get_dest_node`, `Edge.has_node` and `hash(Node)`, and the memory
+allocated per edge for the edges of a 10k nodes graph. Run from the repository root:
+
+    python -m benchmarks.node_edge --n 10000 --degree 10
+"""
+import argparse
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple, Type
+
+from benchmarks.edge_build import max_cost_for_degree
+from src.random_graph import RandomGraph
+from src.structures.edge import Edge
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+
+
+@dataclass
+class DataclassNode:
+    """Previous Node implementation, kept as reference"""
+
+    id: int
+    x: float
+    y: float
+    score: int
+    properties: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for prop_name, value in self.properties.items():
+            self.__setattr__(prop_name, value)
+
+    def __hash__(self):
+        return hash((self.id, self.x, self.y, self.score, *self.properties.values()))
+
+
+@dataclass
+class DataclassEdge:
+    """Previous Edge implementation, kept as reference"""
+
+    id: int
+    nodes: Tuple[Type[DataclassNode]]
+    cost: float
+
+    @property
+    def node_dict(self) -> Dict[int, DataclassNode]:
+        return {node.id: node for node in self.nodes}
+
+    def has_node(self, node_id: int) -> bool:
+        return node_id in [node.id for node in self.nodes]
+
+    def get_dest_node(self, origin_node_id: int) -> DataclassNode:
+        d = self.node_dict.copy()
+        del d[origin_node_id]
+        return list(d.values())[0]
+
+    def __hash__(self):
+        return hash((self.id, self.nodes[0], self.nodes[1], self.cost))
+
+
+def time_per_call(statement, number: int = 200_000) -> float:
+    """Best per-call duration in ns over 5 repeats"""
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e9
+
+
+def time_hot_paths(node_cls, edge_cls) -> Dict[str, float]:
+    properties = {"cat": "A", "num": 42, "name": "museum", "rating": 4.5}
+    node1 = node_cls(id=0, x=0.0, y=1.0, score=10, properties=dict(properties))
+    node2 = node_cls(id=1, x=1.0, y=0.0, score=20, properties=dict(properties))
+    edge = edge_cls(id=0, nodes=[node1, node2], cost=1.4)
+    return {
+        "get_dest_node": time_per_call(lambda: edge.get_dest_node(0)),
+        "has_node": time_per_call(lambda: edge.has_node(1)),
+        "hash(node)": time_per_call(lambda: hash(node1)),
+    }
+
+
+def memory_per_edge(node_cls, edge_cls, n: int, degree: float) -> Tuple[float, int]:
+    """Bytes allocated per edge for the nodes and edges objects of a graph of n nodes"""
+    nodes_list = RandomGraph(n=2, random_seed=42).gen_rand_node(n=n)
+    # Edges are found once on a tiny graph carrying the max cost, then built with both implementations
+    finder = KBNGraph(nodes_list[:2], max_cost=max_cost_for_degree(n, degree))
+    node1_idx, node2_idx, costs = finder._find_edges_with_max_cost(nodes_list)
+
+    tracemalloc.start()
+    nodes = [
+        node_cls(node.id, node.x, node.y, node.score, dict(node.properties))
+        for node in nodes_list
+    ]
+    edges = [
+        edge_cls(edge_id, [nodes[i], nodes[j]], cost)
+        for edge_id, (i, j, cost) in enumerate(
+            zip(node1_idx.tolist(), node2_idx.tolist(), costs.tolist())
+        )
+    ]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return allocated / len(edges), len(edges)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--degree", type=float, default=10.0)
+    args = parser.parse_args()
+
+    before = time_hot_paths(DataclassNode, DataclassEdge)
+    after = time_hot_paths(Node, Edge)
+    print(f"{'call':>14} {'dataclass (ns)':>15} {'slots (ns)':>11} {'speedup':>8}")
+    for name in before:
+        print(
+            f"{name:>14} {before[name]:>15.1f} {after[name]:>11.1f} "
+            f"{before[name] / after[name]:>8.2f}"
+        )
+
+    bytes_before, n_edges = memory_per_edge(
+        DataclassNode, DataclassEdge, args.n, args.degree
+    )
+    bytes_after, _ = memory_per_edge(Node, Edge, args.n, args.degree)
+    print(
+        f"Memory per edge ({args.n} nodes, {n_edges} edges, nodes included): "
+        f"{bytes_before:.0f} B with dataclasses, {bytes_after:.0f} B with slots"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Wall-clock benchmark of the parallel team orienteering groups against the sequential search.
+
+Both searches run on a CSRKBNGraph. The parallel one grows candidate groups in a process pool
+on a shared memory copy of the graph. Run from the repository root:
+
+    python -m benchmarks.parallel_groups --sizes 10000 50000 --n-groups 16 --workers 1 4 16
+"""
+import argparse
+import os
+import time
+
+from benchmarks.edge_build import max_cost_for_degree
+from src.kbn import get_groups_of_k_best_nodes_from_max_score
+from src.parallel import get_groups_of_k_best_nodes_parallel
+from src.random_graph import RandomGraph
+from src.structures.csr_graph import CSRKBNGraph
+
+
+def build_graph(n: int, degree: float, random_seed: int = 42) -> CSRKBNGraph:
+    nodes_list = RandomGraph(n=2, random_seed=random_seed).gen_rand_node(n=n)
+    return CSRKBNGraph(nodes_list, max_cost=max_cost_for_degree(n, degree))
+
+
+def time_groups(n: int, degree: float, total_k: int, n_groups: int, n_workers) -> dict:
+    graph = build_graph(n, degree)
+    t0 = time.perf_counter()
+    if n_workers is None:
+        groups = get_groups_of_k_best_nodes_from_max_score(
+            graph, total_k=total_k, n_groups=n_groups
+        )
+    else:
+        groups = get_groups_of_k_best_nodes_parallel(
+            graph, total_k=total_k, n_groups=n_groups, n_workers=n_workers
+        )
+    duration = time.perf_counter() - t0
+    return {
+        "n": n,
+        "workers": n_workers or "sequential",
+        "groups": len(groups),
+        "total_score": sum(node.score for group in groups for node in group),
+        "duration_s": duration,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--degree", type=float, default=30.0)
+    parser.add_argument("--n-groups", type=int, default=16)
+    parser.add_argument("--group-size", type=int, default=20)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1})
+    )
+    args = parser.parse_args()
+
+    total_k = args.n_groups * args.group_size
+    print(
+        f"{'n':>8} {'workers':>10} {'groups':>7} {'score':>8} {'time (s)':>9} {'speedup':>8}"
+    )
+    for n in args.sizes:
+        sequential = time_groups(n, args.degree, total_k, args.n_groups, None)
+        for result in [sequential] + [
+            time_groups(n, args.degree, total_k, args.n_groups, n_workers)
+            for n_workers in args.workers
+        ]:
+            speedup = sequential["duration_s"] / result["duration_s"]
+            print(
+                f"{result['n']:>8} {result['workers']:>10} {result['groups']:>7} "
+                f"{result['total_score']:>8} {result['duration_s']:>9.3f} {speedup:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Benchmark suite of graph construction, solving and initialisation on RandomGraph.
+
+Each case is timed (best of `--repeat` runs, on a fresh graph) and its peak memory is measured with
+tracemalloc in a separate run. Run from the repository root:
+
+    python -m benchmarks.suite run --output benchmarks/results.json
+    python -m benchmarks.suite compare benchmarks/baseline.json benchmarks/results.json
+
+`compare` exits with status 1 when a case is slower, uses more memory or fails compared to the baseline,
+beyond relative thresholds, or when a case of the baseline is missing from the results.
+Store a baseline by copying the results of a run on the reference commit, on the same machine.
+"""
+import argparse
+import itertools
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.contraints.categorical_ratio import FlexibleCategoricalRatioConstraint
+from src.initialisations import from_closest_node
+from src.kbn import get_groups_of_k_best_nodes_from_max_score, get_k_best_nodes
+from src.random_graph import RandomGraph
+
+DEFAULT_SIZES = [500, 1_000, 2_000]
+DEFAULT_MAX_COSTS = [0.05, 0.1]
+QUERY_POINTS = 100
+
+# A case returns a setup function building its inputs, and the function to benchmark
+Case = Callable[[int, float, bool], Tuple[Callable, Callable]]
+
+
+def _graph(n: int, max_cost: float, with_properties: bool) -> RandomGraph:
+    return RandomGraph(
+        n=n, max_cost=max_cost, with_properties=with_properties, random_seed=42
+    )
+
+
+def build_case(n: int, max_cost: float, with_properties: bool):
+    return lambda: None, lambda _: _graph(n, max_cost, with_properties)
+
+
+def k_best_nodes_case(n: int, max_cost: float, with_properties: bool):
+    def setup():
+        graph = _graph(n, max_cost, with_properties)
+        return graph, graph.get_node_with_max_score()
+
+    def run(inputs):
+        graph, first_node = inputs
+        return get_k_best_nodes(graph, first_node, k=10)
+
+    return setup, run
+
+
+def groups_case(n: int, max_cost: float, with_properties: bool):
+    def run(graph):
+        return get_groups_of_k_best_nodes_from_max_score(graph, total_k=30, n_groups=3)
+
+    return lambda: _graph(n, max_cost, with_properties), run
+
+
+def constrained_groups_case(n: int, max_cost: float, with_properties: bool):
+    if not with_properties:
+        return None
+
+    def setup():
+        graph = _graph(n, max_cost, with_properties)
+        constraint = FlexibleCategoricalRatioConstraint(
+            "cat", {"A": 0.5, "B": 0.3, "C": 0.2}, graph, 10
+        )
+        return graph, constraint
+
+    def run(inputs):
+        graph, constraint = inputs
+        return get_groups_of_k_best_nodes_from_max_score(
+            graph, total_k=30, n_groups=3, constraints=[constraint]
+        )
+
+    return setup, run
+
+
+def closest_node_case(n: int, max_cost: float, with_properties: bool):
+    def setup():
+        points = np.random.default_rng(0).random((QUERY_POINTS, 2))
+        return _graph(n, max_cost, with_properties), points.tolist()
+
+    def run(inputs):
+        graph, points = inputs
+        return [from_closest_node(graph, x, y) for x, y in points]
+
+    return setup, run
+
+
+CASES: Dict[str, Case] = {
+    "build": build_case,
+    "get_k_best_nodes": k_best_nodes_case,
+    "groups": groups_case,
+    "groups_constrained": constrained_groups_case,
+    "from_closest_node": closest_node_case,
+}
+
+
+def measure(setup: Callable, run: Callable, repeat: int) -> Dict[str, float]:
+    durations = []
+    for _ in range(repeat):
+        inputs = setup()
+        t0 = time.perf_counter()
+        run(inputs)
+        durations.append(time.perf_counter() - t0)
+
+    inputs = setup()
+    tracemalloc.start()
+    run(inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time_s": min(durations), "peak_memory_mb": peak / 2**20}
+
+
+def run_suite(
+    sizes: List[int],
+    max_costs: List[float],
+    repeat: int,
+    cases: Optional[List[str]] = None,
+) -> List[dict]:
+    results = []
+    for name, n, max_cost, with_properties in itertools.product(
+        cases or CASES, sizes, max_costs, [False, True]
+    ):
+        case = CASES[name](n, max_cost, with_properties)
+        if case is None:
+            continue
+        result = {
+            "case": name,
+            "n": n,
+            "max_cost": max_cost,
+            "with_properties": with_properties,
+        }
+        try:
+            result.update(measure(*case, repeat=repeat))
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        print(_format_result(result), flush=True)
+        results.append(result)
+    return results
+
+
+def _label(result: dict) -> str:
+    return (
+        f"{result['case']:>20} n={result['n']:<6} max_cost={result['max_cost']:<5} "
+        f"props={result['with_properties']!s:<5}"
+    )
+
+
+def _format_result(result: dict) -> str:
+    if "error" in result:
+        return f"{_label(result)} ERROR {result['error']}"
+    return (
+        f"{_label(result)} {result['time_s']:>9.4f} s "
+        f"{result['peak_memory_mb']:>9.2f} MB"
+    )
+
+
+def metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def _key(result: dict) -> tuple:
+    return result["case"], result["n"], result["max_cost"], result["with_properties"]
+
+
+def compare(
+    baseline: List[dict],
+    results: List[dict],
+    time_threshold: float = 0.2,
+    memory_threshold: float = 0.1,
+    min_time_delta: float = 0.005,
+    min_memory_delta: float = 1.0,
+) -> List[str]:
+    """
+    Regressions of `results` against `baseline`: cases slower by more than `time_threshold`,
+    using more than `memory_threshold` additional peak memory, failing, or missing from the results.
+    Thresholds are relative to the baseline values. Differences below `min_time_delta` seconds and
+    `min_memory_delta` MB are considered as noise.
+    """
+    baseline_by_key = {_key(result): result for result in baseline}
+    results_keys = {_key(result) for result in results}
+    regressions = [
+        f"{_label(reference).strip()}: missing from the results"
+        for key, reference in baseline_by_key.items()
+        if key not in results_keys
+    ]
+    for result in results:
+        reference = baseline_by_key.get(_key(result))
+        if reference is None:
+            continue
+        label = _label(result).strip()
+        if "error" in result:
+            if "error" not in reference:
+                regressions.append(f"{label}: fails with {result['error']}")
+            continue
+        if "error" in reference:
+            continue
+        for metric, threshold, min_delta in [
+            ("time_s", time_threshold, min_time_delta),
+            ("peak_memory_mb", memory_threshold, min_memory_delta),
+        ]:
+            ratio = result[metric] / reference[metric] if reference[metric] else 1.0
+            if ratio > 1 + threshold and result[metric] - reference[metric] > min_delta:
+                regressions.append(
+                    f"{label}: {metric} {reference[metric]:.4f} -> {result[metric]:.4f} (x{ratio:.2f})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the suite and save its results")
+    run_parser.add_argument("--output", default="benchmarks/results.json")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument(
+        "--max-costs", type=float, nargs="+", default=DEFAULT_MAX_COSTS
+    )
+    run_parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    run_parser.add_argument("--repeat", type=int, default=5)
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Flag the regressions of results against a baseline"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--time-threshold", type=float, default=0.2)
+    compare_parser.add_argument("--memory-threshold", type=float, default=0.1)
+    compare_parser.add_argument("--min-time-delta", type=float, default=0.005)
+    compare_parser.add_argument("--min-memory-delta", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        # Dead ends of the greedy search are logged as warnings
+        logging.disable(logging.WARNING)
+        results = run_suite(args.sizes, args.max_costs, args.repeat, args.cases)
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata(), "results": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.results) as f:
+        results = json.load(f)["results"]
+    regressions = compare(
+        baseline,
+        results,
+        args.time_threshold,
+        args.memory_threshold,
+        args.min_time_delta,
+        args.min_memory_delta,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) over {len(results)} cases")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
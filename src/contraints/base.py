@@ -1,6 +1,10 @@
+import copy
 from abc import ABC, abstractmethod
-from typing import Type
+from typing import Sequence, Type
 
+import numpy as np
+
+from src.structures.abc import BaseKBNGraph
 from src.structures.node import Node
 
 
@@ -9,8 +13,22 @@ class BaseConstraint(ABC):
     def penalize_score(self, node: Type[Node]) -> float:
         ...
 
+    def penalize_scores(
+        self, graph: BaseKBNGraph, node_ids: Sequence[int]
+    ) -> np.ndarray:
+        """Penalized scores of the nodes `node_ids` of `graph`.
+        Override it with a vectorized implementation of `penalize_score`."""
+        return np.array(
+            [self.penalize_score(graph.nodes[node_id]) for node_id in node_ids],
+            dtype=float,
+        )
+
     def update_state(self, added_node: Type[Node]) -> None:
         pass
 
     def revert_state(self, node_to_remove: Type[Node]) -> None:
         pass
+
+    def clone(self) -> "BaseConstraint":
+        """Independent copy of the constraint and its state"""
+        return copy.deepcopy(self)
@@ -1,13 +1,22 @@
-from typing import Any, Dict, List, Type
+import copy
+from typing import Any, Dict, List, Sequence, Type
 
-import pandas as pd
+import numpy as np
 
 from src.contraints.base import BaseConstraint
+from src.contraints.stats import compute_category_stats, get_category_stats
 from src.structures.graph import KBNGraph
 from src.structures.node import Node
 
 
 class FlexibleCategoricalRatioConstraint(BaseConstraint):
+    """
+    Categories are handled through their integer code, their position in `objectives`.
+    Category means and the code and score of each node are computed once per graph and shared with the other
+    constraints on the same property (see `get_category_stats`): an instance only holds its counters,
+    so candidates are penalized in one vectorized pass and creating a constraint is O(#categories).
+    """
+
     def __init__(
         self, property_name: str, objectives: Dict[Any, float], graph: KBNGraph, k: int
     ):
@@ -17,45 +26,102 @@ class FlexibleCategoricalRatioConstraint(BaseConstraint):
             cat: int(obj * k) for cat, obj in self.objectives.items()
         }
         self.k = k
-        self.category_counts = {cat: 0 for cat in objectives}
-        self.category_means = self.compute_category_means(graph)
+        self.categories: List[Any] = list(objectives)
+        self._codes = {cat: code for code, cat in enumerate(self.categories)}
+        self._objectives_counts = np.array(
+            [self.objectives_counts[cat] for cat in self.categories]
+        )
+        self._counts = np.zeros(len(self.categories), dtype=int)
+
+        self.stats = get_category_stats(graph, property_name)
+        self._means = np.array(
+            [
+                self.stats.means[self.stats.codes[cat]]
+                if cat in self.stats.codes
+                else np.nan
+                for cat in self.categories
+            ]
+        )
+        # Code of each category of the stats in the objectives, -1 when it has no objective.
+        # The last value is the one of the nodes without category.
+        self._objective_codes = np.array(
+            [self._codes.get(cat, -1) for cat in self.stats.categories] + [-1],
+            dtype=np.intp,
+        )
+
+    @property
+    def category_means(self) -> Dict[Any, float]:
+        return self.stats.means_by_category
+
+    @property
+    def category_counts(self) -> Dict[Any, int]:
+        return dict(zip(self.categories, self._counts.tolist()))
+
+    @category_counts.setter
+    def category_counts(self, category_counts: Dict[Any, int]) -> None:
+        self._counts = np.array([category_counts[cat] for cat in self.categories])
 
     @property
     def completion_state(self) -> Dict[str, float]:
-        return {
-            cat: round(count / self.objectives_counts[cat], 4)
-            if self.objectives_counts[cat] != 0
-            else 1.0
-            for cat, count in self.category_counts.items()
-        }
+        return dict(zip(self.categories, self._completion_ratios().tolist()))
+
+    def _completion_ratios(self) -> np.ndarray:
+        ratios = np.ones(len(self.categories))
+        has_objective = self._objectives_counts != 0
+        ratios[has_objective] = np.round(
+            self._counts[has_objective] / self._objectives_counts[has_objective], 4
+        )
+        return ratios
 
     def update_state(self, added_node: Node) -> None:
         category = added_node.properties.get(self.property_name)
         if category is not None:
-            self.category_counts[category] += 1
+            self._counts[self._codes[category]] += 1
 
     def revert_state(self, node_to_remove: Type[Node]) -> None:
         category = node_to_remove.properties.get(self.property_name)
         if category is not None:
-            self.category_counts[category] -= 1
+            self._counts[self._codes[category]] -= 1
+
+    def clone(self) -> "FlexibleCategoricalRatioConstraint":
+        """Copy with an independent state, sharing the read-only stats"""
+        constraint = copy.copy(self)
+        constraint._counts = self._counts.copy()
+        return constraint
 
     def compute_category_means(self, graph: KBNGraph) -> Dict[Any, float]:
-        df_category = pd.DataFrame(
-            [
-                [node.properties.get(self.property_name), node.score]
-                for node in graph.nodes.values()
-            ],
-            columns=[self.property_name, "score"],
-        )
-        df_cat_means = df_category.groupby([self.property_name]).agg("mean").round(2)
-        return df_cat_means.to_dict()["score"]
+        return compute_category_stats(graph, self.property_name).means_by_category
+
+    def _code_of(self, node: Node) -> int:
+        return self._codes.get(node.properties[self.property_name], -1)
 
     def penalize_score(self, candidate: Node) -> float:
         """Translate categories values with their ratio of completion.
         This approach preserves High potential values and enable categorical ratio constraints to be unfilled
         """
-        category = candidate.properties[self.property_name]
-        score = candidate.score
-        penalization = self.category_means[category] * self.completion_state[category]
-        penalized_score = score - penalization
-        return round(penalized_score, 2) if penalized_score > 0 else 0
+        codes = np.array([self._code_of(candidate)])
+        return self._penalize(codes, np.array([candidate.score], dtype=float))[0].item()
+
+    def penalize_scores(self, graph: KBNGraph, node_ids: Sequence[int]) -> np.ndarray:
+        node_positions = self.stats.node_positions
+        positions = np.fromiter(
+            (node_positions.get(node_id, -1) for node_id in node_ids),
+            dtype=np.intp,
+            count=len(node_ids),
+        )
+        codes = self._objective_codes[self.stats.node_codes[positions]]
+        scores = self.stats.node_scores[positions]
+        # Nodes unknown when the stats were computed
+        for i in np.flatnonzero(positions < 0).tolist():
+            node = graph.nodes[node_ids[i]]
+            codes[i], scores[i] = self._code_of(node), node.score
+        return self._penalize(codes, scores)
+
+    def _penalize(self, codes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        if (codes < 0).any():
+            raise KeyError(
+                f"Candidates {self.property_name} must be one of {self.categories}."
+            )
+        penalizations = self._means[codes] * self._completion_ratios()[codes]
+        penalized_scores = scores - penalizations
+        return np.where(penalized_scores > 0, np.round(penalized_scores, 2), 0.0)
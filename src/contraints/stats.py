@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node_table import NodeTable
+
+# Stats by property name, with the `nodes_version` of the graph they were computed on
+_STATS_BY_GRAPH: "WeakKeyDictionary[KBNGraph, Tuple[int, Dict[str, CategoryStats]]]" = (
+    WeakKeyDictionary()
+)
+
+
+@dataclass(frozen=True)
+class CategoryStats:
+    """
+    Statistics of the categories of a node property, shared read-only by the constraints of a graph.
+
+    Categories are encoded by their position in `categories`. `node_codes` and `node_scores` hold the code
+    and score of the node at each position of `node_positions`, -1 for the nodes without category.
+    Counts and means only cover the nodes active when the stats are computed. Means are rounded to 2 decimals
+    and are NaN for the categories without active node.
+    """
+
+    property_name: str
+    categories: List[Any]
+    codes: Dict[Any, int]
+    counts: np.ndarray
+    means: np.ndarray
+    node_positions: Mapping[int, int]
+    node_codes: np.ndarray
+    node_scores: np.ndarray
+
+    @property
+    def means_by_category(self) -> Dict[Any, float]:
+        return {
+            category: mean
+            for category, mean, count in zip(
+                self.categories, self.means.tolist(), self.counts.tolist()
+            )
+            if count
+        }
+
+
+def get_category_stats(graph: KBNGraph, property_name: str) -> CategoryStats:
+    """
+    Category stats of `property_name` over `graph`, computed on the first call then shared.
+    The stats are cached as long as the graph exists. They are computed again once nodes are added to
+    or removed from the graph, but not after deactivations: counts and means stay the ones of the nodes
+    active on the first call. Changes of the nodes scores or properties made in place require
+    `invalidate_category_stats`. Constraints keep the stats they were created with.
+    """
+    version, stats_by_property = _STATS_BY_GRAPH.get(graph, (None, None))
+    if version != graph.nodes_version:
+        stats_by_property = {}
+        _STATS_BY_GRAPH[graph] = graph.nodes_version, stats_by_property
+    stats = stats_by_property.get(property_name)
+    if stats is None:
+        stats = stats_by_property[property_name] = compute_category_stats(
+            graph, property_name
+        )
+    return stats
+
+
+def invalidate_category_stats(graph: KBNGraph) -> None:
+    """Drop the cached category stats of `graph`, for all properties"""
+    _STATS_BY_GRAPH.pop(graph, None)
+
+
+def compute_category_stats(graph: KBNGraph, property_name: str) -> CategoryStats:
+    node_positions, values, scores, active = _property_columns(graph, property_name)
+    categories, node_codes = _encode(values)
+    node_scores = np.asarray(scores, dtype=float)
+
+    counted = active & (node_codes >= 0)
+    counts = np.bincount(node_codes[counted], minlength=len(categories))
+    sums = np.bincount(
+        node_codes[counted], weights=node_scores[counted], minlength=len(categories)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.round(sums / counts, 2)
+
+    for array in (counts, means, node_codes, node_scores):
+        array.flags.writeable = False
+    return CategoryStats(
+        property_name=property_name,
+        categories=categories,
+        codes={category: code for code, category in enumerate(categories)},
+        counts=counts,
+        means=means,
+        node_positions=node_positions,
+        node_codes=node_codes,
+        node_scores=node_scores,
+    )
+
+
+def _property_columns(
+    graph: KBNGraph, property_name: str
+) -> Tuple[Mapping[int, int], Sequence[Any], np.ndarray, np.ndarray]:
+    """Positions of the nodes ids, property values, scores and active mask of the nodes of the graph"""
+    if isinstance(graph, CSRKBNGraph):
+        table = graph._nodes_list
+        if isinstance(table, NodeTable) and property_name in table.properties:
+            values = table.properties[property_name]
+        else:
+            values = [node.properties.get(property_name) for node in table]
+        return graph._index, values, graph.scores, graph.active
+
+    nodes = list(graph.nodes.values())
+    return (
+        {node.id: position for position, node in enumerate(nodes)},
+        [node.properties.get(property_name) for node in nodes],
+        np.array([node.score for node in nodes], dtype=float),
+        np.ones(len(nodes), dtype=bool),
+    )
+
+
+def _encode(values: Sequence[Any]) -> Tuple[List[Any], np.ndarray]:
+    """Categories of `values` and the code of each value, -1 for None"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "biuUS":
+        categories, codes = np.unique(values, return_inverse=True)
+        return categories.tolist(), codes.astype(np.intp)
+
+    codes_by_category: Dict[Any, int] = {}
+    codes = np.fromiter(
+        (
+            -1
+            if value is None
+            else codes_by_category.setdefault(value, len(codes_by_category))
+            for value in values
+        ),
+        dtype=np.intp,
+        count=len(values),
+    )
+    return list(codes_by_category), codes
@@ -23,3 +23,10 @@ def revert_constraints_for_all(
 ) -> None:
     for node in nodes_to_remove:
         revert_constraints(constraints, node)
+
+
+def update_constraints_for_all(
+    constraints: List[Type[BaseConstraint]], selected_nodes: List[Type[Node]]
+) -> None:
+    for node in selected_nodes:
+        update_constraints(constraints, node)
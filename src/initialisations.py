@@ -1,4 +1,7 @@
-from src.spatial.find import get_closest_node_id
+from typing import List, Optional
+
+import numpy as np
+
 from src.structures.graph import KBNGraph
 from src.structures.node import Node
 
@@ -8,7 +11,12 @@ def from_node_with_max_score(graph: KBNGraph) -> Node:
 
 
 def from_closest_node(graph: KBNGraph, x: float, y: float) -> Node:
-    nodes_coords_df = graph.coordinates()
-    closest_node_id = get_closest_node_id(coordinates=nodes_coords_df, x=x, y=y)
-    node = graph.nodes[closest_node_id]
-    return node
+    return graph.get_closest_node(x, y)
+
+
+def from_closest_nodes(graph: KBNGraph, points: np.ndarray) -> List[Optional[Node]]:
+    """Closest active node of each (x, y) point, None when the graph has no active node"""
+    return [
+        graph.nodes[node_id] if node_id is not None else None
+        for node_id in graph.get_closest_nodes_ids(points)
+    ]
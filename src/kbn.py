@@ -1,59 +1,115 @@
 import logging
-import time
-from typing import List, Optional, Type
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Set, Tuple, Type
+
+import numpy as np
 
 from src.contraints.base import BaseConstraint
-from src.contraints.update import revert_constraints_for_all, update_constraints
+from src.contraints.update import (
+    revert_constraints_for_all,
+    update_constraints,
+    update_constraints_for_all,
+)
+from src.local_search import improve_chain, improve_chains
 from src.structures.graph import KBNGraph, Node
+from src.utils.profiling import (
+    CONSTRAINT_PENALTIES,
+    REGIONAL_SCORES,
+    SOLVE,
+    increment,
+    timed,
+    timer,
+)
 
 logger = logging.getLogger(__name__)
 
 
-def get_k_best_nodes(graph: KBNGraph, first_node: Node, k: int = 10) -> List[Node]:
-    """Return the best chain of k nodes. Starting with the node of max score"""
+@timed(SOLVE)
+def get_k_best_nodes(
+    graph: KBNGraph,
+    first_node: Node,
+    k: int = 10,
+    beam_width: Optional[int] = None,
+    local_search: bool = False,
+) -> List[Node]:
+    """Return the best chain of k nodes. Starting with the node of max score.
+    With a `beam_width`, the chain is found by `find_next_best_neighbors_beam` and the graph is not modified.
+    With `local_search`, the chain is reordered from `first_node` to lower its travel cost (see `improve_chain`).
+    """
     # TODO: Add initialisation methods
     # - Start_node = Node with Max Score
     # - Best regional score
-    k_best_nodes_list = find_next_best_neighbors(graph, [first_node], k - 1)
+    if beam_width is not None:
+        k_best_nodes_list = find_next_best_neighbors_beam(
+            graph, [first_node], k - 1, beam_width=beam_width
+        )
+    else:
+        k_best_nodes_list = find_next_best_neighbors(graph, [first_node], k - 1)
+    if local_search:
+        k_best_nodes_list, _ = improve_chain(graph, k_best_nodes_list)
     return k_best_nodes_list
 
 
+def dispatch_k(total_k: int, n_groups: int) -> List[int]:
+    """Split `total_k` nodes in `n_groups` group sizes differing at most by one"""
+    base, rest = total_k // n_groups, total_k % n_groups
+    k_values = [base for _ in range(n_groups)]
+    for i in range(rest):
+        k_values[i % n_groups] += 1
+    return k_values
+
+
+@timed(SOLVE)
 def get_groups_of_k_best_nodes_from_max_score(
     graph: KBNGraph,
     total_k: int = 10,
     n_groups: int = 5,
     constraints: List[BaseConstraint] = [],
     max_iter: Optional[int] = None,
+    beam_width: Optional[int] = None,
+    local_search: bool = False,
 ) -> List[List[Type[Node]]]:
-    def dispatch_k(total_k, n_groups) -> List[int]:
-        base, rest = total_k // n_groups, total_k % n_groups
-        k_values = [base for _ in range(n_groups)]
-        for i in range(rest):
-            k_values[i % n_groups] += 1
-        return k_values
-
+    """With `local_search`, each group is reordered from its first node to lower its travel cost"""
     results = []
     k_values = dispatch_k(total_k, n_groups)
     i = 0
     max_iter = max_iter if max_iter is not None else n_groups * 3
-    while len(results) < n_groups or i < max_iter:
-        logger.info(f"Starting optimisation for group {i+1}")
+    while len(results) < n_groups and i < max_iter:
+        logger.info("Starting optimisation for group %d", i + 1)
+        k = k_values[len(results)]
         candidates = get_k_best_nodes_from_max_score(
-            graph, k=k_values[len(results)], constraints=constraints
+            graph, k=k, constraints=constraints, beam_width=beam_width
         )
-        if len(candidates) == k_values[i]:
+        if len(candidates) == k:
             results.append(candidates)
         else:
             revert_constraints_for_all(constraints, candidates)
         i += 1
+    if local_search:
+        results = [nodes for nodes, _ in improve_chains(graph, results)]
     return results
 
 
 def get_k_best_nodes_from_max_score(
-    graph: KBNGraph, k: int = 10, constraints: List[BaseConstraint] = []
+    graph: KBNGraph,
+    k: int = 10,
+    constraints: List[BaseConstraint] = [],
+    beam_width: Optional[int] = None,
 ) -> List[Type[Node]]:
     best_node = graph.get_node_with_max_score()
-    k_best_nodes_list = find_next_best_neighbors(graph, [best_node], k - 1, constraints)
+    if beam_width is None:
+        return find_next_best_neighbors(graph, [best_node], k - 1, constraints)
+
+    k_best_nodes_list = find_next_best_neighbors_beam(
+        graph, [best_node], k - 1, constraints, beam_width=beam_width
+    )
+    # Same side effects than the greedy search: the last node of an incomplete chain stays active
+    nodes_to_deactivate = (
+        k_best_nodes_list if len(k_best_nodes_list) == k else k_best_nodes_list[:-1]
+    )
+    for node in nodes_to_deactivate:
+        graph.deactivate_node(node.id)
+    update_constraints_for_all(constraints, k_best_nodes_list)
     return k_best_nodes_list
 
 
@@ -67,12 +123,10 @@ def find_next_best_neighbors(
     last_node = selected_nodes[-1]
     update_constraints(constraints, last_node)
 
-    t0 = time.time()
     next_node = get_neighboor_with_max_regional_score(
         graph, last_node.id, node_count_to_add, constraints
     )
-    logger.info("Node selection duration:", round(time.time() - t0, 2), "s")
-    logger.info("Node selected:", next_node)
+    logger.debug("Node selected: %s", next_node)
     if next_node is not None:
         selected_nodes.append(next_node)
         graph.deactivate_node(last_node.id)
@@ -88,24 +142,100 @@ def find_next_best_neighbors(
     return selected_nodes
 
 
+def find_next_best_neighbors_beam(
+    graph: KBNGraph,
+    selected_nodes: List[Node],
+    node_count_to_add: int,
+    constraints: List[BaseConstraint] = [],
+    beam_width: int = 1,
+) -> List[Node]:
+    """
+    Iterative beam search variant of `find_next_best_neighbors`.
+    The `beam_width` best partial chains are kept at each step, ranked by the sum of the scores of their
+    selected nodes. Each chain tracks its own visited nodes and constraints states: neither the graph
+    nor the given constraints are modified.
+    With a beam width of 1, the chain is the one selected by `find_next_best_neighbors`.
+    """
+    if beam_width < 1:
+        raise ValueError(f"Beam width must be a positive integer, got {beam_width}.")
+
+    first_chain = _Chain(
+        nodes=list(selected_nodes),
+        visited=frozenset(),
+        constraints=[constraint.clone() for constraint in constraints],
+    )
+    update_constraints(first_chain.constraints, first_chain.nodes[-1])
+
+    beams = [first_chain]
+    for node_count in range(node_count_to_add, 0, -1):
+        expansions = []
+        for chain_rank, chain in enumerate(beams):
+            last_node = chain.nodes[-1]
+            neighbors_ids, scores = score_neighbors(
+                graph, last_node.id, node_count, chain.constraints, chain.visited
+            )
+            candidates = [
+                (chain.score + score, score, chain_rank, neighbor_id)
+                for neighbor_id, score in zip(neighbors_ids, scores.tolist())
+                if score > 0
+            ]
+            if not candidates:
+                # As the greedy search, the chain is kept and retried with fewer nodes to compare
+                candidates = [(chain.score, -np.inf, chain_rank, None)]
+            expansions.extend(candidates)
+
+        # Best total first, then best step score. The sort is stable: ties keep the first neighbor
+        expansions.sort(key=lambda expansion: (-expansion[0], -expansion[1]))
+        beams = [
+            beams[chain_rank].extend(graph.nodes[neighbor_id], total_score)
+            if neighbor_id is not None
+            else beams[chain_rank]
+            for total_score, _, chain_rank, neighbor_id in expansions[:beam_width]
+        ]
+
+    best_chain = max(beams, key=lambda chain: (len(chain.nodes), chain.score))
+    return best_chain.nodes
+
+
+@dataclass
+class _Chain:
+    nodes: List[Node]
+    visited: FrozenSet[int]
+    constraints: List[BaseConstraint]
+    score: float = 0.0
+
+    def extend(self, node: Node, score: float) -> "_Chain":
+        constraints = [constraint.clone() for constraint in self.constraints]
+        update_constraints(constraints, node)
+        return _Chain(
+            nodes=self.nodes + [node],
+            visited=self.visited | {self.nodes[-1].id},
+            constraints=constraints,
+            score=score,
+        )
+
+
 def get_neighboor_with_max_regional_score(
     graph: KBNGraph,
     node_id: int,
     amount_of_neighbors_to_compare: int,
     constraints: List[BaseConstraint] = [],
+    excluded_node_ids_list: Optional[List[int]] = None,
 ) -> Optional[Node]:
 
-    edges_ids = graph.neighborhood[node_id]
-    neigh_edges = [graph.edges[e_id] for e_id in edges_ids]
-    best_neighbor = None
-    best_score = 0
+    neighbors_ids, scores = score_neighbors(
+        graph,
+        node_id,
+        amount_of_neighbors_to_compare,
+        constraints,
+        set(excluded_node_ids_list) if excluded_node_ids_list else None,
+    )
 
-    for edge in neigh_edges:
-        node = edge.get_dest_node(node_id)
-        score = compute_score(graph, node, amount_of_neighbors_to_compare, constraints)
-        if score > best_score:
-            best_score = score
-            best_neighbor = node
+    best_neighbor = None
+    if len(scores):
+        best_idx = int(np.argmax(scores))
+        if scores[best_idx] > 0:
+            best_neighbor = graph.nodes[neighbors_ids[best_idx]]
 
     if best_neighbor is None:
         logger.warning("No neighbor found to pursue graph exploration.")
@@ -113,6 +243,33 @@ def get_neighboor_with_max_regional_score(
     return best_neighbor
 
 
+def score_neighbors(
+    graph: KBNGraph,
+    node_id: int,
+    amount_of_neighbors_to_compare: int,
+    constraints: List[BaseConstraint] = [],
+    excluded_node_ids: Optional[Set[int]] = None,
+) -> Tuple[List[int], np.ndarray]:
+    """Scores of the neighbors of a node: their regional scores penalized by the constraints.
+    Nodes in `excluded_node_ids` are ignored as if they were deactivated."""
+    with timer(REGIONAL_SCORES):
+        neighbors_ids, scores = graph.get_neighbors_regional_scores(
+            node_id, amount_of_neighbors_to_compare, excluded_node_ids
+        )
+    increment("regional_score_evaluations", len(neighbors_ids))
+    if not constraints:
+        return neighbors_ids, scores
+    with timer(CONSTRAINT_PENALTIES):
+        penalized_scores = [
+            constraint.penalize_scores(graph, neighbors_ids)
+            for constraint in constraints
+        ]
+        # As `penalize_regional_score`, the worst score of each neighbor is kept
+        scores = np.min([scores, *penalized_scores], axis=0)
+    increment("constraint_penalties", len(neighbors_ids) * len(constraints))
+    return neighbors_ids, scores
+
+
 def compute_score(
     graph: KBNGraph,
     node: Node,
@@ -122,6 +279,12 @@ def compute_score(
     regional_score = graph.get_node_regional_score(
         node.id, amount_of_neighbors_to_compare
     )
+    return penalize_regional_score(regional_score, node, constraints)
+
+
+def penalize_regional_score(
+    regional_score: float, node: Node, constraints: List[BaseConstraint] = []
+) -> float:
     scores = [regional_score]
     for constraint in constraints:
         scores.append(constraint.penalize_score(node))
@@ -0,0 +1,154 @@
+from functools import lru_cache
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from src.metrics.distances import pairwise_distances
+from src.structures.graph import KBNGraph, Node
+
+# Moves improving the cost by less than this tolerance are ignored, so that rounding errors can not cycle
+IMPROVEMENT_TOLERANCE = 1e-9
+OR_OPT_SEGMENT_LENGTHS = (1, 2, 3)
+
+
+def chain_cost(graph: KBNGraph, nodes: Sequence[Node]) -> float:
+    """Travel cost of visiting `nodes` in order, with the distance and edge cost offset of the graph"""
+    costs = _cost_matrix(graph, nodes)
+    return float(costs[np.arange(len(nodes) - 1), np.arange(1, len(nodes))].sum())
+
+
+def improve_chain(
+    graph: KBNGraph,
+    nodes: Sequence[Node],
+    fixed_start: bool = True,
+    max_iterations: int = 1000,
+) -> Tuple[List[Node], float]:
+    """
+    Reorder a chain of nodes to lower its travel cost with 2-opt and or-opt moves, and return it with its cost.
+    The chain is an open path: its last node is free, and so is its first node without `fixed_start`.
+
+    Each iteration evaluates every 2-opt move (reversal of a segment) and every or-opt move (a segment
+    of 1 to 3 nodes moved elsewhere, in either direction) at once with NumPy over the distance matrix
+    of the chain, and applies the best one, until no move lowers the cost.
+    """
+    nodes = list(nodes)
+    if len(nodes) < 3:
+        return nodes, chain_cost(graph, nodes)
+
+    # The free ends are linked to a dummy node at no cost, so that the chain is a path between fixed ends
+    n = len(nodes)
+    costs = np.zeros((n + 2, n + 2))
+    costs[1:-1, 1:-1] = _cost_matrix(graph, nodes)
+    path = np.arange(n + 2)
+    if fixed_start:
+        costs, path = costs[1:, 1:], path[:-1]
+
+    for _ in range(max_iterations):
+        path_costs = costs[np.ix_(path, path)]
+        delta, move = _best_two_opt(path_costs)
+        or_opt_delta, or_opt_move = _best_or_opt(path_costs)
+        if or_opt_delta < delta:
+            delta, move = or_opt_delta, or_opt_move
+        if delta >= -IMPROVEMENT_TOLERANCE:
+            break
+        path = move(path)
+
+    if not fixed_start:
+        path = path[1:]
+    positions = path[:-1] - (0 if fixed_start else 1)
+    ordered_nodes = [nodes[i] for i in positions.tolist()]
+    return ordered_nodes, chain_cost(graph, ordered_nodes)
+
+
+def improve_chains(
+    graph: KBNGraph, chains: Sequence[Sequence[Node]], fixed_start: bool = True
+) -> List[Tuple[List[Node], float]]:
+    """`improve_chain` applied to each chain, such as the groups of `get_groups_of_k_best_nodes_from_max_score`"""
+    return [improve_chain(graph, chain, fixed_start=fixed_start) for chain in chains]
+
+
+def _cost_matrix(graph: KBNGraph, nodes: Sequence[Node]) -> np.ndarray:
+    coordinates = np.array([[node.x, node.y] for node in nodes], dtype=float)
+    return (
+        pairwise_distances(graph.distance, coordinates, coordinates)
+        + graph.edge_cost_offset
+    )
+
+
+def _best_two_opt(costs: np.ndarray) -> Tuple[float, Callable]:
+    """Best reversal of a segment path[i:j + 1], for 1 <= i < j <= m - 2 with m the path length"""
+    m = len(costs)
+    steps = np.diagonal(costs, offset=1)
+    # delta[i - 1, j - 1] = c(i - 1, j) + c(i, j + 1) - c(i - 1, i) - c(j, j + 1)
+    delta = (
+        costs[: m - 2, 1 : m - 1]
+        + costs[1 : m - 1, 2:]
+        - steps[: m - 2, None]
+        - steps[None, 1 : m - 1]
+    )
+    delta[np.tri(m - 2, dtype=bool)] = np.inf
+    i, j = np.unravel_index(np.argmin(delta), delta.shape)
+    i, j = i + 1, j + 1
+
+    def move(path: np.ndarray) -> np.ndarray:
+        path = path.copy()
+        path[i : j + 1] = path[i : j + 1][::-1]
+        return path
+
+    return delta[i - 1, j - 1], move
+
+
+def _best_or_opt(costs: np.ndarray) -> Tuple[float, Callable]:
+    """
+    Best move of a segment path[s:s + length] between the positions p and p + 1, outside of the segment,
+    for 1 <= s and s + length <= m - 1 with m the path length. The segment can be reversed.
+    """
+    m = len(costs)
+    steps = np.diagonal(costs, offset=1)
+    best_delta, best_move = np.inf, None
+    for length in OR_OPT_SEGMENT_LENGTHS:
+        starts = np.arange(1, m - length)
+        if not len(starts):
+            break
+        ends = starts + length - 1
+        removal_gains = (
+            steps[: m - length - 1] + steps[length:] - costs[starts - 1, ends + 1]
+        )
+
+        # Distances are symmetric: c(p, s) = c(s, p)
+        # insertion[s, p] = c(s, p) + c(e, p + 1) - c(p, p + 1), or c(e, p) + c(s, p + 1) - c(p, p + 1)
+        forward = costs[1 : m - length, : m - 1] + costs[length : m - 1, 1:]
+        backward = costs[length : m - 1, : m - 1] + costs[1 : m - length, 1:]
+        delta = np.minimum(forward, backward) - steps - removal_gains[:, None]
+        delta[_or_opt_invalid_moves(m, length)] = np.inf
+
+        s_idx, p_idx = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[s_idx, p_idx] < best_delta:
+            best_delta = delta[s_idx, p_idx]
+            best_move = _or_opt_move(
+                starts[s_idx],
+                length,
+                p_idx,
+                backward[s_idx, p_idx] < forward[s_idx, p_idx],
+            )
+    return best_delta, best_move
+
+
+@lru_cache(maxsize=None)
+def _or_opt_invalid_moves(m: int, length: int) -> np.ndarray:
+    """Or-opt moves whose insertion edge (p, p + 1) touches the segment, by segment start and p"""
+    starts, p = np.arange(1, m - length), np.arange(m - 1)
+    return (p >= starts[:, None] - 1) & (p <= starts[:, None] + length - 1)
+
+
+def _or_opt_move(start: int, length: int, p: int, reverse: bool) -> Callable:
+    def move(path: np.ndarray) -> np.ndarray:
+        segment = path[start : start + length]
+        if reverse:
+            segment = segment[::-1]
+        rest = np.concatenate([path[:start], path[start + length :]])
+        # Position of p + 1 in the path without the segment
+        insert_at = p + 1 if p < start else p + 1 - length
+        return np.concatenate([rest[:insert_at], segment, rest[insert_at:]])
+
+    return move
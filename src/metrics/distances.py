@@ -1,11 +1,16 @@
-from typing import Any, Callable, Dict, Type
+import math
+from typing import Any, Callable, Dict, Optional, Tuple, Type
 
 import numpy as np
-from scipy.spatial import distance
 
 from src.structures.node import Node
 
+EARTH_RADIUS_KM = 6371.0088
+
 _DISTANCES: Dict[str, Callable] = {}
+_BATCHED_DISTANCES: Dict[str, Callable] = {}
+_INDEX_SPACES: Dict[str, Callable] = {}
+_PAIRS_QUERIES: Dict[str, Callable] = {}
 
 
 def register_distance(name: str) -> Callable:
@@ -20,6 +25,49 @@ def register_distance(name: str) -> Callable:
     return decorator
 
 
+def register_batched_distance(name: str) -> Callable:
+    """
+    Register the batched form of a distance. It takes two coordinates arrays whose last axis holds (x, y)
+    and returns the distances between them, broadcasting the other axis like NumPy operators do:
+    - (n, 2) and (n, 2) arrays give the (n,) distances between paired rows.
+    - (n, 1, 2) and (1, m, 2) arrays give the (n, m) pairwise distance matrix.
+    """
+
+    def decorator(fun: Callable) -> Callable:
+        _BATCHED_DISTANCES[name] = fun
+        return fun
+
+    return decorator
+
+
+def register_index_space(name: str) -> Callable:
+    """
+    Register how to query a distance with a KD-tree. The function maps (coordinates, radius) to
+    (points, p, radius) so that points closer than `radius` with the distance are the points
+    closer than the returned radius with the Minkowski p-norm.
+    """
+
+    def decorator(fun: Callable) -> Callable:
+        _INDEX_SPACES[name] = fun
+        return fun
+
+    return decorator
+
+
+def register_pairs_query(name: str) -> Callable:
+    """
+    Register how to find the pairs of close points for a distance that neither a KD-tree nor a pairwise
+    comparison can query efficiently. The function maps (coordinates, radius) to the (i, j) positions,
+    with j < i, of candidate pairs closer than `radius`, like `query_pairs_within`.
+    """
+
+    def decorator(fun: Callable) -> Callable:
+        _PAIRS_QUERIES[name] = fun
+        return fun
+
+    return decorator
+
+
 def get_distance(name: str) -> Callable:
     try:
         distance_fun = _DISTANCES[name]
@@ -30,7 +78,147 @@ def get_distance(name: str) -> Callable:
         )
 
 
+def has_distance(name: str) -> bool:
+    return name in _DISTANCES
+
+
+def get_batched_distance(name: str) -> Optional[Callable]:
+    return _BATCHED_DISTANCES.get(name)
+
+
+def get_index_space(name: str) -> Optional[Callable]:
+    return _INDEX_SPACES.get(name)
+
+
+def get_pairs_query(name: str) -> Optional[Callable]:
+    return _PAIRS_QUERIES.get(name)
+
+
+def paired_distances(
+    name: str, coordinates1: np.ndarray, coordinates2: np.ndarray
+) -> np.ndarray:
+    """Distances between the paired rows of two (n, 2) coordinates arrays."""
+    batched_distance = get_batched_distance(name)
+    if batched_distance is not None:
+        return np.asarray(batched_distance(coordinates1, coordinates2), dtype=float)
+
+    distance_fun = get_distance(name)
+    return np.array(
+        [
+            distance_fun(_coordinates_node(xy1), _coordinates_node(xy2))
+            for xy1, xy2 in zip(coordinates1, coordinates2)
+        ],
+        dtype=float,
+    )
+
+
+def pairwise_distances(
+    name: str, coordinates1: np.ndarray, coordinates2: np.ndarray
+) -> np.ndarray:
+    """(n, m) distance matrix between a (n, 2) and a (m, 2) coordinates arrays.
+    Pass a block of rows as `coordinates1` to compute a row-block of a larger matrix."""
+    coordinates1 = np.asarray(coordinates1, dtype=float).reshape(-1, 2)
+    coordinates2 = np.asarray(coordinates2, dtype=float).reshape(-1, 2)
+    batched_distance = get_batched_distance(name)
+    if batched_distance is not None:
+        return np.asarray(
+            batched_distance(coordinates1[:, None, :], coordinates2[None, :, :]),
+            dtype=float,
+        )
+
+    distance_fun = get_distance(name)
+    nodes2 = [_coordinates_node(xy) for xy in coordinates2]
+    return np.array(
+        [
+            [distance_fun(_coordinates_node(xy1), node2) for node2 in nodes2]
+            for xy1 in coordinates1
+        ],
+        dtype=float,
+    ).reshape(len(coordinates1), len(coordinates2))
+
+
+def _coordinates_node(xy: np.ndarray) -> Node:
+    return Node(id=None, x=xy[0], y=xy[1], score=0)
+
+
 @register_distance("euclidian")
-def euclidian_distance(node1: Type[Node], node2: Type[Node]) -> np.float64:
-    vector1, vector2 = [node1.x, node1.y], [node2.x, node2.y]
-    return distance.euclidean(vector1, vector2)
+def euclidian_distance(node1: Type[Node], node2: Type[Node]) -> float:
+    dx, dy = node1.x - node2.x, node1.y - node2.y
+    return math.sqrt(dx * dx + dy * dy)
+
+
+@register_batched_distance("euclidian")
+def euclidian_distances(
+    coordinates1: np.ndarray, coordinates2: np.ndarray
+) -> np.ndarray:
+    """Same operations as `euclidian_distance` so that both return identical values."""
+    dx = coordinates1[..., 0] - coordinates2[..., 0]
+    dy = coordinates1[..., 1] - coordinates2[..., 1]
+    return np.sqrt(dx * dx + dy * dy)
+
+
+@register_index_space("euclidian")
+def euclidian_index_space(
+    coordinates: np.ndarray, radius: float
+) -> Tuple[np.ndarray, float, float]:
+    return coordinates, 2.0, radius
+
+
+@register_distance("manhattan")
+def manhattan_distance(node1: Type[Node], node2: Type[Node]) -> float:
+    return abs(node1.x - node2.x) + abs(node1.y - node2.y)
+
+
+@register_batched_distance("manhattan")
+def manhattan_distances(
+    coordinates1: np.ndarray, coordinates2: np.ndarray
+) -> np.ndarray:
+    return np.abs(coordinates1[..., 0] - coordinates2[..., 0]) + np.abs(
+        coordinates1[..., 1] - coordinates2[..., 1]
+    )
+
+
+@register_index_space("manhattan")
+def manhattan_index_space(
+    coordinates: np.ndarray, radius: float
+) -> Tuple[np.ndarray, float, float]:
+    return coordinates, 1.0, radius
+
+
+@register_distance("haversine")
+def haversine_distance(node1: Type[Node], node2: Type[Node]) -> float:
+    """Great-circle distance in kilometers. x is the longitude and y the latitude, in degrees."""
+    lon1, lat1, lon2, lat2 = map(math.radians, [node1.x, node1.y, node2.x, node2.y])
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+@register_batched_distance("haversine")
+def haversine_distances(
+    coordinates1: np.ndarray, coordinates2: np.ndarray
+) -> np.ndarray:
+    lon1, lat1 = np.radians(coordinates1[..., 0]), np.radians(coordinates1[..., 1])
+    lon2, lat2 = np.radians(coordinates2[..., 0]), np.radians(coordinates2[..., 1])
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+@register_index_space("haversine")
+def haversine_index_space(
+    coordinates: np.ndarray, radius: float
+) -> Tuple[np.ndarray, float, float]:
+    """Points on the sphere in 3D: great-circle distances become chord lengths."""
+    lon, lat = np.radians(coordinates[:, 0]), np.radians(coordinates[:, 1])
+    points = EARTH_RADIUS_KM * np.stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=1
+    )
+    chord = (
+        2 * EARTH_RADIUS_KM * math.sin(min(radius / (2 * EARTH_RADIUS_KM), math.pi / 2))
+    )
+    return points, 2.0, chord
@@ -1,6 +1,330 @@
-""" Open Street Map based distances """
-import osmnx as ox
+""" Open Street Map based distances, computed offline on a local road network extract """
+import hashlib
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
 
-ox.config(use_cache=True, log_console=True)
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 
-# TODO: Add service based on OpenStreetMap (osmnx) enabling duration distance
+from src.metrics.distances import (
+    haversine_distances,
+    register_batched_distance,
+    register_distance,
+    register_pairs_query,
+)
+from src.spatial.index import RADIUS_QUERY_SLACK, NearestNodeIndex
+from src.structures.node import Node
+
+ONEWAY_VALUES = {"yes", "true", "1"}
+
+
+class RoadNetwork:
+    """
+    Directed road graph. `coordinates` holds the (longitude, latitude) of the road nodes and `adjacency`
+    the cost of each road segment, e.g. its length in meters or its travel time.
+    """
+
+    def __init__(self, coordinates: np.ndarray, adjacency: csr_matrix):
+        self.coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.adjacency = csr_matrix(adjacency)
+        self._index: Optional[NearestNodeIndex] = None
+
+    @classmethod
+    def from_file(cls, path: str, weight: str = "length") -> "RoadNetwork":
+        """Load a GraphML (`.graphml`) or an OSM XML (`.osm`, `.xml`) extract"""
+        if path.endswith(".graphml"):
+            return cls.from_graphml(path, weight)
+        return cls.from_osm_xml(path)
+
+    @classmethod
+    def from_graphml(cls, path: str, weight: str = "length") -> "RoadNetwork":
+        """
+        Load a GraphML road graph, as saved by osmnx: nodes have `x` (longitude) and `y` (latitude)
+        attributes and edges a `weight` attribute. Edges without it cost their length in meters.
+        """
+        root = ET.parse(path).getroot()
+        keys = {
+            key.get("id"): key.get("attr.name")
+            for key in root.iter()
+            if _tag(key) == "key"
+        }
+        graph = next(element for element in root if _tag(element) == "graph")
+        directed = graph.get("edgedefault", "directed") == "directed"
+
+        positions: Dict[str, int] = {}
+        coordinates: List[Tuple[float, float]] = []
+        segments: List[Tuple[int, int, float]] = []
+        for element in graph:
+            data = {
+                keys.get(item.get("key")): item.text
+                for item in element
+                if _tag(item) == "data"
+            }
+            if _tag(element) == "node":
+                positions[element.get("id")] = len(coordinates)
+                coordinates.append((float(data["x"]), float(data["y"])))
+            elif _tag(element) == "edge":
+                cost = float(data[weight]) if data.get(weight) is not None else np.nan
+                source = positions[element.get("source")]
+                target = positions[element.get("target")]
+                segments.append((source, target, cost))
+                if not directed:
+                    segments.append((target, source, cost))
+        return cls._from_segments(np.array(coordinates), segments)
+
+    @classmethod
+    def from_osm_xml(cls, path: str) -> "RoadNetwork":
+        """
+        Load the ways tagged `highway` of an OSM XML extract. Road segments cost their length in meters,
+        `oneway` ways are only traversed in their direction.
+        """
+        nodes: Dict[str, Tuple[float, float]] = {}
+        ways: List[Tuple[List[str], str]] = []
+        for _, element in ET.iterparse(path):
+            if element.tag == "node":
+                nodes[element.get("id")] = (
+                    float(element.get("lon")),
+                    float(element.get("lat")),
+                )
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                if "highway" in tags:
+                    refs = [nd.get("ref") for nd in element.iter("nd")]
+                    ways.append((refs, tags.get("oneway", "no")))
+                element.clear()
+
+        positions: Dict[str, int] = {}
+        coordinates: List[Tuple[float, float]] = []
+        segments: List[Tuple[int, int, float]] = []
+        for refs, oneway in ways:
+            refs = [ref for ref in refs if ref in nodes]
+            for ref in refs:
+                if ref not in positions:
+                    positions[ref] = len(coordinates)
+                    coordinates.append(nodes[ref])
+            if oneway == "-1":
+                refs = refs[::-1]
+            for source, target in zip(refs[:-1], refs[1:]):
+                segments.append((positions[source], positions[target], np.nan))
+                if oneway not in ONEWAY_VALUES and oneway != "-1":
+                    segments.append((positions[target], positions[source], np.nan))
+        return cls._from_segments(np.array(coordinates), segments)
+
+    @classmethod
+    def _from_segments(
+        cls, coordinates: np.ndarray, segments: List[Tuple[int, int, float]]
+    ) -> "RoadNetwork":
+        """Segments with a NaN cost cost their length in meters. Only the cheapest of parallel segments is kept."""
+        coordinates = coordinates.reshape(-1, 2)
+        segments = np.array(segments, dtype=float).reshape(-1, 3)
+        sources = segments[:, 0].astype(np.intp)
+        targets = segments[:, 1].astype(np.intp)
+        costs = segments[:, 2]
+        missing = np.isnan(costs)
+        costs[missing] = 1000 * haversine_distances(
+            coordinates[sources[missing]], coordinates[targets[missing]]
+        )
+
+        order = np.lexsort((costs, targets, sources))
+        sources, targets, costs = sources[order], targets[order], costs[order]
+        first = np.ones(len(costs), dtype=bool)
+        first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        adjacency = csr_matrix(
+            (costs[first], (sources[first], targets[first])),
+            shape=(len(coordinates), len(coordinates)),
+        )
+        return cls(coordinates, adjacency)
+
+    def snap(self, coordinates: np.ndarray) -> np.ndarray:
+        """Position of the road node closest to each (longitude, latitude) point"""
+        if self._index is None:
+            self._index = NearestNodeIndex(self.coordinates, distance="haversine")
+        return self._index.query(coordinates)
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha1()
+        for array in (
+            self.coordinates,
+            self.adjacency.indptr,
+            self.adjacency.indices,
+            self.adjacency.data,
+        ):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+
+class RoadNetworkDistance:
+    """
+    Travel costs on a road network between points, from the road node closest to each point.
+
+    The costs between the road nodes closest to `coordinates` are computed once with a multi-source
+    Dijkstra cut off at `max_cost`, by batches of sources bounded to `max_batch_bytes`, and cached in
+    `cache_dir`. Only these costs are kept, as sorted (road node pair, cost) arrays: pairs further than
+    `max_cost` and points snapped to other road nodes have an infinite cost.
+    Graph edges are undirected: the cost of a pair is the cheapest of both travel directions.
+    """
+
+    def __init__(
+        self,
+        network: RoadNetwork,
+        coordinates: np.ndarray,
+        max_cost: float,
+        cache_dir: Optional[str] = None,
+        max_batch_bytes: int = 2**27,
+    ):
+        self.network = network
+        self.max_cost = max_cost
+        self.road_nodes = np.unique(network.snap(coordinates))
+        cache_path = self._cache_path(cache_dir) if cache_dir is not None else None
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                self._keys, self._costs = cached["keys"], cached["costs"]
+        else:
+            self._keys, self._costs = self._compute_costs(max_batch_bytes)
+            if cache_path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                np.savez(cache_path, keys=self._keys, costs=self._costs)
+
+    def _cache_path(self, cache_dir: str) -> str:
+        digest = hashlib.sha1(self.network.fingerprint().encode())
+        digest.update(self.road_nodes.tobytes())
+        digest.update(repr(float(self.max_cost)).encode())
+        return os.path.join(cache_dir, f"road_costs_{digest.hexdigest()[:16]}.npz")
+
+    def _compute_costs(self, max_batch_bytes: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_slots = len(self.road_nodes)
+        batch_size = max(1, max_batch_bytes // (8 * len(self.network.coordinates)))
+        rows, cols, costs = [], [], []
+        for start in range(0, n_slots, batch_size):
+            sources = self.road_nodes[start : start + batch_size]
+            batch_costs = dijkstra(
+                self.network.adjacency, indices=sources, limit=self.max_cost
+            )[:, self.road_nodes]
+            batch_rows, batch_cols = np.nonzero(np.isfinite(batch_costs))
+            rows.append(batch_rows + start)
+            cols.append(batch_cols)
+            costs.append(batch_costs[batch_rows, batch_cols])
+        if not costs:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        rows, cols, costs = (
+            np.concatenate(rows),
+            np.concatenate(cols),
+            np.concatenate(costs),
+        )
+        keys = self._keys_of(rows, cols)
+        order = np.lexsort((costs, keys))
+        keys, costs = keys[order], costs[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        return keys[first], costs[first]
+
+    def _keys_of(self, slots1: np.ndarray, slots2: np.ndarray) -> np.ndarray:
+        high, low = np.maximum(slots1, slots2), np.minimum(slots1, slots2)
+        return high.astype(np.int64) * len(self.road_nodes) + low
+
+    def _slots(self, coordinates: np.ndarray) -> np.ndarray:
+        """Position in `road_nodes` of the road node of each point, -1 when it has no computed costs"""
+        snapped = self.network.snap(coordinates)
+        slots = np.minimum(
+            np.searchsorted(self.road_nodes, snapped), len(self.road_nodes) - 1
+        )
+        slots[(snapped < 0) | (self.road_nodes[slots] != snapped)] = -1
+        return slots
+
+    def _lookup(self, slots1: np.ndarray, slots2: np.ndarray) -> np.ndarray:
+        slots1, slots2 = np.broadcast_arrays(slots1, slots2)
+        costs = np.full(slots1.shape, np.inf)
+        if not len(self._keys):
+            return costs
+        keys = self._keys_of(slots1, slots2)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        found = (slots1 >= 0) & (slots2 >= 0) & (self._keys[positions] == keys)
+        costs[found] = self._costs[positions[found]]
+        return costs
+
+    def distances(
+        self, coordinates1: np.ndarray, coordinates2: np.ndarray
+    ) -> np.ndarray:
+        """Batched distance, broadcasting the coordinates arrays like `register_batched_distance` expects"""
+        coordinates1 = np.asarray(coordinates1, dtype=float)
+        coordinates2 = np.asarray(coordinates2, dtype=float)
+        slots1 = self._slots(coordinates1.reshape(-1, 2)).reshape(
+            coordinates1.shape[:-1]
+        )
+        slots2 = self._slots(coordinates2.reshape(-1, 2)).reshape(
+            coordinates2.shape[:-1]
+        )
+        return self._lookup(slots1, slots2)
+
+    def distance(self, node1: Node, node2: Node) -> float:
+        return self.distances(
+            np.array([node1.x, node1.y]), np.array([node2.x, node2.y])
+        ).item()
+
+    def pairs_within(
+        self, coordinates: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """The (i, j) positions, with j < i, of the points closer than `radius`, from the computed costs"""
+        slots = self._slots(coordinates)
+        in_range = self._costs <= radius * (1 + RADIUS_QUERY_SLACK)
+        high = self._keys[in_range] // len(self.road_nodes)
+        low = self._keys[in_range] % len(self.road_nodes)
+
+        # Points grouped by road node: each pair of road nodes in range gives the pairs of their points
+        points = np.flatnonzero(slots >= 0)
+        points = points[np.argsort(slots[points], kind="stable")]
+        sorted_slots = slots[points]
+        all_slots = np.arange(len(self.road_nodes))
+        starts = np.searchsorted(sorted_slots, all_slots)
+        counts = np.searchsorted(sorted_slots, all_slots, side="right") - starts
+
+        pairs_counts = counts[high] * counts[low]
+        entries = np.repeat(np.arange(len(high)), pairs_counts)
+        ranks = np.arange(len(entries)) - np.repeat(
+            np.cumsum(pairs_counts) - pairs_counts, pairs_counts
+        )
+        low_counts = counts[low][entries]
+        points1 = points[starts[high][entries] + ranks // low_counts]
+        points2 = points[starts[low][entries] + ranks % low_counts]
+        # Points sharing a road node are paired in both orders, only one is kept
+        kept = points1 > points2
+        kept |= high[entries] != low[entries]
+        points1, points2 = points1[kept], points2[kept]
+        return (
+            np.maximum(points1, points2).astype(np.intp),
+            np.minimum(points1, points2).astype(np.intp),
+        )
+
+    def register(self, name: str = "road") -> str:
+        """Register the distance, its batched form and its pairs query under `name`"""
+        register_distance(name)(self.distance)
+        register_batched_distance(name)(self.distances)
+        register_pairs_query(name)(self.pairs_within)
+        return name
+
+
+def register_road_distance(
+    path: str,
+    coordinates: np.ndarray,
+    max_cost: float,
+    name: str = "road",
+    cache_dir: Optional[str] = None,
+    weight: str = "length",
+) -> RoadNetworkDistance:
+    """
+    Load a road network extract and register the travel costs between `coordinates` under `name`.
+    Build graphs of nodes at these coordinates with `distance=name` and the same `max_cost`.
+    """
+    road_distance = RoadNetworkDistance(
+        RoadNetwork.from_file(path, weight), coordinates, max_cost, cache_dir
+    )
+    road_distance.register(name)
+    return road_distance
+
+
+def _tag(element: ET.Element) -> str:
+    """Tag without its XML namespace"""
+    return element.tag.rsplit("}", 1)[-1]
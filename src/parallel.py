@@ -0,0 +1,215 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from src.kbn import dispatch_k, find_next_best_neighbors_beam
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+from src.utils.profiling import SOLVE, timed
+
+logger = logging.getLogger(__name__)
+
+# name -> (shared memory block name, shape, dtype)
+ArraySpec = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+_WORKER_GRAPH: Optional[CSRKBNGraph] = None
+_WORKER_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+class SharedCSRGraph:
+    """
+    Copy of the arrays of a CSRKBNGraph in shared memory blocks.
+    Processes attach to the blocks by name, so the graph is neither pickled nor copied per worker.
+    The owner updates the `active` mask of `graph` and workers read it from the shared block.
+
+    Use it as a context manager: blocks are released on exit.
+    """
+
+    def __init__(self, graph: CSRKBNGraph):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec: ArraySpec = {}
+        shared_arrays = {}
+        for name, array in graph.to_arrays().items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared_array[...] = array
+            self._blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+            shared_arrays[name] = shared_array
+
+        self.max_cost = graph.max_cost
+        self.distance = graph.distance
+        self.edge_cost_offset = graph.edge_cost_offset
+        self.graph = CSRKBNGraph.from_arrays(
+            shared_arrays, graph.max_cost, graph.distance, graph.edge_cost_offset
+        )
+        self.graph.n_neighbors = graph.n_neighbors
+
+    def close(self) -> None:
+        # Views on the buffers must be released before the blocks are closed
+        self.graph = None
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedCSRGraph":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach_shared_graph(
+    spec: ArraySpec, max_cost: float, distance: str, edge_cost_offset: float = 0
+) -> Tuple[CSRKBNGraph, List[shared_memory.SharedMemory]]:
+    """Build a graph on the shared memory blocks of a `SharedCSRGraph`. The blocks must be kept open
+    as long as the graph is used."""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return CSRKBNGraph.from_arrays(arrays, max_cost, distance, edge_cost_offset), blocks
+
+
+def _init_worker(
+    spec: ArraySpec, max_cost: float, distance: str, edge_cost_offset: float
+) -> None:
+    global _WORKER_BLOCKS
+    graph, _WORKER_BLOCKS = attach_shared_graph(
+        spec, max_cost, distance, edge_cost_offset
+    )
+    _set_worker_graph(graph)
+
+
+def _grow_group(task: Tuple[int, int, Optional[int]]) -> List[int]:
+    """Worker task: ids of the chain of k nodes grown from a seed node. The graph is not modified."""
+    seed_id, k, beam_width = task
+    graph = _WORKER_GRAPH
+    chain = find_next_best_neighbors_beam(
+        graph, [graph.nodes[seed_id]], k - 1, beam_width=beam_width or 1
+    )
+    return [node.id for node in chain]
+
+
+@timed(SOLVE)
+def get_groups_of_k_best_nodes_parallel(
+    graph: KBNGraph,
+    total_k: int = 10,
+    n_groups: int = 5,
+    n_workers: Optional[int] = None,
+    beam_width: Optional[int] = None,
+    seeds_per_group: int = 2,
+    max_iter: Optional[int] = None,
+) -> List[List[Type[Node]]]:
+    """
+    Team orienteering groups grown concurrently in a process pool.
+
+    At each round, candidate groups are grown from the active nodes with the best scores, one per seed,
+    on a shared memory copy of the graph. Candidates are then accepted by decreasing total score,
+    ties broken by seed rank, and rejected when they claim a node of an already accepted group.
+    Nodes of accepted groups are deactivated and the seeds of incomplete groups are discarded
+    before the next round. The result does not depend on the number of workers.
+
+    Constraints are not supported: workers only see the nodes ids, coordinates and scores.
+    Selected nodes are deactivated in `graph`, as the sequential search does.
+    n_workers: Size of the process pool. With 1, groups are grown in the current process.
+    seeds_per_group: Candidates grown per missing group at each round
+    """
+    csr_graph = (
+        graph if isinstance(graph, CSRKBNGraph) else CSRKBNGraph.from_graph(graph)
+    )
+    k_values = dispatch_k(total_k, n_groups)
+    max_iter = max_iter if max_iter is not None else n_groups * 3
+    results: List[List[int]] = []
+
+    with SharedCSRGraph(csr_graph) as shared_graph:
+        shared = shared_graph.graph
+        initargs = (
+            shared_graph.spec,
+            shared_graph.max_cost,
+            shared_graph.distance,
+            shared_graph.edge_cost_offset,
+        )
+        executor = (
+            None
+            if n_workers == 1
+            else ProcessPoolExecutor(
+                n_workers, initializer=_init_worker, initargs=initargs
+            )
+        )
+        _set_worker_graph(shared)
+        try:
+            i = 0
+            while len(results) < n_groups and i < max_iter and shared.active.any():
+                logger.info("Starting parallel round %d", i + 1)
+                missing_k = k_values[len(results) :]
+                seeds = _select_seeds(shared, len(missing_k) * seeds_per_group)
+                tasks = [(seed_id, max(missing_k), beam_width) for seed_id in seeds]
+                chains = list(
+                    map(_grow_group, tasks)
+                    if executor is None
+                    else executor.map(_grow_group, tasks)
+                )
+                accepted = _resolve_conflicts(shared, chains, missing_k)
+                for rank, chain in accepted:
+                    for node_id in chain:
+                        shared.deactivate_node(node_id)
+                    results.append(chain)
+                accepted_ranks = {rank for rank, _ in accepted}
+                for rank, (seed_id, chain) in enumerate(zip(seeds, chains)):
+                    if rank not in accepted_ranks and len(chain) < min(missing_k):
+                        shared.deactivate_node(seed_id)
+                i += 1
+        finally:
+            _set_worker_graph(None)
+            if executor is not None:
+                executor.shutdown()
+
+    groups = [[graph.nodes[node_id] for node_id in chain] for chain in results]
+    for chain in results:
+        for node_id in chain:
+            graph.deactivate_node(node_id)
+    return groups
+
+
+def _set_worker_graph(graph: Optional[CSRKBNGraph]) -> None:
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = graph
+
+
+def _select_seeds(graph: CSRKBNGraph, n_seeds: int) -> List[int]:
+    """Ids of the active nodes with the best scores. Ties are broken by position."""
+    active_idx = np.flatnonzero(graph.active)
+    order = np.lexsort((active_idx, -graph.scores[active_idx]))
+    return [graph.node_ids[i] for i in active_idx[order[:n_seeds]].tolist()]
+
+
+def _resolve_conflicts(
+    graph: CSRKBNGraph, chains: List[List[int]], k_values: List[int]
+) -> List[Tuple[int, List[int]]]:
+    """
+    Accept chains by decreasing total score, then seed rank, skipping the ones sharing a node with
+    an accepted chain. The i-th accepted chain is truncated to `k_values[i]` nodes.
+    Returns the seed rank and the nodes ids of the accepted chains.
+    """
+    scores = {graph.node_ids[i]: score for i, score in enumerate(graph.scores.tolist())}
+    ranking = sorted(
+        range(len(chains)),
+        key=lambda rank: (-sum(scores[node_id] for node_id in chains[rank]), rank),
+    )
+    accepted, claimed = [], set()
+    for rank in ranking:
+        if len(accepted) == len(k_values):
+            break
+        chain = chains[rank][: k_values[len(accepted)]]
+        if len(chain) < k_values[len(accepted)] or claimed.intersection(chain):
+            continue
+        accepted.append((rank, chain))
+        claimed.update(chain)
+    return accepted
@@ -16,6 +16,7 @@ class RandomGraph(KBNGraph):
         edge_cost_offset: float = 0.0,
         with_properties: bool = False,
         random_seed: Optional[int] = None,
+        soft_deactivation: bool = False,
     ):
         self.random_gen = np.random.default_rng(seed=random_seed)
         nodes_list = self.gen_rand_node(n=n, with_properties=with_properties)
@@ -24,6 +25,7 @@ class RandomGraph(KBNGraph):
             distance=distance,
             max_cost=max_cost,
             edge_cost_offset=edge_cost_offset,
+            soft_deactivation=soft_deactivation,
         )
 
     def gen_rand_node(self, n=10, with_properties=False) -> List[Node]:
@@ -0,0 +1,85 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence
+
+from src.contraints.base import BaseConstraint
+from src.kbn import find_next_best_neighbors_beam
+from src.local_search import improve_chain
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+from src.utils.profiling import SOLVE, timer
+
+
+@dataclass(frozen=True)
+class Query:
+    """
+    A chain of `k` nodes starting from `first_node_id`, as returned by `get_k_best_nodes`.
+    The constraints are cloned by the query: their state is the initial state of each query and is never modified.
+    """
+
+    first_node_id: int
+    k: int = 10
+    constraints: Sequence[BaseConstraint] = ()
+    beam_width: int = 1
+    local_search: bool = False
+
+
+def solve_query(graph: KBNGraph, query: Query) -> List[Node]:
+    """
+    Chain of `query`, found without modifying the graph: the visited nodes and the constraints states are
+    carried by the query (see `find_next_best_neighbors_beam`) instead of deactivating nodes.
+    With the default beam width of 1, the chain is the one of `get_k_best_nodes` on an unmodified graph.
+    """
+    with timer(SOLVE):
+        chain = find_next_best_neighbors_beam(
+            graph,
+            [graph.nodes[query.first_node_id]],
+            query.k - 1,
+            list(query.constraints),
+            beam_width=query.beam_width,
+        )
+        if query.local_search:
+            chain, _ = improve_chain(graph, chain)
+    return chain
+
+
+class QueryServer:
+    """
+    Serves queries concurrently from a thread pool on one in-memory graph, shared read-only by the queries.
+
+    Nodes must not be deactivated, added or removed while queries are running. With a CSRKBNGraph,
+    neighbors are ranked and scored by NumPy, which releases the GIL on large arrays. A KBNGraph is
+    also served safely, its regional score cache being guarded by a lock, but its queries mostly run
+    Python code and hardly overlap.
+    Queries are recorded by the recorder installed in the thread submitting them, see `recording`.
+
+    Use it as a context manager: the thread pool is shut down on exit.
+    """
+
+    def __init__(self, graph: KBNGraph, max_workers: Optional[int] = None):
+        self.graph = graph
+        # Lazy structures are built once here instead of concurrently by the first queries
+        if isinstance(graph, CSRKBNGraph):
+            graph.ranked_neighbors()
+            graph._index
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="kbn-query")
+
+    def submit(self, query: Query) -> "Future[List[Node]]":
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, solve_query, self.graph, query)
+
+    def map(self, queries: Iterable[Query]) -> List[List[Node]]:
+        """Chains of the queries, in the same order"""
+        futures = [self.submit(query) for query in queries]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self) -> "QueryServer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,62 +1,231 @@
 import math
-from typing import List, Optional, Tuple
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-import pandas as pd
+import numpy as np
 
-from src.spatial.find import get_coordinates_bounding_box
 from src.structures.graph import KBNGraph, KBNSubGraph
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class Convolver:
-    x_series: pd.Series
-    y_series: pd.Series
+    """
+    Rectangle queries on nodes coordinates.
 
-    def __init__(self, coords: pd.DataFrame, x_col: str = "x", y_col: str = "y"):
-        self.x_series = coords[x_col]
-        self.y_series = coords[y_col]
+    Coordinates are bucketed once in columns of `bucket_size` along x, and sorted by y in each column.
+    A frame only visits the columns it overlaps, with a binary search on y in each of them:
+    a query costs O(columns * log n + hits). Columns as wide as the frames give the best performance.
+    Bounds are inclusive.
+    """
+
+    def __init__(
+        self,
+        coords: "pd.DataFrame",
+        x_col: str = "x",
+        y_col: str = "y",
+        bucket_size: Optional[float] = None,
+    ):
+        self.index = coords.index
+        x = coords[x_col].to_numpy(dtype=float)
+        y = coords[y_col].to_numpy(dtype=float)
+        self.x_origin = x.min() if len(x) else 0.0
+        x_extent = x.max() - self.x_origin if len(x) else 0.0
+        if bucket_size is None:
+            # About sqrt(n) columns
+            bucket_size = x_extent / max(1.0, math.sqrt(len(x)))
+        self.bucket_size = bucket_size if bucket_size > 0 else 1.0
+
+        columns = self._column_of(x)
+        self.order = np.lexsort((y, columns))
+        self.sorted_x, self.sorted_y = x[self.order], y[self.order]
+        self.n_columns = int(columns.max()) + 1 if len(x) else 0
+        self.column_starts = np.searchsorted(
+            columns[self.order], np.arange(self.n_columns + 1)
+        )
+
+    def _column_of(self, x: np.ndarray) -> np.ndarray:
+        return np.floor((x - self.x_origin) / self.bucket_size).astype(np.int64)
 
     def get_index_in_frame(
-        self, x_min: float, y_min: float, frame_size: Tuple[int, int]
+        self, x_min: float, y_min: float, frame_size: Tuple[float, float]
     ) -> List[int]:
-        valid_x_index = self.get_index_when_values_are_between(
-            self.x_series, min=x_min, max=x_min + frame_size[0]
+        return self.get_indexes_in_frames(np.array([[x_min, y_min]]), frame_size)[0]
+
+    def get_indexes_in_frames(
+        self, frames_min: np.ndarray, frame_size: Tuple[float, float]
+    ) -> List[List[int]]:
+        """Index values of the nodes in each frame, given the (x_min, y_min) corners of the frames"""
+        return [
+            self.index[positions].to_list()
+            for positions in self.query_frames(frames_min, frame_size)
+        ]
+
+    def query_frames(
+        self, frames_min: np.ndarray, frame_size: Tuple[float, float]
+    ) -> List[np.ndarray]:
+        """
+        Positions of the nodes in each frame, in ascending order. All frames overlapping a column
+        are answered with one vectorized binary search in it.
+        """
+        frames_min = np.asarray(frames_min, dtype=float).reshape(-1, 2)
+        x_min, y_min = frames_min[:, 0], frames_min[:, 1]
+        x_max, y_max = x_min + frame_size[0], y_min + frame_size[1]
+        first_columns = np.maximum(self._column_of(x_min), 0)
+        last_columns = np.minimum(self._column_of(x_max), self.n_columns - 1)
+
+        hits: List[List[np.ndarray]] = [[] for _ in range(len(frames_min))]
+        for column in range(
+            int(first_columns.min(initial=self.n_columns)),
+            int(last_columns.max(initial=-1)) + 1,
+        ):
+            frames = np.flatnonzero(
+                (first_columns <= column) & (column <= last_columns)
+            )
+            if not len(frames):
+                continue
+            start, stop = self.column_starts[column], self.column_starts[column + 1]
+            column_y = self.sorted_y[start:stop]
+            lows = start + np.searchsorted(column_y, y_min[frames], side="left")
+            highs = start + np.searchsorted(column_y, y_max[frames], side="right")
+            for frame, low, high in zip(frames.tolist(), lows.tolist(), highs.tolist()):
+                if low == high:
+                    continue
+                entries = np.arange(low, high)
+                if column in (first_columns[frame], last_columns[frame]):
+                    # Frames only partially cover their boundary columns
+                    entries_x = self.sorted_x[entries]
+                    entries = entries[
+                        (entries_x >= x_min[frame]) & (entries_x <= x_max[frame])
+                    ]
+                hits[frame].append(entries)
+
+        return [
+            np.sort(self.order[np.concatenate(entries)])
+            if entries
+            else np.empty(0, dtype=np.intp)
+            for entries in hits
+        ]
+
+
+@dataclass
+class Region:
+    """Square window of the plane with the sum of the scores of its nodes.
+    `positions` are the positions of its nodes in the searched coordinates."""
+
+    x_min: float
+    y_min: float
+    size: float
+    score: float
+    positions: np.ndarray
+
+
+def find_best_regions(
+    graph: KBNGraph,
+    k: int,
+    window_size: Optional[float] = None,
+    n_regions: int = 1,
+    cells_per_window: int = 4,
+) -> List[KBNSubGraph]:
+    """
+    Subgraphs, built with `graph.subgraph`, of the `n_regions` non overlapping square windows with the highest sum of active nodes
+    scores, among the windows holding at least k nodes.
+    window_size: Side of the windows. By default, the side of the surface holding k nodes on average,
+    or the length of the segment holding k nodes on average when the nodes are aligned.
+    cells_per_window: Resolution of the search: windows move by `window_size / cells_per_window` steps.
+    """
+    node_ids, coordinates, scores = graph.active_nodes_arrays()
+    if window_size is None and len(node_ids):
+        window_size = _default_window_size(coordinates, k)
+
+    regions = find_best_windows(
+        coordinates, scores, window_size, n_regions, cells_per_window, min_nodes=k
+    )
+    subgraphs = []
+    for region in regions:
+        region_ids = [node_ids[i] for i in region.positions.tolist()]
+        subgraphs.append(graph.subgraph(region_ids))
+    return subgraphs
+
+
+def _default_window_size(coordinates: np.ndarray, k: int) -> float:
+    """Window size expected to hold k nodes, from the density of the nodes in their bounding box"""
+    extent = coordinates.max(axis=0) - coordinates.min(axis=0)
+    sides = extent[extent > 0]
+    if len(sides) == 2:
+        return math.sqrt(k * sides[0] * sides[1] / len(coordinates))
+    if len(sides) == 1:
+        return float(sides[0]) * k / len(coordinates)
+    # Every node is at the same place: any window holds them all
+    return 1.0
+
+
+def find_best_windows(
+    coordinates: np.ndarray,
+    scores: np.ndarray,
+    window_size: float,
+    n_regions: int = 1,
+    cells_per_window: int = 4,
+    min_nodes: int = 1,
+) -> List[Region]:
+    """
+    Non overlapping square windows with the highest sums of scores, best first.
+    Scores are rasterized on a grid of `window_size / cells_per_window` cells, then the sums of every
+    window position are computed in one pass with a summed-area table. Windows are selected greedily,
+    discarding the windows overlapping a selected one.
+    """
+    if len(coordinates) == 0 or not window_size or window_size <= 0:
+        return []
+    cell_size = window_size / cells_per_window
+    origin = coordinates.min(axis=0)
+    cells = np.floor((coordinates - origin) / cell_size).astype(np.int64)
+    n_x, n_y = cells.max(axis=0) + 1
+
+    flat_cells = cells[:, 1] * n_x + cells[:, 0]
+    score_grid = np.bincount(flat_cells, weights=scores, minlength=n_x * n_y)
+    count_grid = np.bincount(flat_cells, minlength=n_x * n_y)
+    width_x, width_y = min(cells_per_window, n_x), min(cells_per_window, n_y)
+    score_sums = window_sums(score_grid.reshape(n_y, n_x), width_y, width_x)
+    count_sums = window_sums(count_grid.reshape(n_y, n_x), width_y, width_x)
+    score_sums[count_sums < min_nodes] = -np.inf
+
+    regions = []
+    while len(regions) < n_regions:
+        j, i = np.unravel_index(np.argmax(score_sums), score_sums.shape)
+        if score_sums[j, i] == -np.inf:
+            break
+        in_window = (
+            (cells[:, 0] >= i)
+            & (cells[:, 0] < i + width_x)
+            & (cells[:, 1] >= j)
+            & (cells[:, 1] < j + width_y)
         )
-        valid_y_index = self.get_index_when_values_are_between(
-            self.x_series, min=y_min, max=y_min + frame_size[1]
+        regions.append(
+            Region(
+                x_min=float(origin[0] + i * cell_size),
+                y_min=float(origin[1] + j * cell_size),
+                size=window_size,
+                score=float(score_sums[j, i]),
+                positions=np.flatnonzero(in_window),
+            )
         )
-        index_in_frame = valid_x_index.intersection(valid_y_index)
-        return index_in_frame.to_list()
-
-    @staticmethod
-    def get_index_when_values_are_between(
-        serie: pd.Series, min: float, max: float
-    ) -> pd.Index:
-        return serie[serie.between(min, max)].index
-
-
-def find_best_regions(graph: KBNGraph, k: int, window_size: Optional[float] = None) -> KBNSubGraph:
-    # TODO: Convolv along coordinates to find region when the sum k best nodes score is the highest.
-    #  Return a subgraph with all nodes in the region.
-    """Pseudo code
-    for lat in range(lat_min, lat_max - step, step):
-        for lon in range(lon_min, lon_max - step, step):
-            nodes = get_nodes_in_coord_range(lon, lat, window_size:Tuple) " Window_size > step
-            get_X_max_nodes(nodes)
-    """
-
-    coordinates = graph.coordinates()
-    convolver = Convolver(coordinates)
-    (min_x, min_y), (max_x, max_y) = get_coordinates_bounding_box(coordinates)
-
-    if window_size is None:
-        window_surface = k / graph.node_density  #At least k nodes are expected to be in this window size
-        window_size = math.sqrt(window_surface) #TODO : bad idea to compute a square. Better to compute a rectancle with same proportions than the map
-
-    n_steps_x = (x_max - x_min)/window_size
-    n_steps_y = ()
-    #TODO : continue.
-
-
-
-
-    raise NotImplementedError
+        # Windows overlapping the selected one
+        score_sums[
+            max(0, j - width_y + 1) : j + width_y,
+            max(0, i - width_x + 1) : i + width_x,
+        ] = -np.inf
+    return regions
+
+
+def window_sums(grid: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Sums of the values of every `height` x `width` window of a 2D grid, from its summed-area table.
+    The window with its lower corner on cell (j, i) has its sum at (j, i)."""
+    table = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1))
+    np.cumsum(np.cumsum(grid, axis=0), axis=1, out=table[1:, 1:])
+    return (
+        table[height:, width:]
+        - table[:-height, width:]
+        - table[height:, :-width]
+        + table[:-height, :-width]
+    )
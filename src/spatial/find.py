@@ -1,36 +1,43 @@
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import pandas as pd
-from scipy.spatial.distance import cdist
+import numpy as np
+
+from src.metrics.distances import has_distance, pairwise_distances
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def get_closest_node_id(
-    coordinates: pd.DataFrame,
+    coordinates: "pd.DataFrame",
     x: float,
     y: float,
-    distance="euclidean",
+    distance: str = "euclidean",
     x_col: str = "x",
     y_col: str = "y",
     id_col: Optional[str] = None,
 ) -> int:
-    cols = [x_col, y_col]
-
+    """
+    Id of the closest node from (x, y). `distance` is a registered distance, or else a scipy `cdist` metric.
+    The scipy "euclidean" metric is computed with the registered "euclidian" distance.
+    """
     if id_col is not None:
-        cols.append(id_col)
+        coordinates = coordinates.set_index(id_col)
 
-    coordinates = coordinates[cols]
-
-    if id_col is not None:
-        coordinates.set_index(id_col)
+    points = coordinates[[x_col, y_col]].to_numpy(dtype=float)
+    distance = "euclidian" if distance == "euclidean" else distance
+    if has_distance(distance):
+        distances = pairwise_distances(distance, np.array([[x, y]]), points)[0]
+    else:
+        from scipy.spatial.distance import cdist
 
-    closest_node_id = coordinates.iloc[
-        cdist([[x, y]], coordinates.values, metric=distance).argmin()
-    ].name
+        distances = cdist([[x, y]], points, metric=distance)[0]
+    closest_node_id = coordinates.index[distances.argmin()]
     return closest_node_id
 
 
 def get_coordinates_bounding_box(
-    coordinates: pd.DataFrame,
+    coordinates: "pd.DataFrame",
 ) -> Tuple[Tuple[float, float], Tuple[float, float]]:
     return (coordinates["x"].min(), coordinates["y"].min()), (
         coordinates["x"].max(),
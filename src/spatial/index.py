@@ -0,0 +1,291 @@
+import itertools
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from src.metrics.distances import get_index_space, paired_distances, pairwise_distances
+
+# Relative slack applied to radius queries so that pairs lying exactly on the
+# radius are never lost to rounding. Callers filter candidates with their exact
+# cost afterwards.
+RADIUS_QUERY_SLACK = 1e-9
+
+
+def query_pairs_within(
+    coordinates: np.ndarray, radius: float, p: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (i, j) positions, with j < i, of the points closer than `radius`
+    with the Minkowski p-norm.
+
+    The pairs are candidates: a few pairs slightly further than `radius` may be
+    returned and should be filtered with the exact cost by the caller.
+    """
+    empty = np.empty(0, dtype=np.intp)
+    if radius < 0 or len(coordinates) < 2:
+        return empty, empty
+
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(coordinates)
+    pairs = tree.query_pairs(
+        r=radius * (1 + RADIUS_QUERY_SLACK), p=p, output_type="ndarray"
+    )
+    if len(pairs) == 0:
+        return empty, empty
+    # query_pairs returns pairs with first < second
+    return pairs[:, 1].astype(np.intp), pairs[:, 0].astype(np.intp)
+
+
+def query_pairs_within_by_blocks(
+    coordinates: np.ndarray,
+    radius: float,
+    batched_distance: Callable,
+    block_size: int = 1024,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Same output than `query_pairs_within` for distances a KD-tree can not query.
+    The pairwise distance matrix is computed by blocks of rows to bound memory usage."""
+    i_blocks, j_blocks = [], []
+    for start in range(0, len(coordinates), block_size):
+        block = coordinates[start : start + block_size]
+        previous = coordinates[: start + len(block)]
+        distances = batched_distance(block[:, None, :], previous[None, :, :])
+        rows, cols = np.nonzero(distances <= radius * (1 + RADIUS_QUERY_SLACK))
+        rows += start
+        lower = cols < rows
+        i_blocks.append(rows[lower])
+        j_blocks.append(cols[lower])
+
+    if not i_blocks:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    return (
+        np.concatenate(i_blocks).astype(np.intp),
+        np.concatenate(j_blocks).astype(np.intp),
+    )
+
+
+def query_k_nearest_pairs(
+    coordinates: np.ndarray, k: int, p: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (i, j) positions, with j < i, of the points paired with one of their `k` nearest points
+    with the Minkowski p-norm. A pair of mutual neighbors is returned once, sorted by i then j.
+    """
+    n = len(coordinates)
+    k = min(k, n - 1)
+    if k < 1:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    from scipy.spatial import cKDTree
+
+    _, neighbors = cKDTree(coordinates).query(coordinates, k=k + 1, p=p)
+    # Points are their own nearest neighbor, unless another point has the same coordinates
+    others = neighbors != np.arange(n)[:, None]
+    others[others.all(axis=1), -1] = False
+    return _unique_pairs(np.repeat(np.arange(n), k), neighbors[others], n)
+
+
+def query_k_nearest_pairs_by_blocks(
+    coordinates: np.ndarray, k: int, distance: str, block_size: int = 1024
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Same output than `query_k_nearest_pairs` for distances a KD-tree can not query.
+    The pairwise distance matrix is computed by blocks of rows to bound memory usage."""
+    n = len(coordinates)
+    k = min(k, n - 1)
+    if k < 1:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    neighbors = np.empty((n, k), dtype=np.intp)
+    for start in range(0, n, block_size):
+        block = coordinates[start : start + block_size]
+        distances = pairwise_distances(distance, block, coordinates)
+        distances[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf
+        neighbors[start : start + len(block)] = np.argpartition(
+            distances, k - 1, axis=1
+        )[:, :k]
+    return _unique_pairs(np.repeat(np.arange(n), k), neighbors.ravel(), n)
+
+
+def _unique_pairs(
+    rows: np.ndarray, cols: np.ndarray, n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    i, j = np.maximum(rows, cols), np.minimum(rows, cols)
+    keys = np.unique(i.astype(np.int64) * n + j)
+    return (keys // n).astype(np.intp), (keys % n).astype(np.intp)
+
+
+class NearestNodeIndex:
+    """
+    Index of nodes coordinates answering batched nearest node and radius queries for a registered distance.
+
+    Built once with a KD-tree when the distance registered an index space, else queries compare
+    the points with every node by blocks. Queries skip the nodes rejected by an `is_active` mask
+    function, so nodes can be deactivated without rebuilding the index.
+    Nodes added with `extend` are compared by blocks until they outnumber `rebuild_ratio` times
+    the nodes of the KD-tree, which is then rebuilt.
+    """
+
+    def __init__(
+        self,
+        coordinates: np.ndarray,
+        distance: str = "euclidian",
+        block_size: int = 1024,
+        rebuild_ratio: float = 0.125,
+    ):
+        self.coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.distance = distance
+        self.block_size = block_size
+        self.rebuild_ratio = rebuild_ratio
+        self._index_space = get_index_space(distance)
+        self._tree = None
+        # The KD-tree indexes the first `_tree_size` coordinates
+        self._tree_size = 0
+        if self._index_space is not None:
+            self._build_tree()
+
+    def __len__(self) -> int:
+        return len(self.coordinates)
+
+    def _build_tree(self) -> None:
+        if not len(self.coordinates):
+            return
+        points, self._p, _ = self._index_space(self.coordinates, 0.0)
+        from scipy.spatial import cKDTree
+
+        self._tree = cKDTree(points)
+        self._tree_size = len(self.coordinates)
+
+    def extend(self, coordinates: np.ndarray) -> None:
+        """Index new coordinates, at the next positions"""
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        self.coordinates = np.concatenate([self.coordinates, coordinates])
+        pending = len(self) - self._tree_size
+        if self._index_space is not None and pending > max(
+            self.block_size, self._tree_size * self.rebuild_ratio
+        ):
+            self._build_tree()
+
+    def query(
+        self,
+        points: np.ndarray,
+        is_active: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+        k: int = 8,
+    ) -> np.ndarray:
+        """
+        Position of the closest active node of each (x, y) point, -1 when no node is active.
+        With a KD-tree, the `k` closest nodes are tested first and `k` grows for the points
+        whose candidates are all inactive.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        closest = np.full(len(points), -1, dtype=np.intp)
+        if self._tree is not None:
+            closest = self._query_tree(points, is_active, k)
+        if self._tree_size < len(self):
+            closest = self._query_by_blocks(points, is_active, closest)
+        return closest
+
+    def _query_tree(
+        self,
+        points: np.ndarray,
+        is_active: Optional[Callable[[np.ndarray], np.ndarray]],
+        k: int,
+    ) -> np.ndarray:
+        query_points, _, _ = self._index_space(points, 0.0)
+        closest = np.full(len(points), -1, dtype=np.intp)
+        pending = np.arange(len(points))
+        k = min(k, self._tree_size)
+        while len(pending):
+            _, candidates = self._tree.query(query_points[pending], k=k, p=self._p)
+            candidates = candidates.reshape(len(pending), k)
+            if is_active is None:
+                found = np.ones(candidates.shape, dtype=bool)
+            else:
+                found = is_active(candidates.ravel()).reshape(candidates.shape)
+            has_active = found.any(axis=1)
+            first_active = found.argmax(axis=1)
+            closest[pending[has_active]] = candidates[
+                has_active, first_active[has_active]
+            ]
+            pending = pending[~has_active]
+            if k == self._tree_size:
+                break
+            k = min(k * 4, self._tree_size)
+        return closest
+
+    def _query_by_blocks(
+        self,
+        points: np.ndarray,
+        is_active: Optional[Callable[[np.ndarray], np.ndarray]],
+        closest: np.ndarray,
+    ) -> np.ndarray:
+        """Update `closest` with the nodes missing from the KD-tree that are strictly closer"""
+        offset = self._tree_size
+        coordinates = self.coordinates[offset:]
+        inactive = (
+            ~is_active(np.arange(offset, len(self))) if is_active is not None else None
+        )
+        closest = closest.copy()
+        for start in range(0, len(points), self.block_size):
+            block = points[start : start + self.block_size]
+            distances = pairwise_distances(self.distance, block, coordinates)
+            if inactive is not None:
+                distances[:, inactive] = np.inf
+            block_closest = distances.argmin(axis=1)
+            block_distances = distances[np.arange(len(block)), block_closest]
+
+            current = closest[start : start + len(block)]
+            current_distances = np.full(len(block), np.inf)
+            found = current >= 0
+            if found.any():
+                current_distances[found] = paired_distances(
+                    self.distance, block[found], self.coordinates[current[found]]
+                )
+            closer = block_distances < current_distances
+            closest[start : start + len(block)] = np.where(
+                closer, block_closest + offset, current
+            )
+        return closest
+
+    def query_within(
+        self, points: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the (point position, node position) pairs of the nodes closer than `radius` to each
+        (x, y) point. Like `query_pairs_within`, pairs are candidates to filter with the exact cost.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        points_blocks, nodes_blocks = [], []
+        if self._tree is not None and radius >= 0:
+            query_points, p, index_radius = self._index_space(points, radius)
+            neighbors = self._tree.query_ball_point(
+                query_points, r=index_radius * (1 + RADIUS_QUERY_SLACK), p=p
+            )
+            lengths = np.fromiter(map(len, neighbors), dtype=np.intp, count=len(points))
+            points_blocks.append(np.repeat(np.arange(len(points)), lengths))
+            nodes_blocks.append(
+                np.fromiter(
+                    itertools.chain.from_iterable(neighbors),
+                    dtype=np.intp,
+                    count=lengths.sum(),
+                )
+            )
+
+        offset = self._tree_size
+        if offset < len(self):
+            for start in range(0, len(points), self.block_size):
+                block = points[start : start + self.block_size]
+                distances = pairwise_distances(
+                    self.distance, block, self.coordinates[offset:]
+                )
+                rows, cols = np.nonzero(distances <= radius * (1 + RADIUS_QUERY_SLACK))
+                points_blocks.append(rows + start)
+                nodes_blocks.append(cols + offset)
+
+        if not points_blocks:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        return (
+            np.concatenate(points_blocks).astype(np.intp),
+            np.concatenate(nodes_blocks).astype(np.intp),
+        )
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Type
+from typing import Dict, List, Optional, Set, Tuple, Type
+
+import numpy as np
 
 from src.structures.edge import Edge
 from src.structures.node import Node
@@ -17,3 +19,9 @@ class BaseKBNGraph(ABC):
     @abstractmethod
     def get_node_regional_score(self, node_id: int, k: int) -> float:
         ...
+
+    @abstractmethod
+    def get_neighbors_regional_scores(
+        self, node_id: int, k: int, excluded: Optional[Set[int]] = None
+    ) -> Tuple[List[int], np.ndarray]:
+        ...
@@ -0,0 +1,111 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (position in the node neighborhood, edge id, relative score)
+RankedNeighbor = Tuple[int, int, float]
+
+
+@dataclass
+class _CacheEntry:
+    k: int
+    exhaustive: bool
+    ranked_neighbors: List[RankedNeighbor]
+    regional_scores: Dict[int, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.edge_ids = {edge_id for _, edge_id, _ in self.ranked_neighbors}
+
+
+class RegionalScoreCache:
+    """
+    Cache of the regional scores of the nodes, keyed by node id and k.
+
+    Each entry keeps the k best neighbors of a node ranked by relative score, so an entry computed
+    for k also serves any smaller k, and any k when it holds every neighbor of the node.
+    The regional score of a node only depends on its neighborhood: when a node is deactivated,
+    its own entry and the entries of the neighbors ranking it among their k best are invalidated.
+    Reactivating a node invalidates its entry and the entries of all its neighbors.
+    Lookups and updates are guarded by a lock, so the queries of a `QueryServer` can share the cache.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, _CacheEntry] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_regional_score(self, node_id: int, k: int) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is None or k not in entry.regional_scores:
+                return None
+            self.hits += 1
+            return entry.regional_scores[k]
+
+    def set_regional_score(self, node_id: int, k: int, regional_score: float) -> None:
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is not None:
+                entry.regional_scores[k] = regional_score
+
+    def get_k_best_neighbors(
+        self, node_id: int, k: int
+    ) -> Optional[List[RankedNeighbor]]:
+        """Returns the k best neighbors of a node, ranked by relative score, if they are cached"""
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is None or (k > entry.k and not entry.exhaustive):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry.ranked_neighbors[:k]
+
+    def set_k_best_neighbors(
+        self,
+        node_id: int,
+        k: int,
+        ranked_neighbors: List[RankedNeighbor],
+        exhaustive: bool,
+    ) -> None:
+        entry = _CacheEntry(k, exhaustive, ranked_neighbors)
+        with self._lock:
+            self._entries[node_id] = entry
+
+    def invalidate(self, node_ids: Iterable[int]) -> None:
+        with self._lock:
+            for node_id in node_ids:
+                if self._entries.pop(node_id, None) is not None:
+                    self.invalidations += 1
+
+    def discard_neighbor(self, node_id: int, edge_id: int) -> None:
+        """Invalidate the entry of a node losing the neighbor at the end of `edge_id`,
+        only if this neighbor is one of the cached k best."""
+        with self._lock:
+            entry = self._entries.get(node_id)
+            if entry is not None and edge_id in entry.edge_ids:
+                del self._entries[node_id]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hit_rate, 4),
+            }
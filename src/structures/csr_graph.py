@@ -0,0 +1,591 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from src.metrics.distances import get_distance
+from src.structures.edge import Edge
+from src.structures.graph import KBNGraph, KBNSubGraph
+from src.structures.node import Node
+from src.structures.node_table import NodeTable
+from src.utils.profiling import DEACTIVATION, EDGE_BUILD, REACTIVATION, increment, timed
+
+CSR_ARRAYS = [
+    "x",
+    "y",
+    "scores",
+    "active",
+    "deactivated",
+    "indptr",
+    "indices",
+    "costs",
+    "edge_ids",
+    "edge_nodes",
+    "edge_costs",
+]
+
+
+class CSRKBNGraph(KBNGraph):
+    """
+    KBNGraph storing its adjacency as CSR arrays instead of Edge and Node objects.
+
+    The neighbors of the node at position `i` are `indices[indptr[i]:indptr[i + 1]]`, sorted by edge id,
+    with the matching `costs` and `edge_ids`. Node scores and coordinates are NumPy columns, taken as is
+    from a NodeTable, whose Node objects are only created when accessed.
+    Deactivated nodes are flagged in the `active` mask instead of being removed from the arrays.
+
+    `nodes`, `edges`, `neighborhood` and `deactivated_nodes` are read-only views restricted to
+    the active nodes. They are only materialized when accessed.
+    """
+
+    _node_ids: Optional[List[Any]] = None
+    _index_by_id: Optional[Dict[Any, int]] = None
+
+    def __init__(
+        self,
+        nodes_list: Union[List[Node], NodeTable],
+        distance: str = "euclidian",
+        max_cost: Optional[float] = None,
+        edge_cost_offset: Optional[float] = None,
+        n_neighbors: Optional[int] = None,
+    ):
+        """n_neighbors: Without `max_cost`, connect each node to its `n_neighbors` nearest nodes only"""
+        self.max_cost = max_cost
+        self.n_neighbors = self._check_n_neighbors(n_neighbors, max_cost)
+        self.edge_cost_offset = edge_cost_offset if edge_cost_offset is not None else 0
+        self.distance = distance
+        self._cost_fun = get_distance(distance)
+
+        if isinstance(nodes_list, NodeTable):
+            self._nodes_list = nodes_list
+            self.node_ids = nodes_list.ids.tolist()
+            self.x, self.y, self.scores = nodes_list.x, nodes_list.y, nodes_list.scores
+        else:
+            self._nodes_list = list(nodes_list)
+            self.node_ids = [node.id for node in self._nodes_list]
+            self.x = np.array([node.x for node in self._nodes_list], dtype=float)
+            self.y = np.array([node.y for node in self._nodes_list], dtype=float)
+            self.scores = np.array([node.score for node in self._nodes_list])
+
+        n = len(self.node_ids)
+        self.active = np.ones(n, dtype=bool)
+        self.deactivated = np.zeros(n, dtype=bool)
+        self.build_egdes()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Dict[str, np.ndarray],
+        max_cost: float,
+        distance: str = "euclidian",
+        edge_cost_offset: Optional[float] = None,
+        properties: Optional[Dict[str, np.ndarray]] = None,
+    ) -> "CSRKBNGraph":
+        """
+        Build a graph on top of existing arrays, without copying them nor computing the edges again.
+        `arrays` holds `node_ids`, `x`, `y`, `scores`, `active`, `deactivated`, the CSR arrays
+        (`indptr`, `indices`, `costs`, `edge_ids`) and the edges arrays (`edge_nodes`, `edge_costs`),
+        optionally with the ranked neighbors (`ranked_entries`, `ranked_scores`).
+        Nodes are created from the columns when accessed, with the given `properties` columns.
+        The ids list and the position of each id are only built when first needed.
+        """
+        graph = cls.__new__(cls)
+        graph.max_cost = max_cost
+        graph.edge_cost_offset = edge_cost_offset if edge_cost_offset is not None else 0
+        graph.distance = distance
+        graph._cost_fun = get_distance(distance)
+
+        for name in CSR_ARRAYS:
+            setattr(graph, name, arrays[name])
+        graph._nodes_list = NodeTable(
+            graph.x,
+            graph.y,
+            graph.scores,
+            ids=arrays["node_ids"],
+            properties=properties,
+        )
+        if "ranked_entries" in arrays:
+            graph._ranking = arrays["ranked_entries"], arrays["ranked_scores"]
+        return graph
+
+    @classmethod
+    def from_graph(cls, graph: KBNGraph) -> "CSRKBNGraph":
+        """
+        CSRKBNGraph of the active nodes of a KBNGraph, with the same edges criterion and costs:
+        its `max_cost`, or its `n_neighbors` nearest neighbors when `max_cost` is derived from the edges.
+        """
+        return cls(
+            list(graph.nodes.values()),
+            distance=graph.distance,
+            max_cost=None if graph._derived_max_cost else graph.max_cost,
+            edge_cost_offset=graph.edge_cost_offset,
+            n_neighbors=graph.n_neighbors,
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Arrays of the graph, as expected by `from_arrays`"""
+        arrays = {name: getattr(self, name) for name in CSR_ARRAYS}
+        arrays["node_ids"] = (
+            self._nodes_list.ids
+            if isinstance(self._nodes_list, NodeTable)
+            else np.array(self.node_ids)
+        )
+        arrays["ranked_entries"], arrays["ranked_scores"] = self.ranked_neighbors()
+        return arrays
+
+    @timed(EDGE_BUILD)
+    def build_egdes(self) -> None:
+        """Build the edges arrays and the CSR adjacency. Edge ids are the same than KBNGraph ones."""
+        if self.max_cost is None:
+            node1_idx, node2_idx, costs = self._find_unbounded_edges(self._nodes_list)
+            self.max_cost = costs.max() if len(costs) else 0
+        else:
+            node1_idx, node2_idx, costs = self._find_edges_with_max_cost(
+                self._nodes_list
+            )
+        self._set_adjacency(node1_idx, node2_idx, costs)
+
+    def _set_adjacency(
+        self, node1_idx: np.ndarray, node2_idx: np.ndarray, costs: np.ndarray
+    ) -> None:
+        n, n_edges = len(self.node_ids), len(costs)
+        increment("edges", n_edges)
+        self.edge_nodes = np.stack([node1_idx, node2_idx], axis=1).astype(np.intp)
+        self.edge_costs = np.asarray(costs, dtype=float)
+
+        rows = np.concatenate([node1_idx, node2_idx]).astype(np.intp)
+        cols = np.concatenate([node2_idx, node1_idx]).astype(np.intp)
+        edge_ids = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+        order = np.lexsort((edge_ids, rows))
+
+        self.indices = cols[order]
+        self.edge_ids = edge_ids[order]
+        self.costs = np.concatenate([self.edge_costs, self.edge_costs])[order]
+        self.indptr = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+
+    @property
+    def nodes(self) -> Mapping[int, Node]:
+        return _ActiveNodesView(self)
+
+    @property
+    def edges(self) -> Mapping[int, Edge]:
+        return _ActiveEdgesView(self)
+
+    @property
+    def neighborhood(self) -> Mapping[int, List[int]]:
+        return _ActiveNeighborhoodView(self)
+
+    @property
+    def deactivated_nodes(self) -> Mapping[int, Tuple[Node, List[Edge]]]:
+        return _DeactivatedNodesView(self)
+
+    @property
+    def node_ids(self) -> List[Any]:
+        """Ids of the nodes, by position"""
+        if self._node_ids is None:
+            self._node_ids = self._nodes_list.ids.tolist()
+        return self._node_ids
+
+    @node_ids.setter
+    def node_ids(self, node_ids: List[Any]) -> None:
+        self._node_ids = node_ids
+        self._index_by_id = None
+
+    @property
+    def _index(self) -> Dict[Any, int]:
+        if self._index_by_id is None:
+            self._index_by_id = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        return self._index_by_id
+
+    @_index.setter
+    def _index(self, index: Dict[Any, int]) -> None:
+        self._index_by_id = index
+
+    def index_of(self, node_id: int) -> int:
+        """Position of a node in the arrays"""
+        return self._index[node_id]
+
+    def get_node(self, idx: int) -> Node:
+        return self._nodes_list[idx]
+
+    def get_edge(self, edge_id: int) -> Edge:
+        node1_idx, node2_idx = self.edge_nodes[edge_id].tolist()
+        return Edge(
+            id=edge_id,
+            nodes=[self.get_node(node1_idx), self.get_node(node2_idx)],
+            cost=self.edge_costs[edge_id].item(),
+        )
+
+    def _active_index_of(self, node_id: int) -> int:
+        idx = self._index.get(node_id)
+        if idx is None or not self.active[idx]:
+            raise KeyError(node_id)
+        return idx
+
+    @timed(DEACTIVATION)
+    def deactivate_node(self, node_id: int):
+        idx = self._active_index_of(node_id)
+        self.active[idx] = False
+        self.deactivated[idx] = True
+
+    @timed(REACTIVATION)
+    def reactivate_node(self, node_id: int):
+        idx = self._index.get(node_id)
+        if idx is None or not self.deactivated[idx]:
+            raise KeyError(
+                f"Node id [{node_id}] does not exist in the graph's deactivated nodes."
+            )
+        self.active[idx] = True
+        self.deactivated[idx] = False
+
+    def delete_node(self, node_id):
+        idx = self._active_index_of(node_id)
+        self.active[idx] = False
+
+    def enable_soft_deactivation(self) -> None:
+        raise NotImplementedError(
+            "CSR graphs already flag deactivated nodes in the `active` mask."
+        )
+
+    def make_edge(self, d: float, node1: Node, node2: Node, register=True) -> Edge:
+        raise NotImplementedError(
+            "CSR arrays can not be extended in place, build a new CSRKBNGraph instead."
+        )
+
+    def register_neighborhood(self, node1: Node, node2: Node, edge: Edge) -> None:
+        raise NotImplementedError(
+            "CSR arrays can not be extended in place, build a new CSRKBNGraph instead."
+        )
+
+    def add_nodes(self, nodes: Iterable[Node]) -> None:
+        raise NotImplementedError(
+            "CSR arrays can not be extended in place, build a new CSRKBNGraph instead."
+        )
+
+    def remove_nodes(self, node_ids: Iterable[int]) -> None:
+        raise NotImplementedError(
+            "CSR arrays can not be updated in place, delete or deactivate the nodes instead."
+        )
+
+    def active_nodes_arrays(self) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        active_idx = np.flatnonzero(self.active)
+        ids = [self.node_ids[i] for i in active_idx.tolist()]
+        coordinates = np.stack([self.x[active_idx], self.y[active_idx]], axis=1)
+        return ids, coordinates, self.scores[active_idx].astype(float)
+
+    def subgraph(self, node_ids: Iterable[int]) -> "CSRKBNSubGraph":
+        return CSRKBNSubGraph(self, node_ids)
+
+    def _spatial_index_nodes(self) -> Tuple[List[int], np.ndarray]:
+        return self.node_ids, np.stack([self.x, self.y], axis=1)
+
+    def _is_indexed_node_active(self, positions: np.ndarray) -> np.ndarray:
+        return self.active[positions]
+
+    @property
+    def mean_score(self):
+        return np.mean(self.scores[self.active])
+
+    def get_node_with_max_score(self) -> Node:
+        """Active node with the max score. Ties are resolved like KBNGraph: the last node wins."""
+        active_idx = np.flatnonzero(self.active)
+        active_scores = self.scores[active_idx]
+        last_max = len(active_scores) - 1 - np.argmax(active_scores[::-1])
+        return self.get_node(active_idx[last_max])
+
+    def get_node_regional_score(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> float:
+        """
+        node_id: Id of the node to investigate
+        k: amount of nodes to consider in scoring
+        excluded: Ids of neighbors to ignore, as if they were deactivated"""
+        idx = self._active_index_of(node_id)
+        excluded_idx = self._excluded_index(excluded)
+        return self.regional_scores(np.array([idx]), k, excluded_idx)[0].item()
+
+    def get_neighbors_regional_scores(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> Tuple[List[int], np.ndarray]:
+        idx = self._active_index_of(node_id)
+        excluded_idx = self._excluded_index(excluded)
+        neighbors_idx = self.indices[self.indptr[idx] : self.indptr[idx + 1]]
+        neighbors_idx = neighbors_idx[self._is_available(neighbors_idx, excluded_idx)]
+        neighbors_ids = [self.node_ids[i] for i in neighbors_idx.tolist()]
+        return neighbors_ids, self.regional_scores(neighbors_idx, k, excluded_idx)
+
+    def get_k_best_neighbors(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> Dict[int, float]:
+        """Returns a dictionnary with k best relative score indexed with edge_ids"""
+        idx = self._active_index_of(node_id)
+        _, entries, relative_scores = self._k_best_entries(
+            np.array([idx]), k, self._excluded_index(excluded)
+        )
+        return dict(zip(self.edge_ids[entries].tolist(), relative_scores.tolist()))
+
+    def regional_scores(
+        self, nodes_idx: np.ndarray, k: int, excluded_idx: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Regional scores of the nodes at positions `nodes_idx`, computed in one vectorized pass"""
+        segments, _, relative_scores = self._k_best_entries(nodes_idx, k, excluded_idx)
+        m = len(nodes_idx)
+        # bincount accumulates the weights in order, as the builtin sum used by KBNGraph
+        sums = np.bincount(segments, weights=relative_scores, minlength=m)
+        counts = np.bincount(segments, minlength=m)
+        return (self.scores[nodes_idx] + sums) / (counts + 1)
+
+    def _excluded_index(self, excluded: Optional[Set[int]]) -> Optional[np.ndarray]:
+        if not excluded:
+            return None
+        return np.array(
+            [self._index[node_id] for node_id in excluded if node_id in self._index],
+            dtype=np.intp,
+        )
+
+    def _is_available(
+        self, nodes_idx: np.ndarray, excluded_idx: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Mask of the nodes which are active and not excluded"""
+        is_available = self.active[nodes_idx]
+        if excluded_idx is not None and len(excluded_idx):
+            is_available &= ~np.isin(nodes_idx, excluded_idx)
+        return is_available
+
+    @property
+    def max_cost(self) -> float:
+        return self._max_cost
+
+    @max_cost.setter
+    def max_cost(self, max_cost: float) -> None:
+        self._max_cost = max_cost
+        self._ranking = None
+
+    @property
+    def scores(self) -> np.ndarray:
+        """Read-only scores of the nodes. Assign new scores to refresh the ranked neighbors."""
+        return self._scores
+
+    @scores.setter
+    def scores(self, scores: np.ndarray) -> None:
+        scores = np.asarray(scores)
+        if scores.flags.writeable:
+            scores = scores.view()
+            scores.flags.writeable = False
+        self._scores = scores
+        self._ranking = None
+
+    def ranked_neighbors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        CSR entries of each node sorted by decreasing relative score, then edge id, with their
+        relative scores. The ranked entries of the node at position `i` are in
+        `indptr[i]:indptr[i + 1]`, like its neighbors.
+        Ranked once for all nodes, then again only when `max_cost` or `scores` are assigned.
+        """
+        if self._ranking is None:
+            n_entries = len(self.indices)
+            rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+            relative_scores = (
+                self.scores[self.indices] * (1 - self.costs / self.max_cost)
+                if n_entries
+                else np.empty(0)
+            )
+            order = np.lexsort((np.arange(n_entries), -relative_scores, rows))
+            dtype = np.int32 if n_entries < np.iinfo(np.int32).max else np.intp
+            self._ranking = order.astype(dtype), relative_scores[order]
+        return self._ranking
+
+    def _k_best_entries(
+        self, nodes_idx: np.ndarray, k: int, excluded_idx: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Select, for each node of `nodes_idx`, the CSR entries of its k active and not excluded neighbors
+        with the best relative scores. Ties are resolved by edge id, like `heapq.nlargest`.
+        Ranked neighbors are walked by growing prefixes until k available ones are found.
+        Returns the position in `nodes_idx` of each selected entry, the entries and their relative scores,
+        sorted by node then edge id.
+        """
+        ranked_entries, ranked_scores = self.ranked_neighbors()
+        starts = self.indptr[nodes_idx]
+        lengths = self.indptr[nodes_idx + 1] - starts
+        scanned = np.zeros(len(nodes_idx), dtype=np.intp)
+        found = np.zeros(len(nodes_idx), dtype=np.intp)
+        pending = np.flatnonzero(lengths > 0) if k > 0 else np.empty(0, dtype=np.intp)
+        prefix = 2 * k
+        selected_segments, selected_positions = [], []
+        while len(pending):
+            takes = np.minimum(lengths[pending] - scanned[pending], prefix)
+            segments, positions = _ranges(starts[pending] + scanned[pending], takes)
+            segments = pending[segments]
+
+            is_available = self._is_available(
+                self.indices[ranked_entries[positions]], excluded_idx
+            )
+            available_before = np.cumsum(is_available) - is_available
+            segment_first = np.cumsum(takes) - takes
+            ranks = (
+                found[segments]
+                + available_before
+                - np.repeat(available_before[segment_first], takes)
+            )
+            is_selected = is_available & (ranks < k)
+            selected_segments.append(segments[is_selected])
+            selected_positions.append(positions[is_selected])
+
+            found += np.bincount(segments[is_selected], minlength=len(nodes_idx))
+            scanned[pending] += takes
+            pending = pending[
+                (found[pending] < k) & (scanned[pending] < lengths[pending])
+            ]
+            prefix *= 4
+
+        if not selected_segments:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty, np.empty(0)
+        segments = np.concatenate(selected_segments)
+        positions = np.concatenate(selected_positions)
+        entries = ranked_entries[positions].astype(np.intp)
+        order = np.lexsort((entries, segments))
+        return segments[order], entries[order], ranked_scores[positions][order]
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenated ranges `starts[i]:starts[i] + lengths[i]`, with the range number of each value"""
+    segments = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return segments, np.arange(len(segments)) + offsets
+
+
+class CSRKBNSubGraph(CSRKBNGraph, KBNSubGraph):
+    """
+    Subgraph sharing the arrays of its parent CSRKBNGraph. It is defined by its own `active` mask,
+    restricted to the selected nodes: deactivating its nodes neither copies nor modifies the parent.
+    Parent nodes deactivated after the creation of the subgraph stay active in the subgraph.
+    """
+
+    def __init__(self, parent_graph: CSRKBNGraph, node_ids: Iterable[int]):
+        self.parent = parent_graph.id
+        self.max_cost = parent_graph.max_cost
+        self.edge_cost_offset = parent_graph.edge_cost_offset
+        self.distance = parent_graph.distance
+        self._cost_fun = parent_graph._cost_fun
+        self.n_neighbors = parent_graph.n_neighbors
+
+        for name in CSR_ARRAYS:
+            setattr(self, name, getattr(parent_graph, name))
+        self.node_ids = parent_graph.node_ids
+        self._index = parent_graph._index
+        self._nodes_list = parent_graph._nodes_list
+        self._ranking = parent_graph.ranked_neighbors()
+        if parent_graph._spatial_index is not None:
+            self._spatial_index = parent_graph._spatial_index
+            self._spatial_index_ids = parent_graph._spatial_index_ids
+
+        nodes_idx = np.array(
+            [parent_graph._active_index_of(node_id) for node_id in node_ids],
+            dtype=np.intp,
+        )
+        self.active = np.zeros(len(self.node_ids), dtype=bool)
+        self.active[nodes_idx] = True
+        self.deactivated = np.zeros(len(self.node_ids), dtype=bool)
+
+
+class _ActiveNodesView(Mapping):
+    def __init__(self, graph: CSRKBNGraph):
+        self._graph = graph
+
+    def __getitem__(self, node_id: int) -> Node:
+        return self._graph.get_node(self._graph._active_index_of(node_id))
+
+    def __iter__(self) -> Iterator[int]:
+        node_ids = self._graph.node_ids
+        return (node_ids[i] for i in np.flatnonzero(self._graph.active).tolist())
+
+    def __len__(self) -> int:
+        return int(self._graph.active.sum())
+
+    def __contains__(self, node_id) -> bool:
+        idx = self._graph._index.get(node_id)
+        return idx is not None and bool(self._graph.active[idx])
+
+
+class _ActiveEdgesView(Mapping):
+    def __init__(self, graph: CSRKBNGraph):
+        self._graph = graph
+
+    def _is_active(self, edge_id: int) -> bool:
+        if not 0 <= edge_id < len(self._graph.edge_costs):
+            return False
+        return bool(self._graph.active[self._graph.edge_nodes[edge_id]].all())
+
+    def __getitem__(self, edge_id: int) -> Edge:
+        if not self._is_active(edge_id):
+            raise KeyError(edge_id)
+        return self._graph.get_edge(edge_id)
+
+    def __iter__(self) -> Iterator[int]:
+        active_edges = self._graph.active[self._graph.edge_nodes].all(axis=1)
+        return iter(np.flatnonzero(active_edges).tolist())
+
+    def __len__(self) -> int:
+        return int(self._graph.active[self._graph.edge_nodes].all(axis=1).sum())
+
+    def __contains__(self, edge_id) -> bool:
+        return isinstance(edge_id, (int, np.integer)) and self._is_active(edge_id)
+
+
+class _ActiveNeighborhoodView(Mapping):
+    def __init__(self, graph: CSRKBNGraph):
+        self._graph = graph
+
+    def __getitem__(self, node_id: int) -> List[int]:
+        graph = self._graph
+        idx = graph._active_index_of(node_id)
+        entries = slice(graph.indptr[idx], graph.indptr[idx + 1])
+        is_active = graph.active[graph.indices[entries]]
+        return graph.edge_ids[entries][is_active].tolist()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(_ActiveNodesView(self._graph))
+
+    def __len__(self) -> int:
+        return int(self._graph.active.sum())
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in _ActiveNodesView(self._graph)
+
+
+class _DeactivatedNodesView(Mapping):
+    def __init__(self, graph: CSRKBNGraph):
+        self._graph = graph
+
+    def __getitem__(self, node_id: int) -> Tuple[Node, List[Edge]]:
+        graph = self._graph
+        idx = graph._index.get(node_id)
+        if idx is None or not graph.deactivated[idx]:
+            raise KeyError(node_id)
+        entries = slice(graph.indptr[idx], graph.indptr[idx + 1])
+        is_active = graph.active[graph.indices[entries]]
+        related_edges = [
+            graph.get_edge(edge_id)
+            for edge_id in graph.edge_ids[entries][is_active].tolist()
+        ]
+        return graph.get_node(idx), related_edges
+
+    def __iter__(self) -> Iterator[int]:
+        node_ids = self._graph.node_ids
+        return (node_ids[i] for i in np.flatnonzero(self._graph.deactivated).tolist())
+
+    def __len__(self) -> int:
+        return int(self._graph.deactivated.sum())
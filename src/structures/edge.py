@@ -1,30 +1,42 @@
-from dataclasses import dataclass
 from typing import Dict, Tuple, Type
 
 from src.metrics.scores import node_relative_score
 from src.structures.node import Node
 
 
-@dataclass
 class Edge:
-    id: int
-    nodes: Tuple[Type[Node]]
-    cost: float
+    """Edge between two nodes. Node lookups compare ids and allocate nothing."""
+
+    __slots__ = ("id", "nodes", "cost")
+
+    def __init__(self, id: int, nodes: Tuple[Type[Node]], cost: float):
+        self.id = id
+        self.nodes = nodes
+        self.cost = cost
 
     @property
     def node_dict(self) -> Dict[int, Node]:
         return {node.id: node for node in self.nodes}
 
     def get_node(self, node_id: int) -> Node:
-        return self.node_dict[node_id]
+        node1, node2 = self.nodes
+        if node1.id == node_id:
+            return node1
+        if node2.id == node_id:
+            return node2
+        raise KeyError(node_id)
 
     def has_node(self, node_id: int) -> bool:
-        return node_id in [node.id for node in self.nodes]
+        node1, node2 = self.nodes
+        return node1.id == node_id or node2.id == node_id
 
     def get_dest_node(self, origin_node_id: int) -> Node:
-        d = self.node_dict.copy()
-        del d[origin_node_id]
-        return list(d.values())[0]
+        node1, node2 = self.nodes
+        if node1.id == origin_node_id:
+            return node2
+        if node2.id == origin_node_id:
+            return node1
+        raise KeyError(origin_node_id)
 
     def get_dest_relative_score(self, origin_node_id: int, max_cost: float) -> float:
         dest_node = self.get_dest_node(origin_node_id)
@@ -40,3 +52,12 @@ class Edge:
 
     def __hash__(self):
         return hash((self.id, self.nodes[0], self.nodes[1], self.cost))
+
+    def __repr__(self) -> str:
+        return f"Edge(id={self.id!r}, nodes={self.nodes!r}, cost={self.cost!r})"
+
+    def __getstate__(self):
+        return self.id, self.nodes, self.cost
+
+    def __setstate__(self, state) -> None:
+        self.id, self.nodes, self.cost = state
@@ -1,40 +1,114 @@
 import heapq
-from functools import cached_property
-from typing import Dict, Iterable, List, Optional, Tuple, Type
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import numpy as np
-import pandas as pd
 
-from src.metrics.distances import get_distance
+from src.metrics.distances import (
+    get_batched_distance,
+    get_distance,
+    get_index_space,
+    get_pairs_query,
+    paired_distances,
+)
+from src.spatial.find import get_coordinates_bounding_box
+from src.spatial.index import (
+    NearestNodeIndex,
+    query_k_nearest_pairs,
+    query_k_nearest_pairs_by_blocks,
+    query_pairs_within,
+    query_pairs_within_by_blocks,
+)
 from src.structures.abc import BaseKBNGraph
+from src.structures.cache import RankedNeighbor, RegionalScoreCache
 from src.structures.edge import Edge
 from src.structures.node import Node
+from src.structures.node_table import NodeTable, NodeTableMapping
+from src.structures.views import (
+    ActiveEdgesView,
+    ActiveNeighborhoodView,
+    ActiveNodesView,
+    DeactivatedNodesView,
+)
+from src.utils.profiling import DEACTIVATION, EDGE_BUILD, REACTIVATION, increment, timed
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class KBNGraph(BaseKBNGraph):
     parent: Optional[int] = None
+    soft_deactivation: bool = False
+    node_table: Optional[NodeTable] = None
+    n_neighbors: Optional[int] = None
+    _spatial_index: Optional[NearestNodeIndex] = None
+    # Id of the next edge created, edges ids are never reused
+    _next_edge_id: int = 0
+    # Ids of the nodes removed since the spatial index was built
+    _stale_index_ids: Set[int] = frozenset()
+    # True when `max_cost` is the cost of the most expensive edge of a complete graph
+    _derived_max_cost: bool = False
+    # Incremented when nodes are added or removed, for the data cached by node id outside of the graph
+    nodes_version: int = 0
 
     def __init__(
         self,
-        nodes_list: List[Node],
+        nodes_list: Union[List[Node], NodeTable],
         distance: str = "euclidian",
         max_cost: Optional[float] = None,
         edge_cost_offset: Optional[float] = None,
+        soft_deactivation: bool = False,
+        n_neighbors: Optional[int] = None,
     ):
+        """
+        nodes_list: Nodes of the graph. With a NodeTable, Node objects are only created when accessed
+        or when they are part of an edge.
+        soft_deactivation: Deactivate nodes by flagging them as inactive instead of removing them and
+        their edges from `nodes`, `edges` and `neighborhood`, which become read-only views of the active nodes.
+        n_neighbors: Without `max_cost`, connect each node to its `n_neighbors` nearest nodes only,
+        instead of building a complete graph. `max_cost` is derived from these edges.
+        """
         self.max_cost = max_cost
+        self.n_neighbors = self._check_n_neighbors(n_neighbors, max_cost)
         self.edge_cost_offset = edge_cost_offset if edge_cost_offset is not None else 0
+        self.distance = distance
         self._cost_fun = get_distance(distance)
 
-        self.nodes: Dict[int, Type[Node]] = {node.id: node for node in nodes_list}
+        self.node_table = nodes_list if isinstance(nodes_list, NodeTable) else None
+        self.nodes: Dict[int, Type[Node]] = (
+            NodeTableMapping(self.node_table)
+            if self.node_table is not None
+            else {node.id: node for node in nodes_list}
+        )
         self.neighborhood = {node_id: [] for node_id in self.nodes}
         self.edges: Dict[int, Type[Edge]] = {}
         self.deactivated_nodes: Dict[int, Tuple[Type[Node], List[Type[Edge]]]] = {}
+        self.regional_score_cache = RegionalScoreCache()
+        # Position of each node in the order the nodes were given to the graph, which defines the edges ids.
+        # The nodes of a NodeTable are at their row instead.
+        self._node_ranks: Dict[int, int] = (
+            {} if self.node_table is not None else _ranks_by_id(self.nodes)
+        )
+        self._next_node_rank = len(self.nodes)
         self.build_egdes()
+        if soft_deactivation:
+            self.enable_soft_deactivation()
 
     @property
     def id(self):
         return id(self)
 
+    @timed(EDGE_BUILD)
     def build_egdes(self) -> Dict[int, Type[Edge]]:
         """
         Build a dictionary of edge_id (key) and Edge objects (values).
@@ -52,75 +126,289 @@ class KBNGraph(BaseKBNGraph):
             edges = self._build_edges_with_max_cost()
         return edges
 
+    def _nodes_sequence(self) -> Sequence[Node]:
+        """Nodes of the graph, in the order defining the edges ids"""
+        if self.node_table is not None:
+            return self.node_table
+        return list(self.nodes.values())
+
     def _build_edges_with_max_cost(self) -> None:
-        n = len(self.nodes)
-        mask = np.tri(n) - np.eye(n)
+        nodes = self._nodes_sequence()
+        self._register_edges(nodes, *self._find_edges_with_max_cost(nodes))
 
-        for i, node1 in enumerate(self.nodes.values()):
-            for j, node2 in enumerate(self.nodes.values()):
-                if mask[i][j]:
-                    d = self._cost_fun(node1, node2) + self.edge_cost_offset
-                    if d < self.max_cost:
-                        edge = self.make_edge(d, node1, node2)
-                        self.register_neighborhood(node1, node2, edge)
+    @staticmethod
+    def _check_n_neighbors(
+        n_neighbors: Optional[int], max_cost: Optional[float]
+    ) -> Optional[int]:
+        if n_neighbors is None:
+            return None
+        if max_cost is not None:
+            raise ValueError("n_neighbors can only be used without max_cost.")
+        if n_neighbors < 1:
+            raise ValueError(f"n_neighbors must be positive, got {n_neighbors}.")
+        return n_neighbors
 
     def _build_edges_without_max_cost(self) -> None:
         """
         Building edges and setting the max edge cost values as class attribute
         """
-        max_cost = 0
-        n = len(self.nodes)
-        mask = np.tri(n) - np.eye(n)
+        nodes = self._nodes_sequence()
+        node1_idx, node2_idx, costs = self._find_unbounded_edges(nodes)
+        self._register_edges(nodes, node1_idx, node2_idx, costs)
+        self.max_cost = costs.max() if len(costs) else 0
+        self._derived_max_cost = True
+
+    def _find_edges_with_max_cost(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the node pairs closer than `max_cost - edge_cost_offset` with the pairs query of the distance,
+        else with a KD-tree when the distance registered an index space, else with the batched distance
+        by blocks of rows.
+        Returns the positions in `nodes` of both ends of each edge and their costs, in the
+        same order than a pairwise comparison of the nodes: (i, j) with j < i, sorted by i then j.
+        This order defines the edges ids.
+        """
+        pairs_query = get_pairs_query(self.distance)
+        index_space = get_index_space(self.distance)
+        batched_distance = get_batched_distance(self.distance)
+        if pairs_query is None and index_space is None and batched_distance is None:
+            return self._find_edges_with_max_cost_pairwise(nodes)
+
+        coordinates = self._coordinates_array(nodes)
+        radius = self.max_cost - self.edge_cost_offset
+        if pairs_query is not None:
+            i, j = pairs_query(coordinates, radius)
+        elif index_space is not None:
+            points, p, index_radius = index_space(coordinates, radius)
+            i, j = query_pairs_within(points, index_radius, p=p)
+        else:
+            i, j = query_pairs_within_by_blocks(coordinates, radius, batched_distance)
+
+        costs = self._pairs_costs(nodes, coordinates, i, j)
+        in_range = costs < self.max_cost
+        i, j, costs = i[in_range], j[in_range], costs[in_range]
+
+        order = np.lexsort((j, i))
+        return i[order], j[order], costs[order]
+
+    def _find_edges_with_max_cost_pairwise(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        node1_idx, node2_idx, costs = self._find_edges_without_max_cost(nodes)
+        in_range = costs < self.max_cost
+        return node1_idx[in_range], node2_idx[in_range], costs[in_range]
+
+    def _find_unbounded_edges(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Edges of a graph without max cost: every pair of nodes, or the nearest neighbors of each node"""
+        if self.n_neighbors is None:
+            return self._find_edges_without_max_cost(nodes)
+        return self._find_nearest_neighbors_edges(nodes)
+
+    def _find_nearest_neighbors_edges(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Pairs of nodes where one node is among the `n_neighbors` nearest of the other, found with a KD-tree
+        when the distance registered an index space, else by blocks of rows. In the same order than
+        `_find_edges_with_max_cost`, for O(n * n_neighbors) edges.
+        """
+        coordinates = self._coordinates_array(nodes)
+        index_space = get_index_space(self.distance)
+        if index_space is not None:
+            points, p, _ = index_space(coordinates, 0.0)
+            i, j = query_k_nearest_pairs(points, self.n_neighbors, p=p)
+        else:
+            i, j = query_k_nearest_pairs_by_blocks(
+                coordinates, self.n_neighbors, self.distance
+            )
+        return i, j, self._pairs_costs(nodes, coordinates, i, j)
+
+    def _find_edges_without_max_cost(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every pair of nodes, in the same order than `_find_edges_with_max_cost`."""
+        i, j = np.tril_indices(len(nodes), k=-1)
+        return i, j, self._pairs_costs(nodes, self._coordinates_array(nodes), i, j)
+
+    def _pairs_costs(
+        self, nodes: List[Node], coordinates: np.ndarray, i: np.ndarray, j: np.ndarray
+    ) -> np.ndarray:
+        """Edge costs of the (i, j) pairs. The scalar distance is only used without a batched form."""
+        if get_batched_distance(self.distance) is not None:
+            costs = paired_distances(self.distance, coordinates[i], coordinates[j])
+        else:
+            costs = np.array(
+                [
+                    self._cost_fun(nodes[node1_idx], nodes[node2_idx])
+                    for node1_idx, node2_idx in zip(i.tolist(), j.tolist())
+                ],
+                dtype=float,
+            )
+        return costs + self.edge_cost_offset
 
-        for i, node1 in enumerate(self.nodes.values()):
-            for j, node2 in enumerate(self.nodes.values()):
-                if mask[i][j]:
-                    d = self._cost_fun(node1, node2) + self.edge_cost_offset
-                    edge = self.make_edge(d, node1, node2)
-                    self.register_neighborhood(node1, node2, edge)
-                    if d > max_cost:
-                        max_cost = d
+    @staticmethod
+    def _coordinates_array(nodes: Sequence[Node]) -> np.ndarray:
+        if isinstance(nodes, NodeTable):
+            return nodes.coordinates
+        return np.array([[node.x, node.y] for node in nodes], dtype=float).reshape(
+            -1, 2
+        )
 
-        self.max_cost = max_cost
+    def _register_edges(
+        self,
+        nodes: List[Node],
+        node1_idx: np.ndarray,
+        node2_idx: np.ndarray,
+        costs: np.ndarray,
+    ) -> None:
+        increment("edges", len(costs))
+        for i, j, d in zip(node1_idx.tolist(), node2_idx.tolist(), costs.tolist()):
+            node1, node2 = nodes[i], nodes[j]
+            edge = self.make_edge(d, node1, node2)
+            self.register_neighborhood(node1, node2, edge)
 
     def make_edge(
         self, d: float, node1: Type[Node], node2: Type[Node], register=True
     ) -> Type[Edge]:
-        edge_id = len(self.edges)
+        edge_id = self._next_edge_id
         edge = Edge(id=edge_id, nodes=[node1, node2], cost=d)
         if register:
-            self.edges[edge_id] = edge
+            self._edges_store[edge_id] = edge
+            self._next_edge_id += 1
         return edge
 
     def register_neighborhood(
         self, node1: Type[Node], node2: Type[Node], edge: Type[Edge]
     ) -> None:
+        if self.soft_deactivation:
+            for node, dest_node in [(node1, node2), (node2, node1)]:
+                self._all_neighborhood[node.id].append(edge.id)
+                self._neighbors_ids[node.id].append(dest_node.id)
+            return
         self.neighborhood[node1.id].append(edge.id)
         self.neighborhood[node2.id].append(edge.id)
 
+    def enable_soft_deactivation(self) -> None:
+        """
+        Switch to soft deactivation: nodes are deactivated and reactivated by flagging them in a set of
+        inactive ids, in O(1) plus the invalidation of the regional score cache of their neighbors.
+        `nodes`, `edges`, `neighborhood` and `deactivated_nodes` become read-only views skipping the
+        inactive nodes, so they keep returning the same content than with hard deactivation.
+        """
+        if self.soft_deactivation:
+            return
+        if self.deactivated_nodes:
+            raise ValueError(
+                "Soft deactivation must be enabled before deactivating any node."
+            )
+        self._all_nodes = self.nodes
+        self._all_edges = self.edges
+        self._all_neighborhood = self.neighborhood
+        self._neighbors_ids = {
+            node_id: [
+                self._all_edges[edge_id].get_dest_node(node_id).id
+                for edge_id in edges_ids
+            ]
+            for node_id, edges_ids in self._all_neighborhood.items()
+        }
+        self._inactive_ids: Set[int] = set()
+        self._deactivated_ids: Set[int] = set()
+
+        self.nodes = ActiveNodesView(self._all_nodes, self._inactive_ids)
+        self.edges = ActiveEdgesView(self._all_edges, self._inactive_ids)
+        self.neighborhood = ActiveNeighborhoodView(
+            self._all_neighborhood, self._neighbors_ids, self._inactive_ids
+        )
+        self.deactivated_nodes = DeactivatedNodesView(
+            self._all_nodes,
+            self._all_edges,
+            self._all_neighborhood,
+            self._deactivated_ids,
+            self._inactive_ids,
+        )
+        self.soft_deactivation = True
+
+    @property
+    def _edges_store(self) -> Dict[int, Type[Edge]]:
+        """Every edge of the graph, including the edges of soft deactivated nodes"""
+        return self._all_edges if self.soft_deactivation else self.edges
+
+    @timed(DEACTIVATION)
     def deactivate_node(self, node_id: int):
+        if self.soft_deactivation:
+            self._flag_inactive(node_id)
+            self._deactivated_ids.add(node_id)
+            return
 
         node = self.nodes[node_id]
         related_edges = [self.edges[edge_id] for edge_id in self.neighborhood[node_id]]
         self.deactivated_nodes[node_id] = (node, related_edges)
         self.delete_node(node_id)
 
+    @timed(REACTIVATION)
     def reactivate_node(self, node_id: int):
+        if self.soft_deactivation:
+            return self._reactivate_flagged_node(node_id)
+
         try:
-            node, related_edges = self.deactivated_nodes[node_id]
-            self.nodes[node_id] = node
-            for edge in related_edges:
-                dest_node = edge.get_dest_node(node_id)
+            node, related_edges = self.deactivated_nodes.pop(node_id)
+        except KeyError:
+            raise KeyError(
+                f"Node id [{node_id}] does not exist in the graph's deactivated nodes."
+            )
+
+        self.nodes[node_id] = node
+        self.neighborhood[node_id] = []
+        restored_neighbors_ids = []
+        for edge in related_edges:
+            dest_node = edge.get_dest_node(node_id)
+            if dest_node.id in self.nodes:
                 self.edges[edge.id] = edge
                 self.register_neighborhood(node, dest_node, edge)
-            self.neighborhood[node_id] = [edge.id for edge in related_edges]
-            del self.deactivated_nodes[node_id]
-        except KeyError:
+                restored_neighbors_ids.append(dest_node.id)
+            elif dest_node.id in self.deactivated_nodes:
+                # Restored with the neighbor when it is reactivated
+                self.deactivated_nodes[dest_node.id][1].append(edge)
+        self.regional_score_cache.invalidate([node_id, *restored_neighbors_ids])
+
+    def _reactivate_flagged_node(self, node_id: int) -> None:
+        if node_id not in self._deactivated_ids:
             raise KeyError(
                 f"Node id [{node_id}] does not exist in the graph's deactivated nodes."
             )
+        self._deactivated_ids.discard(node_id)
+        self._inactive_ids.discard(node_id)
+        self.regional_score_cache.invalidate(
+            [
+                node_id,
+                *[
+                    neighbor_id
+                    for neighbor_id in self._neighbors_ids[node_id]
+                    if neighbor_id not in self._inactive_ids
+                ],
+            ]
+        )
+
+    def _flag_inactive(self, node_id: int) -> None:
+        if node_id not in self.nodes:
+            raise KeyError(node_id)
+        self._inactive_ids.add(node_id)
+
+        self.regional_score_cache.invalidate([node_id])
+        for edge_id, neighbor_id in zip(
+            self._all_neighborhood[node_id], self._neighbors_ids[node_id]
+        ):
+            if neighbor_id not in self._inactive_ids:
+                self.regional_score_cache.discard_neighbor(neighbor_id, edge_id)
 
     def delete_node(self, node_id):
+        if self.soft_deactivation:
+            # Deleted nodes stay flagged as inactive and can not be reactivated
+            return self._flag_inactive(node_id)
+
         # Delete node
         del self.nodes[node_id]
 
@@ -142,6 +430,232 @@ class KBNGraph(BaseKBNGraph):
             neighbor_edges.remove(edge_id)
             self.neighborhood[neighbor_id] = neighbor_edges
 
+        # Only the regional scores of the neighbors ranking this node among their k best change
+        self.regional_score_cache.invalidate([node_id])
+        for neighbor_id, edge_id in related_neighbors:
+            self.regional_score_cache.discard_neighbor(neighbor_id, edge_id)
+
+    def add_nodes(self, nodes: Sequence[Node]) -> None:
+        """
+        Add nodes to the graph and connect them to the nodes closer than `max_cost`, deactivated ones included.
+        The existing nodes in range are found with the spatial index, and the new edges are appended to
+        `edges` and `neighborhood` in place, with the same ids than if the graph was built with the new nodes
+        at the end. Only the regional scores of the neighbors of the new nodes are invalidated.
+        When `max_cost` was derived from a complete graph, new nodes are connected to every node and
+        `max_cost` is derived again.
+        """
+        if self.n_neighbors is not None:
+            raise NotImplementedError(
+                "Nodes can not be added to a nearest neighbors graph, build a new graph instead."
+            )
+        nodes = list(nodes)
+        new_ids = [node.id for node in nodes]
+        if len(set(new_ids)) != len(new_ids):
+            raise ValueError("Added nodes ids must be unique.")
+        existing_ids = [
+            node_id for node_id in new_ids if self._get_known_node(node_id) is not None
+        ]
+        if existing_ids:
+            raise ValueError(f"Nodes ids {existing_ids} already exist in the graph.")
+        if not nodes:
+            return
+
+        # Removed nodes stay in the spatial index, the nodes added again with their ids need a new one
+        if self._stale_index_ids.intersection(new_ids):
+            self.invalidate_spatial_index()
+        node1_idx, node2_idx, costs, neighbors = self._find_new_edges(nodes)
+
+        nodes_store = self._all_nodes if self.soft_deactivation else self.nodes
+        for node in nodes:
+            nodes_store[node.id] = node
+            self._node_ranks[node.id] = self._next_node_rank
+            self._next_node_rank += 1
+            if self.soft_deactivation:
+                self._all_neighborhood[node.id] = []
+                self._neighbors_ids[node.id] = []
+            else:
+                self.neighborhood[node.id] = []
+
+        increment("edges", len(costs))
+        updated_ids = set()
+        for i, j, d in zip(node1_idx.tolist(), node2_idx.tolist(), costs.tolist()):
+            node1, node2 = nodes[i], neighbors[j]
+            edge = self.make_edge(d, node1, node2, register=False)
+            self._next_edge_id += 1
+            if not self.soft_deactivation and node2.id in self.deactivated_nodes:
+                # Restored with the neighbor when it is reactivated
+                self.deactivated_nodes[node2.id][1].append(edge)
+                continue
+            self._edges_store[edge.id] = edge
+            self.register_neighborhood(node1, node2, edge)
+            updated_ids.add(node2.id)
+
+        if self._spatial_index is not None:
+            self._spatial_index.extend(self._coordinates_array(nodes))
+            self._spatial_index_ids.extend(new_ids)
+        if self._derived_max_cost and len(costs):
+            self._update_derived_max_cost(max(self.max_cost, costs.max()))
+        self.regional_score_cache.invalidate(updated_ids)
+        self.nodes_version += 1
+
+    def _find_new_edges(
+        self, nodes: List[Node]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[Node]]:
+        """
+        Edges of the new `nodes`: positions in `nodes` of their first end, positions in the returned neighbors
+        of their second end and costs, sorted like `_find_edges_with_max_cost`.
+        Neighbors are the existing nodes in range of the new nodes, in the order they were given to the graph,
+        followed by the new nodes.
+        """
+        coordinates = self._coordinates_array(nodes)
+        spatial_index = self.spatial_index
+        if self._derived_max_cost:
+            node_idx, index_positions = np.divmod(
+                np.arange(len(nodes) * len(spatial_index)), max(len(spatial_index), 1)
+            )
+        else:
+            node_idx, index_positions = spatial_index.query_within(
+                coordinates, self.max_cost - self.edge_cost_offset
+            )
+
+        # Existing nodes in range, by position in the spatial index
+        candidates = np.unique(index_positions)
+        neighbors = [
+            self._get_known_node(self._spatial_index_ids[i])
+            for i in candidates.tolist()
+        ]
+        known = np.array([node is not None for node in neighbors], dtype=bool)
+        neighbors = [node for node in neighbors if node is not None]
+        # The spatial index lists deactivated and reactivated nodes out of their original order
+        by_rank = np.argsort(
+            self._ranks_of([node.id for node in neighbors]), kind="stable"
+        )
+        neighbors = [neighbors[i] for i in by_rank.tolist()]
+        neighbors_idx = np.full(len(known), -1, dtype=np.intp)
+        neighbors_idx[np.flatnonzero(known)[by_rank]] = np.arange(len(neighbors))
+        neighbor_idx = neighbors_idx[np.searchsorted(candidates, index_positions)]
+        in_graph = neighbor_idx >= 0
+        node_idx, neighbor_idx = node_idx[in_graph], neighbor_idx[in_graph]
+
+        pair_nodes = nodes + neighbors
+        pair_coordinates = np.concatenate(
+            [coordinates, spatial_index.coordinates[candidates[known][by_rank]]]
+        )
+        costs = self._pairs_costs(
+            pair_nodes, pair_coordinates, node_idx, neighbor_idx + len(nodes)
+        )
+        if self._derived_max_cost:
+            new_node1_idx, new_node2_idx, new_costs = self._find_edges_without_max_cost(
+                nodes
+            )
+        else:
+            in_range = costs < self.max_cost
+            node_idx, neighbor_idx, costs = (
+                node_idx[in_range],
+                neighbor_idx[in_range],
+                costs[in_range],
+            )
+            new_node1_idx, new_node2_idx, new_costs = self._find_edges_with_max_cost(
+                nodes
+            )
+        node1_idx = np.concatenate([node_idx, new_node1_idx]).astype(np.intp)
+        node2_idx = np.concatenate(
+            [neighbor_idx, new_node2_idx + len(neighbors)]
+        ).astype(np.intp)
+        costs = np.concatenate([costs, new_costs])
+        order = np.lexsort((node2_idx, node1_idx))
+        return node1_idx[order], node2_idx[order], costs[order], neighbors + nodes
+
+    def remove_nodes(self, node_ids: Iterable[int]) -> None:
+        """
+        Remove nodes, active or deactivated, and their edges from both of their ends.
+        Unlike deactivated nodes, removed nodes can not be reactivated. Only the regional scores of
+        the neighbors ranking a removed node among their k best are invalidated.
+        When `max_cost` was derived from a complete graph, it is derived again from the remaining edges.
+        """
+        node_ids = list(dict.fromkeys(node_ids))
+        unknown_ids = [
+            node_id for node_id in node_ids if self._get_known_node(node_id) is None
+        ]
+        if unknown_ids:
+            raise KeyError(f"Nodes ids {unknown_ids} do not exist in the graph.")
+
+        if self.soft_deactivation:
+            for node_id in node_ids:
+                self._remove_flagged_node(node_id)
+        else:
+            for node_id in node_ids:
+                if node_id in self.deactivated_nodes:
+                    del self.deactivated_nodes[node_id]
+                else:
+                    self.delete_node(node_id)
+            # Edges to deactivated nodes are kept by their entry of `deactivated_nodes`
+            removed = set(node_ids)
+            for _, related_edges in self.deactivated_nodes.values():
+                related_edges[:] = [
+                    edge
+                    for edge in related_edges
+                    if not any(node.id in removed for node in edge.nodes)
+                ]
+
+        for node_id in node_ids:
+            self._node_ranks.pop(node_id, None)
+        if self._spatial_index is not None:
+            self._stale_index_ids = self._stale_index_ids.union(node_ids)
+        if self._derived_max_cost:
+            self._update_derived_max_cost(
+                max((edge.cost for edge in self._known_edges()), default=0)
+            )
+        self.nodes_version += 1
+
+    def _remove_flagged_node(self, node_id: int) -> None:
+        if node_id not in self._inactive_ids:
+            self._flag_inactive(node_id)
+        self._inactive_ids.discard(node_id)
+        self._deactivated_ids.discard(node_id)
+        for edge_id, neighbor_id in zip(
+            self._all_neighborhood.pop(node_id), self._neighbors_ids.pop(node_id)
+        ):
+            del self._all_edges[edge_id]
+            position = self._all_neighborhood[neighbor_id].index(edge_id)
+            del self._all_neighborhood[neighbor_id][position]
+            del self._neighbors_ids[neighbor_id][position]
+        del self._all_nodes[node_id]
+
+    def _ranks_of(self, node_ids: List[int]) -> np.ndarray:
+        return np.array(
+            [
+                self._node_ranks[node_id]
+                if node_id in self._node_ranks
+                else self.node_table.index_of(node_id)
+                for node_id in node_ids
+            ],
+            dtype=np.int64,
+        )
+
+    def _update_derived_max_cost(self, max_cost: float) -> None:
+        """Relative scores depend on `max_cost`: every regional score is invalidated when it changes"""
+        if max_cost == self.max_cost:
+            return
+        self.max_cost = max_cost
+        self.regional_score_cache.clear()
+
+    def _get_known_node(self, node_id: int) -> Optional[Node]:
+        """Active or deactivated node of the graph, None when the graph does not know it"""
+        if self.soft_deactivation:
+            return self._all_nodes.get(node_id)
+        node = self.nodes.get(node_id)
+        if node is None and node_id in self.deactivated_nodes:
+            node = self.deactivated_nodes[node_id][0]
+        return node
+
+    def _known_edges(self) -> Iterable[Type[Edge]]:
+        """Every edge of the graph, including the edges of deactivated nodes"""
+        yield from self._edges_store.values()
+        if not self.soft_deactivation:
+            for _, related_edges in self.deactivated_nodes.values():
+                yield from related_edges
+
     @property
     def mean_score(self):
         return np.mean([node.score for node in self.nodes.values()])
@@ -151,14 +665,54 @@ class KBNGraph(BaseKBNGraph):
         max_score = max(list(node_score_dict.keys()))
         return node_score_dict[max_score]
 
-    def get_node_regional_score(self, node_id: int, k: int = 10) -> float:
+    def get_node_regional_score(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> float:
         """
         node_id: Id of the node to investigate
-        k: amount of nodes to consider in scoring"""
-        k_best_neighbors_relative_scores = self.get_k_best_neighbors(node_id, k)
-        return self.regional_score(
-            self.nodes[node_id], k_best_neighbors_relative_scores.values()
+        k: amount of nodes to consider in scoring
+        excluded: Ids of neighbors to ignore, as if they were deactivated"""
+        if excluded:
+            k_best_neighbors_relative_scores = self.get_k_best_neighbors(
+                node_id, k, excluded
+            )
+            return self.regional_score(
+                self.nodes[node_id], k_best_neighbors_relative_scores.values()
+            )
+
+        regional_score = self.regional_score_cache.get_regional_score(node_id, k)
+        if regional_score is None:
+            k_best_neighbors_relative_scores = self.get_k_best_neighbors(node_id, k)
+            regional_score = self.regional_score(
+                self.nodes[node_id], k_best_neighbors_relative_scores.values()
+            )
+            self.regional_score_cache.set_regional_score(node_id, k, regional_score)
+        return regional_score
+
+    def get_neighbors_regional_scores(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> Tuple[List[int], np.ndarray]:
+        """Returns the ids of the neighbors of a node, in neighborhood order, and their regional scores.
+        Neighbors in `excluded` are ignored, as if they were deactivated."""
+        edges = self._edges_store
+        neighbors_ids = [
+            edges[edge_id].get_dest_node(node_id).id
+            for edge_id in self.neighborhood[node_id]
+        ]
+        if excluded:
+            neighbors_ids = [
+                neighbor_id
+                for neighbor_id in neighbors_ids
+                if neighbor_id not in excluded
+            ]
+        regional_scores = np.array(
+            [
+                self.get_node_regional_score(neighbor_id, k, excluded)
+                for neighbor_id in neighbors_ids
+            ],
+            dtype=float,
         )
+        return neighbors_ids, regional_scores
 
     @staticmethod
     def regional_score(
@@ -167,62 +721,201 @@ class KBNGraph(BaseKBNGraph):
         n = len(neighborhood_relative_scores) + 1
         return (node.score + sum(neighborhood_relative_scores)) / n
 
-    def get_k_best_neighbors(self, node_id: int, k: int = 10) -> Dict[int, float]:
-        """Returns a dictionnary with k best relative score indexed with edge_ids
-        /!\ Compute intensive method
+    def get_k_best_neighbors(
+        self, node_id: int, k: int = 10, excluded: Optional[Set[int]] = None
+    ) -> Dict[int, float]:
+        """Returns a dictionnary with k best relative score indexed with edge_ids,
+        in neighborhood order. Neighbors in `excluded` are ignored.
+        Rankings are cached until the node neighborhood changes.
         """
-        node_egdes_id = self.neighborhood[node_id]
-        neighbors_scores = {
-            edge_id: self.edges[edge_id].get_dest_relative_score(
-                origin_node_id=node_id, max_cost=self.max_cost
-            )
-            for edge_id in node_egdes_id
-        }
-        k_best_edge_ids = heapq.nlargest(k, neighbors_scores, key=neighbors_scores.get)
-        k_best_neighbors_scores = {
+        # At most len(excluded) of the k + len(excluded) best neighbors are excluded
+        ranked_k = k + len(excluded) if excluded else k
+        ranked_neighbors = self.regional_score_cache.get_k_best_neighbors(
+            node_id, ranked_k
+        )
+        if ranked_neighbors is None:
+            ranked_neighbors = self._rank_k_best_neighbors(node_id, ranked_k)
+        if excluded:
+            edges = self._edges_store
+            ranked_neighbors = [
+                neighbor
+                for neighbor in ranked_neighbors
+                if edges[neighbor[1]].get_dest_node(node_id).id not in excluded
+            ][:k]
+        return {
             edge_id: relative_score
-            for edge_id, relative_score in neighbors_scores.items()
-            if edge_id in k_best_edge_ids
+            for _, edge_id, relative_score in sorted(ranked_neighbors)
         }
-        return k_best_neighbors_scores
 
-    @cached_property
-    def coordinates(self) -> pd.DataFrame:
-        coords = {node.id: [node.x, node.y] for node in self.nodes.values()}
-        df = pd.DataFrame(coords).T.rename(columns={0: "x", 1: "y"})
-        return df
+    def _rank_k_best_neighbors(self, node_id: int, k: int) -> List[RankedNeighbor]:
+        """/!\\ Compute intensive method"""
+        node_egdes_id = self.neighborhood[node_id]
+        edges = self._edges_store
+        neighbors_scores = [
+            (
+                position,
+                edge_id,
+                edges[edge_id].get_dest_relative_score(
+                    origin_node_id=node_id, max_cost=self.max_cost
+                ),
+            )
+            for position, edge_id in enumerate(node_egdes_id)
+        ]
+        ranked_neighbors = heapq.nlargest(
+            k, neighbors_scores, key=lambda neighbor: neighbor[2]
+        )
+        self.regional_score_cache.set_k_best_neighbors(
+            node_id, k, ranked_neighbors, exhaustive=len(neighbors_scores) <= k
+        )
+        return ranked_neighbors
+
+    def coordinates(self) -> "pd.DataFrame":
+        """Coordinates of the active nodes, indexed by node id"""
+        import pandas as pd
+
+        nodes = list(self.nodes.values())
+        return pd.DataFrame(
+            {"x": [node.x for node in nodes], "y": [node.y for node in nodes]},
+            index=[node.id for node in nodes],
+            dtype=float,
+        )
 
     @property
     def node_density(self) -> float:
-        (x_min, y_min), (x_max, y_max) = self.get_coordinates_bounding_box(
-            self.coordinates
+        (x_min, y_min), (x_max, y_max) = get_coordinates_bounding_box(
+            self.coordinates()
         )
         surface = (x_max - x_min) * (y_max - y_min)
         node_count = len(self.nodes)
         return node_count / surface
 
+    @property
+    def spatial_index(self) -> NearestNodeIndex:
+        """
+        Nearest node index of every node known by the graph, deactivated ones included.
+        Built on first use, and again only after `invalidate_spatial_index`, when nodes are added.
+        """
+        if self._spatial_index is None:
+            self._spatial_index_ids, coordinates = self._spatial_index_nodes()
+            self._spatial_index = NearestNodeIndex(coordinates, self.distance)
+        return self._spatial_index
+
+    def invalidate_spatial_index(self) -> None:
+        self._spatial_index = None
+        self._stale_index_ids = set()
+
+    def _spatial_index_nodes(self) -> Tuple[List[int], np.ndarray]:
+        if self.node_table is not None:
+            return self._table_index_nodes()
+        if self.soft_deactivation:
+            nodes = list(self._all_nodes.values())
+        else:
+            nodes = list(self.nodes.values()) + [
+                node for node, _ in self.deactivated_nodes.values()
+            ]
+        return [node.id for node in nodes], self._coordinates_array(nodes)
+
+    def _table_index_nodes(self) -> Tuple[List[int], np.ndarray]:
+        """Rows of the NodeTable, without the removed nodes, followed by the nodes added to the graph"""
+        nodes_store = self._all_nodes if self.soft_deactivation else self.nodes
+        ids, coordinates = self.node_table.ids.tolist(), self.node_table.coordinates
+        added = list(nodes_store._added.values())
+        if not self.soft_deactivation:
+            added += [
+                node
+                for node, _ in self.deactivated_nodes.values()
+                if not self._is_table_node(node)
+            ]
+        # Rows of the removed nodes, and of the nodes added again, are left out
+        dropped = {node.id for node in added}.union(
+            node_id
+            for node_id in nodes_store._removed
+            if node_id not in self.deactivated_nodes
+        )
+        if not dropped:
+            return ids, coordinates
+        kept = [i for i, node_id in enumerate(ids) if node_id not in dropped]
+        return [ids[i] for i in kept] + [node.id for node in added], np.concatenate(
+            [coordinates[kept], self._coordinates_array(added)]
+        )
+
+    def _is_table_node(self, node: Node) -> bool:
+        try:
+            position = self.node_table.index_of(node.id)
+        except (KeyError, TypeError):
+            return False
+        return self.node_table[position] is node
+
+    def _is_indexed_node_active(self, positions: np.ndarray) -> np.ndarray:
+        ids, nodes = self._spatial_index_ids, self.nodes
+        return np.fromiter(
+            (ids[i] in nodes for i in positions.tolist()),
+            dtype=bool,
+            count=len(positions),
+        )
+
+    def subgraph(self, node_ids: Iterable[int]) -> "KBNSubGraph":
+        """Subgraph of active nodes. Deactivating its nodes does not modify this graph."""
+        return KBNSubGraph(self, list(node_ids))
+
+    def active_nodes_arrays(self) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """Ids, (n, 2) coordinates and scores of the active nodes"""
+        nodes = list(self.nodes.values())
+        scores = np.array([node.score for node in nodes], dtype=float)
+        return [node.id for node in nodes], self._coordinates_array(nodes), scores
+
+    def get_closest_nodes_ids(self, points: np.ndarray) -> List[Optional[int]]:
+        """Ids of the closest active node of each (x, y) point, None when no node is active"""
+        positions = self.spatial_index.query(points, self._is_indexed_node_active)
+        return [
+            self._spatial_index_ids[i] if i >= 0 else None for i in positions.tolist()
+        ]
+
+    def get_closest_node(self, x: float, y: float) -> Node:
+        (closest_node_id,) = self.get_closest_nodes_ids(np.array([[x, y]]))
+        if closest_node_id is None:
+            raise ValueError("The graph has no active node.")
+        return self.nodes[closest_node_id]
+
 
 class KBNSubGraph(KBNGraph):
     def __init__(self, parent_graph: KBNGraph, nodes: List[int]):
         self.parent = parent_graph.id
         self.nodes = {node_id: parent_graph.nodes[node_id] for node_id in nodes}
+        self.regional_score_cache = RegionalScoreCache()
 
         self.edges = {}
         self.neighborhood = {node_id: [] for node_id in self.nodes}
+        self.deactivated_nodes = {}
         self._extract_edges_and_neighboors(parent_graph)
 
         self.max_cost = parent_graph.max_cost
         self.edge_cost_offset = parent_graph.edge_cost_offset
+        self.distance = parent_graph.distance
         self._cost_fun = parent_graph._cost_fun
+        self._next_edge_id = parent_graph._next_edge_id
+        self._derived_max_cost = parent_graph._derived_max_cost
+        self._node_ranks = _ranks_by_id(self.nodes)
+        self._next_node_rank = len(self.nodes)
+        self.n_neighbors = parent_graph.n_neighbors
 
     def _extract_edges_and_neighboors(
         self, parent_graph: KBNGraph
     ) -> Dict[int, List[Type[Edge]]]:
-        """Collect edges when **both** nodes are included in the subgraph. Then update class variables."""
-        valid_nodes = list(self.nodes.keys())
-        for edge_id, edge in parent_graph.edges.items():
+        """Collect edges when **both** nodes are included in the subgraph. Then update class variables.
+        Only the neighborhoods of the subgraph nodes are visited, edges are registered by id."""
+        valid_nodes = set(self.nodes)
+        edges_ids = set()
+        for node_id in valid_nodes:
+            edges_ids.update(parent_graph.neighborhood[node_id])
+        for edge_id in sorted(edges_ids):
+            edge = parent_graph.edges[edge_id]
             edge_in_subgraph = all([node.id in valid_nodes for node in edge.nodes])
             if edge_in_subgraph:
                 self.edges[edge_id] = edge
                 for node in edge.nodes:
                     self.neighborhood[node.id].append(edge_id)
+
+
+def _ranks_by_id(node_ids: Iterable[int]) -> Dict[int, int]:
+    return {node_id: rank for rank, node_id in enumerate(node_ids)}
@@ -1,18 +1,59 @@
-from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
-@dataclass
 class Node:
-    id: int
-    x: float
-    y: float
-    score: int
-    properties: Dict[str, Any] = field(default_factory=dict)
+    """
+    Node of a graph. Properties are also readable as attributes: `node.category` for
+    `properties["category"]`. Equality compares every field, like a dataclass.
+    """
 
-    def __post_init__(self):
-        for prop_name, value in self.properties.items():
-            self.__setattr__(prop_name, value)
+    __slots__ = ("id", "x", "y", "score", "properties")
+
+    def __init__(
+        self,
+        id: int,
+        x: float,
+        y: float,
+        score: int,
+        properties: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.score = score
+        self.properties = properties if properties is not None else {}
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called when no slot matches
+        if name == "properties":
+            raise AttributeError(name)
+        try:
+            return self.properties[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+
+    def _astuple(self):
+        return (self.id, self.x, self.y, self.score, self.properties)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
 
     def __hash__(self):
-        return hash((self.id, self.x, self.y, self.score, *self.properties.values()))
+        # Properties are left out: equal nodes still have equal hashes
+        return hash((self.id, self.x, self.y, self.score))
+
+    def __repr__(self) -> str:
+        return (
+            f"Node(id={self.id!r}, x={self.x!r}, y={self.y!r}, score={self.score!r}, "
+            f"properties={self.properties!r})"
+        )
+
+    def __getstate__(self):
+        return self._astuple()
+
+    def __setstate__(self, state) -> None:
+        self.id, self.x, self.y, self.score, self.properties = state
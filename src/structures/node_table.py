@@ -0,0 +1,195 @@
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+)
+
+import numpy as np
+
+from src.structures.node import Node
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class NodeTable(Sequence):
+    """
+    Columnar storage of nodes: ids, coordinates, scores and properties are kept as arrays.
+
+    The table is a sequence of nodes, but `Node` objects are only created when accessed,
+    then memoized so that the same object is returned on each access.
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        scores: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+        properties: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.scores = np.asarray(scores)
+        self.ids = np.arange(len(self.x)) if ids is None else np.asarray(ids)
+        self.properties = {
+            name: np.asarray(values) for name, values in (properties or {}).items()
+        }
+        for name, column in [
+            ("y", self.y),
+            ("scores", self.scores),
+            ("ids", self.ids),
+            *self.properties.items(),
+        ]:
+            if len(column) != len(self.x):
+                raise ValueError(
+                    f"Column {name} has {len(column)} values, expected {len(self.x)}."
+                )
+        self._nodes: Dict[int, Node] = {}
+        self._positions: Optional[Dict[Any, int]] = None
+
+    @classmethod
+    def from_pandas(
+        cls,
+        df: "pd.DataFrame",
+        score_col: str,
+        x_col: str,
+        y_col: str,
+        id_col: Optional[str] = None,
+        properties_cols: List[str] = [],
+    ) -> "NodeTable":
+        """Nodes ids are read from `id_col`, or from the index of the dataframe"""
+        return cls(
+            x=df[x_col].to_numpy(),
+            y=df[y_col].to_numpy(),
+            scores=df[score_col].to_numpy(),
+            ids=(df[id_col] if id_col is not None else df.index).to_numpy(),
+            properties={col: df[col].to_numpy() for col in properties_cols},
+        )
+
+    @classmethod
+    def from_parquet(
+        cls,
+        path: str,
+        score_col: str,
+        x_col: str,
+        y_col: str,
+        id_col: Optional[str] = None,
+        properties_cols: List[str] = [],
+    ) -> "NodeTable":
+        """Only the needed columns are read. Requires a parquet engine for pandas (pyarrow or fastparquet)."""
+        import pandas as pd
+
+        columns = [x_col, y_col, score_col, *properties_cols]
+        if id_col is not None:
+            columns.append(id_col)
+        df = pd.read_parquet(path, columns=columns)
+        return cls.from_pandas(df, score_col, x_col, y_col, id_col, properties_cols)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def __getitem__(self, position: int) -> Node:
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        node = self._nodes.get(position)
+        if node is None:
+            node = Node(
+                id=self.ids[position].item(),
+                x=self.x[position].item(),
+                y=self.y[position].item(),
+                score=self.scores[position].item(),
+                properties={
+                    name: _to_python(values[position])
+                    for name, values in self.properties.items()
+                },
+            )
+            self._nodes[position] = node
+        return node
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        return np.stack([self.x, self.y], axis=1)
+
+    def index_of(self, node_id: Any) -> int:
+        """Position of a node in the table"""
+        if self._positions is None:
+            self._positions = {
+                node_id: i for i, node_id in enumerate(self.ids.tolist())
+            }
+        return self._positions[node_id]
+
+    def materialized_count(self) -> int:
+        """Amount of `Node` objects created so far"""
+        return len(self._nodes)
+
+
+class NodeTableMapping(MutableMapping):
+    """
+    Dictionary of nodes indexed by id, backed by a NodeTable: nodes are created when accessed.
+    Nodes can be deleted and set again, with the same iteration order than a dict.
+    """
+
+    def __init__(self, table: NodeTable):
+        self._table = table
+        self._removed = set()
+        # Nodes set after the creation of the mapping, iterated after the table's ones like in a dict
+        self._added: Dict[Any, Node] = {}
+
+    def _table_position(self, node_id: Any) -> Optional[int]:
+        if node_id in self._removed:
+            return None
+        try:
+            return self._table.index_of(node_id)
+        except (KeyError, TypeError):
+            return None
+
+    def __getitem__(self, node_id: Any) -> Node:
+        if node_id in self._added:
+            return self._added[node_id]
+        position = self._table_position(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        return self._table[position]
+
+    def __setitem__(self, node_id: Any, node: Node) -> None:
+        position = self._table_position(node_id)
+        if position is not None and self._table[position] is node:
+            return
+        if position is not None:
+            # Overriding a table node keeps its position, like a dict
+            self._table._nodes[position] = node
+        else:
+            self._added[node_id] = node
+
+    def __delitem__(self, node_id: Any) -> None:
+        if node_id in self._added:
+            del self._added[node_id]
+        elif self._table_position(node_id) is not None:
+            self._removed.add(node_id)
+        else:
+            raise KeyError(node_id)
+
+    def __iter__(self) -> Iterator[Any]:
+        removed = self._removed
+        for node_id in self._table.ids.tolist():
+            if node_id not in removed:
+                yield node_id
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return len(self._table) - len(self._removed) + len(self._added)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._added or self._table_position(node_id) is not None
+
+
+def _to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Dict
+
+import numpy as np
+
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node_table import NodeTable
+
+FORMAT_VERSION = 1
+METADATA_FILE = "graph.json"
+# Arrays updated by deactivations: mapped copy-on-write, so changes stay private to the process
+_MUTABLE_ARRAYS = {"active", "deactivated"}
+PROPERTY_PREFIX = "property:"
+
+
+def save_graph(graph: KBNGraph, path: str) -> None:
+    """
+    Save a graph in the directory `path`: one `.npy` file per array and a `graph.json` metadata file.
+    The node columns, with their properties, the CSR adjacency, the edges costs and the ranked neighbors
+    are saved, so that loading does not compute anything.
+    A KBNGraph is converted to a CSRKBNGraph of its active nodes first, see `CSRKBNGraph.from_graph`.
+    """
+    if not isinstance(graph, CSRKBNGraph):
+        graph = CSRKBNGraph.from_graph(graph)
+    os.makedirs(path, exist_ok=True)
+
+    arrays = graph.to_arrays()
+    for name, column in _properties_columns(graph).items():
+        arrays[f"{PROPERTY_PREFIX}{name}"] = column
+    files, pickled = {}, []
+    for name, array in arrays.items():
+        files[name] = f"{name.replace(':', '.')}.npy"
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            pickled.append(name)
+        np.save(os.path.join(path, files[name]), array, allow_pickle=True)
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "max_cost": float(graph.max_cost),
+        "n_neighbors": graph.n_neighbors,
+        "distance": graph.distance,
+        "edge_cost_offset": float(graph.edge_cost_offset),
+        "files": files,
+        # Object arrays can not be memory-mapped, they are loaded in memory
+        "pickled": pickled,
+    }
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_graph(path: str, mmap: bool = True) -> CSRKBNGraph:
+    """
+    Load a graph saved by `save_graph`. With `mmap`, arrays are memory-mapped read-only instead of being
+    read: loading takes the same time whatever the size of the graph, and the processes loading the same
+    files share one copy of them in the page cache.
+    """
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata["format_version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported graph format version {metadata['format_version']}, expected {FORMAT_VERSION}."
+        )
+
+    arrays: Dict[str, np.ndarray] = {}
+    properties: Dict[str, np.ndarray] = {}
+    for name, file_name in metadata["files"].items():
+        file_path = os.path.join(path, file_name)
+        if name in metadata["pickled"]:
+            array = np.load(file_path, allow_pickle=True)
+        else:
+            mmap_mode = "c" if name in _MUTABLE_ARRAYS else "r"
+            array = np.load(file_path, mmap_mode=mmap_mode if mmap else None)
+        if name.startswith(PROPERTY_PREFIX):
+            properties[name[len(PROPERTY_PREFIX) :]] = array
+        else:
+            arrays[name] = array
+
+    graph = CSRKBNGraph.from_arrays(
+        arrays,
+        metadata["max_cost"],
+        metadata["distance"],
+        metadata["edge_cost_offset"],
+        properties=properties,
+    )
+    graph.n_neighbors = metadata.get("n_neighbors")
+    return graph
+
+
+def _properties_columns(graph: CSRKBNGraph) -> Dict[str, np.ndarray]:
+    nodes = graph._nodes_list
+    if isinstance(nodes, NodeTable):
+        return nodes.properties
+    names = list(dict.fromkeys(name for node in nodes for name in node.properties))
+    columns = {}
+    for name in names:
+        values = [node.properties.get(name) for node in nodes]
+        # Values of mixed types are kept as objects instead of being cast to a common type
+        if len({type(value) for value in values}) == 1:
+            column = np.array(values)
+            if column.ndim == 1 and column.dtype.kind in "biufUS":
+                columns[name] = column
+                continue
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        columns[name] = column
+    return columns
@@ -0,0 +1,133 @@
+from typing import Dict, Iterator, List, Mapping, Set, Tuple
+
+from src.structures.edge import Edge
+from src.structures.node import Node
+
+
+class ActiveNodesView(Mapping):
+    """Read-only view of the nodes which are not flagged as inactive"""
+
+    def __init__(self, nodes: Dict[int, Node], inactive_ids: Set[int]):
+        self._nodes = nodes
+        self._inactive_ids = inactive_ids
+
+    def __getitem__(self, node_id: int) -> Node:
+        if node_id in self._inactive_ids:
+            raise KeyError(node_id)
+        return self._nodes[node_id]
+
+    def __iter__(self) -> Iterator[int]:
+        inactive_ids = self._inactive_ids
+        return (node_id for node_id in self._nodes if node_id not in inactive_ids)
+
+    def __len__(self) -> int:
+        return len(self._nodes) - len(self._inactive_ids)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._nodes and node_id not in self._inactive_ids
+
+
+class ActiveEdgesView(Mapping):
+    """Read-only view of the edges whose both nodes are active"""
+
+    def __init__(self, edges: Dict[int, Edge], inactive_ids: Set[int]):
+        self._edges = edges
+        self._inactive_ids = inactive_ids
+
+    def _is_active(self, edge: Edge) -> bool:
+        node1, node2 = edge.nodes
+        return node1.id not in self._inactive_ids and node2.id not in self._inactive_ids
+
+    def __getitem__(self, edge_id: int) -> Edge:
+        edge = self._edges[edge_id]
+        if not self._is_active(edge):
+            raise KeyError(edge_id)
+        return edge
+
+    def __iter__(self) -> Iterator[int]:
+        return (
+            edge_id for edge_id, edge in self._edges.items() if self._is_active(edge)
+        )
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, edge_id) -> bool:
+        edge = self._edges.get(edge_id)
+        return edge is not None and self._is_active(edge)
+
+
+class ActiveNeighborhoodView(Mapping):
+    """Read-only view of the edges ids of each active node, skipping the edges to inactive neighbors.
+    `neighbors_ids` holds the id of the neighbor at the other end of each edge of `neighborhood`."""
+
+    def __init__(
+        self,
+        neighborhood: Dict[int, List[int]],
+        neighbors_ids: Dict[int, List[int]],
+        inactive_ids: Set[int],
+    ):
+        self._neighborhood = neighborhood
+        self._neighbors_ids = neighbors_ids
+        self._inactive_ids = inactive_ids
+
+    def __getitem__(self, node_id: int) -> List[int]:
+        if node_id in self._inactive_ids:
+            raise KeyError(node_id)
+        inactive_ids = self._inactive_ids
+        return [
+            edge_id
+            for edge_id, neighbor_id in zip(
+                self._neighborhood[node_id], self._neighbors_ids[node_id]
+            )
+            if neighbor_id not in inactive_ids
+        ]
+
+    def __iter__(self) -> Iterator[int]:
+        inactive_ids = self._inactive_ids
+        return (
+            node_id for node_id in self._neighborhood if node_id not in inactive_ids
+        )
+
+    def __len__(self) -> int:
+        return len(self._neighborhood) - len(self._inactive_ids)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._neighborhood and node_id not in self._inactive_ids
+
+
+class DeactivatedNodesView(Mapping):
+    """Read-only view of the deactivated nodes with their edges to active neighbors"""
+
+    def __init__(
+        self,
+        nodes: Dict[int, Node],
+        edges: Dict[int, Edge],
+        neighborhood: Dict[int, List[int]],
+        deactivated_ids: Set[int],
+        inactive_ids: Set[int],
+    ):
+        self._nodes = nodes
+        self._edges = edges
+        self._neighborhood = neighborhood
+        self._deactivated_ids = deactivated_ids
+        self._inactive_ids = inactive_ids
+
+    def __getitem__(self, node_id: int) -> Tuple[Node, List[Edge]]:
+        if node_id not in self._deactivated_ids:
+            raise KeyError(node_id)
+        related_edges = [
+            self._edges[edge_id]
+            for edge_id in self._neighborhood[node_id]
+            if self._edges[edge_id].get_dest_node(node_id).id not in self._inactive_ids
+        ]
+        return self._nodes[node_id], related_edges
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._deactivated_ids)
+
+    def __len__(self) -> int:
+        return len(self._deactivated_ids)
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._deactivated_ids
@@ -1,29 +1,33 @@
-from typing import List, Optional
-
-import pandas as pd
+from typing import TYPE_CHECKING, List, Optional
 
 from src.structures.node import Node
+from src.structures.node_table import NodeTable
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def build_nodes_from_pandas(
-    df: pd.DataFrame,
+    df: "pd.DataFrame",
     score_col: str,
     x_col: str,
     y_col: str,
     id_col: Optional[str] = None,
     properties_cols: List[str] = [],
 ) -> List[Node]:
-    nodes = []
-    for i, row in df.iterrows():
-        properties = row[properties_cols].to_dict()
-        id_value = row[id_col] if id_col is not None else i
-        nodes.append(
-            Node(
-                id=id_value,
-                x=row[x_col],
-                y=row[y_col],
-                score=row[score_col],
-                properties=properties,
-            )
-        )
-    return nodes
+    table = build_node_table_from_pandas(
+        df, score_col, x_col, y_col, id_col, properties_cols
+    )
+    return list(table)
+
+
+def build_node_table_from_pandas(
+    df: "pd.DataFrame",
+    score_col: str,
+    x_col: str,
+    y_col: str,
+    id_col: Optional[str] = None,
+    properties_cols: List[str] = [],
+) -> NodeTable:
+    """Columnar alternative to `build_nodes_from_pandas`: Node objects are created when accessed"""
+    return NodeTable.from_pandas(df, score_col, x_col, y_col, id_col, properties_cols)
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import wraps
+from typing import Callable, Dict, Iterator, Optional
+
+# Stages timed by the solver
+EDGE_BUILD = "edge_build"
+REGIONAL_SCORES = "regional_scores"
+CONSTRAINT_PENALTIES = "constraint_penalties"
+DEACTIVATION = "deactivation"
+REACTIVATION = "reactivation"
+SOLVE = "solve"
+
+
+class Recorder:
+    """
+    Receives the measures of the solver while it is installed with `recording`.
+    Subclass it to forward the measures elsewhere, e.g. to a metrics client.
+    """
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        pass
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        pass
+
+
+class CallbackRecorder(Recorder):
+    """Forwards every measure to `callback(kind, name, value)`, kind being "time" or "count"."""
+
+    def __init__(self, callback: Callable[[str, str, float], None]):
+        self.callback = callback
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        self.callback("time", stage, seconds)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        self.callback("count", counter, amount)
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    total_s: float = 0.0
+    max_s: float = 0.0
+
+
+class Profiler(Recorder):
+    """Aggregates the wall time of each stage and the counters of a solve.
+    Measures can be recorded from several threads, such as the queries of a `QueryServer`."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.calls += 1
+            stats.total_s += seconds
+            stats.max_s = max(stats.max_s, seconds)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {stage: asdict(stats) for stage, stats in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        """JSON profile of the recorded measures, written to `path` when given"""
+        profile = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(profile)
+        return profile
+
+
+_RECORDER: ContextVar[Optional[Recorder]] = ContextVar("recorder", default=None)
+
+
+@contextmanager
+def recording(recorder: Optional[Recorder] = None) -> Iterator[Recorder]:
+    """
+    Install `recorder`, a new Profiler by default, for the solver calls made in the block.
+    The recorder is local to the current thread or asyncio task.
+
+        with recording() as profiler:
+            get_k_best_nodes(graph, first_node, k=10)
+        profiler.to_json("profile.json")
+    """
+    recorder = recorder if recorder is not None else Profiler()
+    token = _RECORDER.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _RECORDER.reset(token)
+
+
+def get_recorder() -> Optional[Recorder]:
+    return _RECORDER.get()
+
+
+class _Timer:
+    __slots__ = ("recorder", "stage", "start")
+
+    def __init__(self, recorder: Recorder, stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.recorder.record_time(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage: str):
+    """Context manager timing its block as `stage`. Does nothing when no recorder is installed."""
+    recorder = _RECORDER.get()
+    if recorder is None:
+        return _NULL_TIMER
+    return _Timer(recorder, stage)
+
+
+def timed(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator timing the calls of a function as `stage`"""
+
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = _RECORDER.get()
+            if recorder is None:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.record_time(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def increment(counter: str, amount: int = 1) -> None:
+    recorder = _RECORDER.get()
+    if recorder is not None:
+        recorder.increment(counter, amount)
@@ -1,3 +1,4 @@
+import dataclasses
 from typing import Dict, Tuple
 
 import pytest
@@ -106,3 +107,49 @@ def test_penalize_score(
     penalization_ratio = round(1 - (penalized_score / candidate_node.score), 2)
 
     assert penalization_ratio == expected_penalization_ratio
+
+
+def test_penalize_scores_matches_penalize_score(
+    mock_flexible_categorical_ratio_constraint, random_graph
+):
+    for node_id in [0, 1, 2]:
+        mock_flexible_categorical_ratio_constraint.update_state(
+            random_graph.nodes[node_id]
+        )
+    node_ids = list(range(3, 30))
+
+    penalized_scores = mock_flexible_categorical_ratio_constraint.penalize_scores(
+        random_graph, node_ids
+    )
+
+    assert penalized_scores.tolist() == [
+        mock_flexible_categorical_ratio_constraint.penalize_score(
+            random_graph.nodes[node_id]
+        )
+        for node_id in node_ids
+    ]
+
+
+def test_penalize_scores_of_nodes_unknown_at_construction(
+    mock_flexible_categorical_ratio_constraint, random_graph
+):
+    constraint = mock_flexible_categorical_ratio_constraint.clone()
+    constraint.stats = dataclasses.replace(constraint.stats, node_positions={})
+
+    assert constraint.penalize_scores(random_graph, [3]).tolist() == [
+        constraint.penalize_score(random_graph.nodes[3])
+    ]
+
+
+def test_clone_has_an_independent_state(
+    mock_flexible_categorical_ratio_constraint, random_graph
+):
+    clone = mock_flexible_categorical_ratio_constraint.clone()
+    clone.update_state(random_graph.nodes[0])
+
+    assert clone.category_counts == {"A": 0, "B": 1, "C": 0}
+    assert mock_flexible_categorical_ratio_constraint.category_counts == {
+        "A": 0,
+        "B": 0,
+        "C": 0,
+    }
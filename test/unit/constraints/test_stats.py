@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from src.contraints.categorical_ratio import FlexibleCategoricalRatioConstraint
+from src.contraints.stats import (
+    compute_category_stats,
+    get_category_stats,
+    invalidate_category_stats,
+)
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+from src.structures.node_table import NodeTable
+
+
+def test_stats_are_shared_by_the_constraints_of_a_graph(random_graph):
+    constraints = [
+        FlexibleCategoricalRatioConstraint("cat", {"A": 0.5, "B": 0.5}, random_graph, k)
+        for k in [4, 10]
+    ]
+
+    assert constraints[0].stats is constraints[1].stats
+    assert constraints[0].stats is get_category_stats(random_graph, "cat")
+    assert get_category_stats(random_graph, "num") is not constraints[0].stats
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_compute_category_stats(engine, random_graph):
+    graph = engine(list(random_graph.nodes.values()), max_cost=0.4)
+    stats = compute_category_stats(graph, "cat")
+
+    assert stats.means_by_category == {"A": 43.85, "B": 52.06, "C": 53.19}
+    assert sum(stats.counts.tolist()) == 100
+    node = random_graph.nodes[7]
+    position = stats.node_positions[7]
+    assert stats.categories[stats.node_codes[position]] == node.properties["cat"]
+    assert stats.node_scores[position] == node.score
+    with pytest.raises(ValueError):
+        stats.node_codes[position] = 0
+
+
+def test_stats_of_table_columns_match_nodes_stats():
+    table = NodeTable(
+        x=[0.0, 0.1, 0.2, 0.3],
+        y=[0.0, 0.0, 0.0, 0.0],
+        scores=[10, 20, 30, 41],
+        properties={"cat": np.array(["B", "A", "B", "A"])},
+    )
+    table_stats = compute_category_stats(CSRKBNGraph(table, max_cost=0.5), "cat")
+    nodes_stats = compute_category_stats(KBNGraph(list(table), max_cost=0.5), "cat")
+
+    assert table_stats.means_by_category == nodes_stats.means_by_category
+    assert table_stats.means_by_category == {"A": 30.5, "B": 20.0}
+
+
+def test_nodes_without_category_are_not_counted():
+    nodes = [
+        Node(id=0, x=0, y=0, score=10, properties={"cat": "A"}),
+        Node(id=1, x=0, y=1, score=20, properties={}),
+        Node(id=2, x=1, y=0, score=30, properties={"cat": "A"}),
+    ]
+    stats = compute_category_stats(KBNGraph(nodes), "cat")
+
+    assert stats.means_by_category == {"A": 20.0}
+    assert stats.node_codes.tolist() == [0, -1, 0]
+
+
+def test_stats_are_computed_again_after_nodes_changes(random_graph):
+    stats = get_category_stats(random_graph, "cat")
+    node = random_graph.nodes[5]
+    category = next(cat for cat in ["A", "B", "C"] if cat != node.properties["cat"])
+    moved = Node(id=5, x=node.x, y=node.y, score=99, properties={"cat": category})
+
+    random_graph.remove_nodes([5])
+    assert 5 not in get_category_stats(random_graph, "cat").node_positions
+    random_graph.add_nodes([moved])
+
+    assert get_category_stats(random_graph, "cat") is not stats
+    constraint = FlexibleCategoricalRatioConstraint(
+        "cat", {"A": 0.5, "B": 0.3, "C": 0.2}, random_graph, 10
+    )
+    assert constraint.penalize_scores(random_graph, [5]).tolist() == [
+        constraint.penalize_score(moved)
+    ]
+    assert constraint.penalize_score(moved) == 99.0
+
+
+def test_invalidate_category_stats(random_graph):
+    stats = get_category_stats(random_graph, "cat")
+    random_graph.nodes[0].properties["cat"] = "D"
+
+    assert get_category_stats(random_graph, "cat") is stats
+    invalidate_category_stats(random_graph)
+    assert "D" in get_category_stats(random_graph, "cat").codes
@@ -1,7 +1,18 @@
 import math
 
-from src.metrics.distances import (_DISTANCES, euclidian_distance,
-                                   get_distance, register_distance)
+import numpy as np
+import pytest
+
+from src.metrics.distances import (
+    _DISTANCES,
+    euclidian_distance,
+    get_batched_distance,
+    get_distance,
+    haversine_distance,
+    paired_distances,
+    pairwise_distances,
+    register_distance,
+)
 from src.structures.node import Node
 
 
@@ -28,3 +39,41 @@ def test_euclidian_distance():
     node1, node2 = Node(id=0, x=1, y=0, score=0), Node(id=1, x=0, y=1, score=0)
     distance = euclidian_distance(node1, node2)
     assert distance == math.sqrt(2)
+
+
+@pytest.mark.parametrize("distance_name", ["euclidian", "manhattan", "haversine"])
+def test_batched_distance_matches_scalar(distance_name):
+    rng = np.random.default_rng(42)
+    coordinates1, coordinates2 = rng.random((20, 2)), rng.random((20, 2))
+    nodes1 = [Node(id=i, x=x, y=y, score=0) for i, (x, y) in enumerate(coordinates1)]
+    nodes2 = [Node(id=i, x=x, y=y, score=0) for i, (x, y) in enumerate(coordinates2)]
+    distance_fun = get_distance(distance_name)
+
+    paired = paired_distances(distance_name, coordinates1, coordinates2)
+    pairwise = pairwise_distances(distance_name, coordinates1, coordinates2)
+
+    expected_paired = [distance_fun(n1, n2) for n1, n2 in zip(nodes1, nodes2)]
+    expected_pairwise = [[distance_fun(n1, n2) for n2 in nodes2] for n1 in nodes1]
+    np.testing.assert_allclose(paired, expected_paired, rtol=1e-12)
+    np.testing.assert_allclose(pairwise, expected_pairwise, rtol=1e-12)
+
+
+def test_haversine_distance():
+    paris, london = Node(id=0, x=2.3522, y=48.8566, score=0), Node(
+        id=1, x=-0.1276, y=51.5072, score=0
+    )
+    assert round(haversine_distance(paris, london)) == 344
+
+
+def test_pairwise_distances_falls_back_to_scalar_distance():
+    distance_name = "scalar_only_distance"
+
+    @register_distance(distance_name)
+    def x_distance(node1, node2):
+        return abs(node1.x - node2.x)
+
+    assert get_batched_distance(distance_name) is None
+
+    matrix = pairwise_distances(distance_name, [[0, 0], [1, 5]], [[3, 0]])
+
+    np.testing.assert_array_equal(matrix, [[3], [2]])
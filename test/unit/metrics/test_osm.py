@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from src.metrics.distances import haversine_distances
+from src.metrics.osm import RoadNetwork, register_road_distance
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+
+# Road nodes along a street, 0.001 degree of longitude apart, and a one-way street 1 -> 4
+ROAD_NODES = {
+    1: (2.350, 48.85),
+    2: (2.351, 48.85),
+    3: (2.352, 48.85),
+    4: (2.350, 48.851),
+}
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  {nodes}
+  <node id="9" lat="48.0" lon="2.0"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+  <way id="11"><nd ref="1"/><nd ref="4"/><tag k="highway" v="residential"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="3"/><nd ref="9"/><tag k="waterway" v="river"/></way>
+</osm>
+""".format(
+    nodes="\n  ".join(
+        f'<node id="{node_id}" lat="{lat}" lon="{lon}"/>'
+        for node_id, (lon, lat) in ROAD_NODES.items()
+    )
+)
+GRAPHML = """<?xml version="1.0" encoding="UTF-8"?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d0" for="node" attr.name="x" attr.type="string"/>
+  <key id="d1" for="node" attr.name="y" attr.type="string"/>
+  <key id="d2" for="edge" attr.name="length" attr.type="string"/>
+  <graph edgedefault="directed">
+    <node id="1"><data key="d0">2.350</data><data key="d1">48.85</data></node>
+    <node id="2"><data key="d0">2.351</data><data key="d1">48.85</data></node>
+    <edge source="1" target="2"><data key="d2">120.5</data></edge>
+  </graph>
+</graphml>
+"""
+SEGMENT_LENGTH = 1000 * haversine_distances(
+    np.array(ROAD_NODES[1]), np.array(ROAD_NODES[2])
+)
+
+
+@pytest.fixture
+def osm_path(tmp_path) -> str:
+    path = tmp_path / "extract.osm"
+    path.write_text(OSM_XML)
+    return str(path)
+
+
+@pytest.fixture
+def nodes():
+    # Points close to the road nodes 1, 2, 3 and 4
+    return [
+        Node(id=i, x=lon + 0.00001, y=lat, score=10)
+        for i, (lon, lat) in enumerate(ROAD_NODES.values())
+    ]
+
+
+def test_road_network_from_osm_xml(osm_path):
+    network = RoadNetwork.from_file(osm_path)
+
+    assert len(network.coordinates) == 4
+    assert network.adjacency.nnz == 5
+    assert network.adjacency[0, 1] == pytest.approx(SEGMENT_LENGTH)
+    assert network.snap(np.array([[2.3511, 48.8501]])).tolist() == [1]
+
+
+def test_road_network_from_graphml(tmp_path):
+    path = tmp_path / "extract.graphml"
+    path.write_text(GRAPHML)
+    network = RoadNetwork.from_file(str(path))
+
+    assert network.coordinates.tolist() == [[2.350, 48.85], [2.351, 48.85]]
+    assert network.adjacency[0, 1] == 120.5
+    assert network.adjacency[1, 0] == 0
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_graph_with_road_distance(engine, osm_path, nodes, tmp_path):
+    max_cost = 3 * SEGMENT_LENGTH
+    coordinates = np.array([[node.x, node.y] for node in nodes])
+    register_road_distance(
+        osm_path, coordinates, max_cost, name="test_road", cache_dir=tmp_path
+    )
+    graph = engine(nodes, distance="test_road", max_cost=max_cost)
+
+    costs = {
+        tuple(sorted(node.id for node in edge.nodes)): edge.cost
+        for edge in graph.edges.values()
+    }
+    assert costs.keys() == {(0, 1), (0, 2), (1, 2), (0, 3), (1, 3)}
+    assert costs[(0, 2)] == pytest.approx(2 * SEGMENT_LENGTH)
+    # The one-way street is only traversed from 1 to 4
+    assert costs[(1, 3)] == pytest.approx(costs[(0, 1)] + costs[(0, 3)])
+
+
+def test_road_costs_are_cached(osm_path, nodes, tmp_path, monkeypatch):
+    coordinates = np.array([[node.x, node.y] for node in nodes])
+    road_distance = register_road_distance(
+        osm_path, coordinates, 1000.0, cache_dir=tmp_path / "cache"
+    )
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    monkeypatch.setattr("src.metrics.osm.dijkstra", None)
+    cached_distance = register_road_distance(
+        osm_path, coordinates, 1000.0, cache_dir=tmp_path / "cache"
+    )
+    assert np.array_equal(
+        cached_distance.distances(coordinates[:, None], coordinates[None]),
+        road_distance.distances(coordinates[:, None], coordinates[None]),
+    )
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.random_graph import RandomGraph
+from src.spatial.convolutions import (
+    Convolver,
+    find_best_regions,
+    find_best_windows,
+    window_sums,
+)
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph, KBNSubGraph
+from src.structures.node import Node
+
+
+def test_window_sums_match_brute_force():
+    grid = np.random.default_rng(0).random((7, 9))
+
+    sums = window_sums(grid, 3, 2)
+
+    assert sums.shape == (5, 8)
+    for j in range(5):
+        for i in range(8):
+            assert sums[j, i] == pytest.approx(grid[j : j + 3, i : i + 2].sum())
+
+
+def test_find_best_windows_returns_dense_non_overlapping_windows():
+    rng = np.random.default_rng(0)
+    background = rng.random((1000, 2)) * 10
+    clusters = np.concatenate(
+        [rng.random((50, 2)) + [2, 2], rng.random((40, 2)) + [7, 6]]
+    )
+    coordinates = np.concatenate([background, clusters])
+    scores = np.ones(len(coordinates))
+
+    regions = find_best_windows(coordinates, scores, window_size=1.0, n_regions=2)
+
+    assert len(regions) == 2
+    assert regions[0].score >= regions[1].score
+    assert abs(regions[0].x_min - 2) < 0.5 and abs(regions[0].y_min - 2) < 0.5
+    assert abs(regions[1].x_min - 7) < 0.5 and abs(regions[1].y_min - 6) < 0.5
+    assert regions[0].score == len(regions[0].positions)
+    assert not set(regions[0].positions.tolist()) & set(regions[1].positions.tolist())
+
+
+def test_find_best_windows_requires_min_nodes():
+    coordinates = np.array([[0.0, 0.0], [5.0, 5.0]])
+
+    assert find_best_windows(coordinates, np.ones(2), 1.0, min_nodes=2) == []
+
+
+@pytest.mark.parametrize("engine", ["dict", "csr"])
+def test_find_best_regions(engine):
+    graph = RandomGraph(n=500, max_cost=0.1, random_seed=0)
+    if engine == "csr":
+        graph = CSRKBNGraph(list(graph.nodes.values()), max_cost=0.1)
+
+    subgraphs = find_best_regions(graph, k=5, n_regions=3)
+
+    assert len(subgraphs) == 3
+    assert all(isinstance(subgraph, KBNSubGraph) for subgraph in subgraphs)
+    assert all(len(subgraph.nodes) >= 5 for subgraph in subgraphs)
+    regions_nodes = [set(subgraph.nodes) for subgraph in subgraphs]
+    assert not regions_nodes[0] & regions_nodes[1]
+
+
+def test_find_best_regions_of_aligned_nodes():
+    graph = KBNGraph(
+        [Node(id=i, x=i / 19, y=0, score=i % 3) for i in range(20)], max_cost=0.2
+    )
+
+    (subgraph,) = find_best_regions(graph, k=3)
+    assert len(subgraph.nodes) >= 3
+
+    (subgraph,) = find_best_regions(
+        KBNGraph([Node(id=0, x=0.5, y=0.5, score=1)], max_cost=0.2), k=1
+    )
+    assert list(subgraph.nodes) == [0]
+
+
+@pytest.fixture
+def coordinates_df() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    return pd.DataFrame(
+        {"x": rng.random(2000) * 10, "y": rng.random(2000) * 5},
+        index=rng.permutation(10000)[:2000],
+    )
+
+
+def _brute_force_index(df, x_min, y_min, frame_size):
+    in_frame = df["x"].between(x_min, x_min + frame_size[0]) & df["y"].between(
+        y_min, y_min + frame_size[1]
+    )
+    return df.index[in_frame].to_list()
+
+
+@pytest.mark.parametrize("bucket_size", [None, 0.3, 20.0])
+def test_convolver_matches_brute_force(coordinates_df, bucket_size):
+    convolver = Convolver(coordinates_df, bucket_size=bucket_size)
+    frames = np.array([[2.0, 1.0], [-1.0, -1.0], [9.5, 4.5], [20.0, 20.0]])
+    frame_size = (1.5, 0.7)
+
+    indexes = convolver.get_indexes_in_frames(frames, frame_size)
+
+    for (x_min, y_min), index in zip(frames, indexes):
+        assert index == _brute_force_index(coordinates_df, x_min, y_min, frame_size)
+    assert convolver.get_index_in_frame(2.0, 1.0, frame_size) == indexes[0]
+
+
+def test_convolver_filters_y_on_y_coordinates():
+    df = pd.DataFrame({"x": [0.0, 5.0], "y": [5.0, 0.0]})
+
+    assert Convolver(df).get_index_in_frame(0.0, 4.0, (1.0, 2.0)) == [0]
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from src.spatial.find import get_closest_node_id
+
+
+@pytest.fixture
+def coordinates() -> pd.DataFrame:
+    # From (0, 0), node 10 is the closest in straight line and node 11 the closest by Manhattan distance
+    return pd.DataFrame(
+        {"id": [10, 11, 12], "x": [0.5, 0.8, 3.0], "y": [0.5, 0.0, 3.0]}
+    )
+
+
+@pytest.mark.parametrize("distance", ["euclidean", "euclidian"])
+def test_get_closest_node_id(coordinates, distance):
+    assert get_closest_node_id(coordinates, 0, 0, distance=distance) == 0
+    assert get_closest_node_id(coordinates, 0, 0, id_col="id") == 10
+
+
+def test_get_closest_node_id_with_scipy_metric(coordinates):
+    assert get_closest_node_id(coordinates, 0, 0, distance="cityblock") == 1
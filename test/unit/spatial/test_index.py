@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from src.metrics.distances import pairwise_distances
+from src.spatial.index import (
+    NearestNodeIndex,
+    query_k_nearest_pairs,
+    query_k_nearest_pairs_by_blocks,
+    query_pairs_within,
+)
+
+
+def test_query_pairs_within():
+    coordinates = np.array([[0, 0], [1, 0], [0, 3], [0.5, 0]])
+
+    i, j = query_pairs_within(coordinates, radius=1)
+
+    assert all(i > j)
+    assert set(zip(i.tolist(), j.tolist())) == {(1, 0), (3, 0), (3, 1)}
+
+
+def test_query_pairs_within_negative_radius():
+    coordinates = np.array([[0, 0], [1, 0]])
+
+    i, j = query_pairs_within(coordinates, radius=-1)
+
+    assert len(i) == len(j) == 0
+
+
+@pytest.mark.parametrize("distance", ["euclidian", "manhattan", "haversine"])
+def test_nearest_node_index_matches_brute_force(distance):
+    rng = np.random.default_rng(0)
+    coordinates = rng.random((500, 2)) * 10
+    points = rng.random((50, 2)) * 10
+    is_active = lambda positions: positions % 3 != 0  # noqa: E731
+
+    closest = NearestNodeIndex(coordinates, distance).query(points, is_active)
+
+    distances = pairwise_distances(distance, points, coordinates)
+    distances[:, np.arange(len(coordinates)) % 3 == 0] = np.inf
+    np.testing.assert_array_equal(closest, distances.argmin(axis=1))
+
+
+def test_nearest_node_index_without_active_node():
+    index = NearestNodeIndex(np.array([[0, 0], [1, 0]]))
+
+    closest = index.query(
+        np.array([[0, 0]]), lambda positions: np.zeros(len(positions), dtype=bool)
+    )
+
+    assert closest.tolist() == [-1]
+
+
+@pytest.mark.parametrize("distance", ["euclidian", "haversine"])
+@pytest.mark.parametrize("added", [10, 300])
+def test_nearest_node_index_extend_matches_brute_force(distance, added):
+    rng = np.random.default_rng(0)
+    coordinates = rng.random((500, 2)) * 10
+    points = rng.random((50, 2)) * 10
+    is_active = lambda positions: positions % 3 != 0  # noqa: E731
+    index = NearestNodeIndex(coordinates[:200], distance, block_size=16)
+
+    index.extend(coordinates[200 : 200 + added])
+
+    coordinates = coordinates[: 200 + added]
+    distances = pairwise_distances(distance, points, coordinates)
+    distances[:, np.arange(len(coordinates)) % 3 == 0] = np.inf
+    np.testing.assert_array_equal(
+        index.query(points, is_active), distances.argmin(axis=1)
+    )
+
+
+@pytest.mark.parametrize(
+    "distance, radius", [("euclidian", 0.1), ("manhattan", 0.1), ("haversine", 10.0)]
+)
+def test_nearest_node_index_query_within(distance, radius):
+    rng = np.random.default_rng(0)
+    coordinates = rng.random((500, 2))
+    points = rng.random((50, 2))
+    index = NearestNodeIndex(coordinates[:400], distance)
+    index.extend(coordinates[400:])
+
+    points_idx, nodes_idx = index.query_within(points, radius)
+
+    distances = pairwise_distances(distance, points, coordinates)
+    in_range = distances[points_idx, nodes_idx] <= radius
+    assert in_range.any()
+    assert set(zip(*np.nonzero(distances <= radius))) == set(
+        zip(points_idx[in_range].tolist(), nodes_idx[in_range].tolist())
+    )
+
+
+@pytest.mark.parametrize("k", [1, 3, 30])
+def test_query_k_nearest_pairs_matches_brute_force(k):
+    rng = np.random.default_rng(0)
+    coordinates = rng.random((20, 2))
+
+    i, j = query_k_nearest_pairs(coordinates, k)
+    i_blocks, j_blocks = query_k_nearest_pairs_by_blocks(
+        coordinates, k, "euclidian", block_size=7
+    )
+
+    distances = pairwise_distances("euclidian", coordinates, coordinates)
+    np.fill_diagonal(distances, np.inf)
+    kth = np.sort(distances, axis=1)[:, [min(k, 19) - 1]]
+    near = (distances <= kth) | (distances <= kth).T
+    expected = {(a, b) for a, b in zip(*np.nonzero(near)) if b < a}
+    assert set(zip(i.tolist(), j.tolist())) == expected
+    assert set(zip(i_blocks.tolist(), j_blocks.tolist())) == expected
+    assert (np.diff(i * 20 + j) > 0).all()
+
+
+def test_query_k_nearest_pairs_with_duplicated_points():
+    coordinates = np.array([[0, 0], [0, 0], [0, 0], [5, 5]])
+
+    i, j = query_k_nearest_pairs(coordinates, k=2)
+
+    assert all(i > j)
+    assert {(1, 0), (2, 0), (2, 1)} <= set(zip(i.tolist(), j.tolist()))
+    assert len(i) == 5
@@ -0,0 +1,38 @@
+from src.structures.cache import RegionalScoreCache
+
+
+def test_k_best_neighbors_serve_smaller_k():
+    cache = RegionalScoreCache()
+    ranked_neighbors = [(2, 12, 9.0), (0, 10, 5.0), (1, 11, 1.0)]
+    cache.set_k_best_neighbors(0, 3, ranked_neighbors, exhaustive=False)
+
+    assert cache.get_k_best_neighbors(0, 2) == ranked_neighbors[:2]
+    assert cache.get_k_best_neighbors(0, 4) is None
+    assert cache.get_k_best_neighbors(1, 1) is None
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 2,
+        "invalidations": 0,
+        "hit_rate": 0.3333,
+    }
+
+
+def test_exhaustive_entry_serves_any_k():
+    cache = RegionalScoreCache()
+    ranked_neighbors = [(0, 10, 5.0)]
+    cache.set_k_best_neighbors(0, 3, ranked_neighbors, exhaustive=True)
+
+    assert cache.get_k_best_neighbors(0, 10) == ranked_neighbors
+
+
+def test_discard_neighbor_only_invalidates_k_best():
+    cache = RegionalScoreCache()
+    cache.set_k_best_neighbors(0, 1, [(0, 10, 5.0)], exhaustive=False)
+    cache.set_regional_score(0, 1, 4.0)
+
+    cache.discard_neighbor(0, edge_id=11)
+    assert cache.get_regional_score(0, 1) == 4.0
+
+    cache.discard_neighbor(0, edge_id=10)
+    assert cache.get_regional_score(0, 1) is None
+    assert cache.invalidations == 1
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+
+from src.kbn import get_k_best_nodes
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph, KBNSubGraph
+from src.structures.node import Node
+
+
+@pytest.fixture
+def csr_graph(random_graph) -> CSRKBNGraph:
+    return CSRKBNGraph(list(random_graph.nodes.values()), max_cost=0.4)
+
+
+def test_views_match_kbn_graph(csr_graph: CSRKBNGraph, random_graph: KBNGraph):
+    assert dict(csr_graph.nodes) == random_graph.nodes
+    assert dict(csr_graph.neighborhood) == random_graph.neighborhood
+    assert dict(csr_graph.edges) == random_graph.edges
+
+
+def test_get_k_best_neighbors(csr_graph: CSRKBNGraph, random_graph: KBNGraph):
+    for node_id in [0, 19, 44]:
+        assert csr_graph.get_k_best_neighbors(
+            node_id, k=5
+        ) == random_graph.get_k_best_neighbors(node_id, k=5)
+        assert csr_graph.get_node_regional_score(
+            node_id, k=5
+        ) == random_graph.get_node_regional_score(node_id, k=5)
+
+
+def test_get_node_with_max_score(csr_graph: CSRKBNGraph, random_graph: KBNGraph):
+    assert csr_graph.get_node_with_max_score() == random_graph.get_node_with_max_score()
+
+
+def test_deactivate_and_reactivate_node(csr_graph: CSRKBNGraph):
+    node_id = 0
+    neighbor_edge_id = csr_graph.neighborhood[node_id][0]
+
+    csr_graph.deactivate_node(node_id)
+
+    assert node_id not in csr_graph.nodes
+    assert node_id in csr_graph.deactivated_nodes
+    assert neighbor_edge_id not in csr_graph.edges
+    assert all(
+        neighbor_edge_id not in edge_ids for edge_ids in csr_graph.neighborhood.values()
+    )
+
+    csr_graph.reactivate_node(node_id)
+
+    assert node_id in csr_graph.nodes
+    assert node_id not in csr_graph.deactivated_nodes
+    assert neighbor_edge_id in csr_graph.edges
+
+
+def test_reactivate_active_node_raises(csr_graph: CSRKBNGraph):
+    with pytest.raises(KeyError):
+        csr_graph.reactivate_node(0)
+
+
+def test_get_k_best_nodes_matches_kbn_graph(
+    csr_graph: CSRKBNGraph, random_graph: KBNGraph
+):
+    csr_nodes = get_k_best_nodes(csr_graph, csr_graph.nodes[0], k=10)
+    kbn_nodes = get_k_best_nodes(random_graph, random_graph.nodes[0], k=10)
+
+    assert csr_nodes == kbn_nodes
+    assert set(csr_graph.deactivated_nodes) == set(random_graph.deactivated_nodes)
+
+
+def test_subgraph_is_a_view_matching_kbn_subgraph(
+    csr_graph: CSRKBNGraph, random_graph: KBNGraph
+):
+    node_ids = [0, 2, 3, 5, 44, 84, 19, 77, 6]
+    view = csr_graph.subgraph(node_ids)
+    subgraph = random_graph.subgraph(node_ids)
+
+    assert isinstance(view, KBNSubGraph)
+    assert view.indices is csr_graph.indices and view.scores is csr_graph.scores
+    assert dict(view.nodes) == subgraph.nodes
+    assert dict(view.edges) == subgraph.edges
+    assert dict(view.neighborhood) == subgraph.neighborhood
+    for node_id in node_ids:
+        assert view.get_k_best_neighbors(node_id, 3) == subgraph.get_k_best_neighbors(
+            node_id, 3
+        )
+    assert get_k_best_nodes(view, view.nodes[0], 4) == get_k_best_nodes(
+        subgraph, subgraph.nodes[0], 4
+    )
+
+
+def test_ranked_neighbors_match_kbn_graph(
+    csr_graph: CSRKBNGraph, random_graph: KBNGraph
+):
+    ranked_entries, _ = csr_graph.ranked_neighbors()
+    for node_id in [0, 19, 44]:
+        i = csr_graph._index[node_id]
+        entries = ranked_entries[csr_graph.indptr[i] : csr_graph.indptr[i + 1]]
+        assert set(csr_graph.edge_ids[entries[:5]].tolist()) == set(
+            random_graph.get_k_best_neighbors(node_id, k=5)
+        )
+
+
+def test_ranked_neighbors_refresh_on_scores_and_max_cost(
+    csr_graph: CSRKBNGraph, random_graph: KBNGraph
+):
+    csr_graph.ranked_neighbors()
+    csr_graph.max_cost = 0.3
+    random_graph.max_cost = 0.3
+    assert csr_graph.get_node_regional_score(
+        44, k=5
+    ) == random_graph.get_node_regional_score(44, k=5)
+
+    nodes = [
+        Node(id=node.id, x=node.x, y=node.y, score=score)
+        for node, score in zip(random_graph.nodes.values(), csr_graph.scores[::-1])
+    ]
+    csr_graph.scores = csr_graph.scores[::-1].copy()
+    reversed_graph = KBNGraph(nodes, max_cost=0.4)
+    reversed_graph.max_cost = 0.3
+    for node_id in [0, 19, 44]:
+        assert csr_graph.get_k_best_neighbors(
+            node_id, k=5
+        ) == reversed_graph.get_k_best_neighbors(node_id, k=5)
+
+
+def test_dict_engine_methods_raise(csr_graph: CSRKBNGraph, random_graph: KBNGraph):
+    node, new_node = csr_graph.nodes[0], Node(id=100, x=0, y=0, score=1)
+    with pytest.raises(NotImplementedError):
+        csr_graph.enable_soft_deactivation()
+    with pytest.raises(NotImplementedError):
+        csr_graph.make_edge(0.1, node, new_node)
+    with pytest.raises(NotImplementedError):
+        csr_graph.register_neighborhood(node, new_node, csr_graph.edges[0])
+
+    assert dict(csr_graph.edges) == random_graph.edges
+
+
+def test_scores_are_read_only(csr_graph: CSRKBNGraph):
+    with pytest.raises(ValueError):
+        csr_graph.scores[0] = 1
+
+
+def test_from_arrays_reuses_ranked_neighbors(csr_graph: CSRKBNGraph):
+    arrays = csr_graph.to_arrays()
+    graph = CSRKBNGraph.from_arrays(arrays, csr_graph.max_cost, csr_graph.distance)
+
+    assert graph.ranked_neighbors()[0] is arrays["ranked_entries"]
+    assert np.array_equal(
+        graph.regional_scores(np.arange(10), 5),
+        csr_graph.regional_scores(np.arange(10), 5),
+    )
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_subgraph_deactivation_does_not_modify_parent(engine, random_graph):
+    graph = engine(list(random_graph.nodes.values()), max_cost=0.4)
+    edges_count = len(graph.edges)
+    subgraph = graph.subgraph([0, 2, 3, 5])
+
+    subgraph.deactivate_node(0)
+    subgraph.reactivate_node(0)
+    subgraph.deactivate_node(2)
+
+    assert 2 not in subgraph.nodes and 2 in subgraph.deactivated_nodes
+    assert 0 in graph.nodes and 2 in graph.nodes
+    assert len(graph.edges) == edges_count
+    assert len(graph.deactivated_nodes) == 0
@@ -50,3 +50,8 @@ def test_hash(mock_euclidian_edge):
     expected_hash = 2644103063924780238
     hash_value = hash(mock_euclidian_edge)
     assert expected_hash == hash_value
+
+
+def test_get_dest_node_of_foreign_node_raises(mock_euclidian_edge):
+    with pytest.raises(KeyError):
+        mock_euclidian_edge.get_dest_node(99)
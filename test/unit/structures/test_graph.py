@@ -1,6 +1,11 @@
 import pytest
 
+from src.kbn import get_k_best_nodes
+from src.random_graph import RandomGraph
+from src.structures.csr_graph import CSRKBNGraph
 from src.structures.graph import KBNGraph, KBNSubGraph
+from src.structures.node import Node
+from src.structures.node_table import NodeTable
 
 
 def test_get_coordinates(random_graph: KBNGraph):
@@ -87,3 +92,294 @@ def test_subgraph_creation(random_graph: KBNGraph):
         ]
     )
     assert all_edges_in_neighborhood_have_their_nodes_in_subgraph
+
+
+@pytest.mark.parametrize("edge_cost_offset", [0.0, 0.1])
+def test_build_edges_with_max_cost_matches_pairwise(random_graph, edge_cost_offset):
+    class PairwiseKBNGraph(KBNGraph):
+        def _find_edges_with_max_cost(self, nodes):
+            return self._find_edges_with_max_cost_pairwise(nodes)
+
+    nodes_list = list(random_graph.nodes.values())
+
+    graph = KBNGraph(nodes_list, max_cost=0.3, edge_cost_offset=edge_cost_offset)
+    pairwise_graph = PairwiseKBNGraph(
+        nodes_list, max_cost=0.3, edge_cost_offset=edge_cost_offset
+    )
+
+    assert graph.neighborhood == pairwise_graph.neighborhood
+    assert list(graph.edges) == list(pairwise_graph.edges)
+    for edge_id, edge in pairwise_graph.edges.items():
+        assert graph.edges[edge_id].nodes == edge.nodes
+        assert graph.edges[edge_id].cost == edge.cost
+
+
+@pytest.mark.parametrize(
+    "distance, max_cost", [("manhattan", 0.3), ("haversine", 20.0)]
+)
+def test_build_edges_with_registered_distances(random_graph, distance, max_cost):
+    class PairwiseKBNGraph(KBNGraph):
+        def _find_edges_with_max_cost(self, nodes):
+            return self._find_edges_with_max_cost_pairwise(nodes)
+
+    nodes_list = list(random_graph.nodes.values())
+
+    graph = KBNGraph(nodes_list, distance=distance, max_cost=max_cost)
+    pairwise_graph = PairwiseKBNGraph(nodes_list, distance=distance, max_cost=max_cost)
+
+    assert graph.edges
+    assert graph.neighborhood == pairwise_graph.neighborhood
+    assert graph.edges == pairwise_graph.edges
+
+
+def test_regional_score_cache_invalidation(random_graph: KBNGraph):
+    node_id = 0
+    neighbors_ids = [
+        random_graph.edges[edge_id].get_dest_node(node_id).id
+        for edge_id in random_graph.neighborhood[node_id]
+    ]
+    for neighbor_id in neighbors_ids:
+        random_graph.get_node_regional_score(neighbor_id, k=3)
+
+    random_graph.deactivate_node(node_id)
+    cached_scores = {
+        neighbor_id: random_graph.get_node_regional_score(neighbor_id, k=2)
+        for neighbor_id in neighbors_ids
+    }
+
+    random_graph.regional_score_cache.clear()
+    assert cached_scores == {
+        neighbor_id: random_graph.get_node_regional_score(neighbor_id, k=2)
+        for neighbor_id in neighbors_ids
+    }
+    assert random_graph.regional_score_cache.hits > 0
+
+
+@pytest.fixture
+def soft_random_graph():
+    return RandomGraph(n=100, max_cost=0.4, random_seed=42, soft_deactivation=True)
+
+
+def test_soft_deactivation_keeps_public_behavior(random_graph, soft_random_graph):
+    for node_id in [0, 44, 84]:
+        random_graph.deactivate_node(node_id)
+        soft_random_graph.deactivate_node(node_id)
+    random_graph.reactivate_node(44)
+    soft_random_graph.reactivate_node(44)
+
+    assert dict(soft_random_graph.nodes) == random_graph.nodes
+    assert dict(soft_random_graph.edges) == random_graph.edges
+    assert set(soft_random_graph.deactivated_nodes) == set(
+        random_graph.deactivated_nodes
+    )
+    for node_id, edges_ids in random_graph.neighborhood.items():
+        assert set(soft_random_graph.neighborhood[node_id]) == set(edges_ids)
+
+
+def test_soft_deactivation_does_not_remove_edges(soft_random_graph):
+    node_id = 0
+    edges_count = len(soft_random_graph._all_edges)
+
+    soft_random_graph.deactivate_node(node_id)
+
+    assert node_id not in soft_random_graph.nodes
+    assert node_id in soft_random_graph.deactivated_nodes
+    assert len(soft_random_graph._all_edges) == edges_count
+    with pytest.raises(KeyError):
+        soft_random_graph.deactivate_node(node_id)
+
+    soft_random_graph.reactivate_node(node_id)
+
+    assert node_id in soft_random_graph.nodes
+    with pytest.raises(KeyError):
+        soft_random_graph.reactivate_node(node_id)
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_get_closest_nodes_ids_skips_deactivated_nodes(engine, random_graph):
+    graph = engine(list(random_graph.nodes.values()), max_cost=0.4)
+    node = graph.nodes[10]
+    points = [[node.x, node.y], [node.x + 1e-6, node.y]]
+    assert graph.get_closest_nodes_ids(points) == [10, 10]
+    spatial_index = graph.spatial_index
+
+    graph.deactivate_node(10)
+    assert 10 not in graph.get_closest_nodes_ids(points)
+
+    graph.reactivate_node(10)
+    assert graph.get_closest_nodes_ids(points) == [10, 10]
+    assert graph.spatial_index is spatial_index
+
+
+def _edges_by_nodes(graph: KBNGraph):
+    return {
+        frozenset(node.id for node in edge.nodes): edge.cost
+        for edge in graph._edges_store.values()
+    }
+
+
+@pytest.mark.parametrize("max_cost", [0.2, None])
+@pytest.mark.parametrize("soft_deactivation", [False, True])
+def test_add_nodes_matches_built_graph(random_graph, max_cost, soft_deactivation):
+    nodes = list(random_graph.nodes.values())
+    built = KBNGraph(nodes, max_cost=max_cost)
+    graph = KBNGraph(nodes[:80], max_cost=max_cost, soft_deactivation=soft_deactivation)
+    graph.get_closest_node(0.5, 0.5)
+    graph.get_neighbors_regional_scores(0, k=5)
+
+    graph.add_nodes(nodes[80:90])
+    graph.add_nodes(nodes[90:])
+
+    assert graph.max_cost == built.max_cost
+    assert dict(graph.edges) == built.edges
+    assert {
+        node_id: list(edges_ids) for node_id, edges_ids in graph.neighborhood.items()
+    } == built.neighborhood
+    for node_id in [0, 85, 99]:
+        assert graph.get_node_regional_score(
+            node_id, k=5
+        ) == built.get_node_regional_score(node_id, k=5)
+    node = nodes[95]
+    assert graph.get_closest_node(node.x, node.y) is node
+
+
+def test_add_nodes_connects_deactivated_nodes(random_graph):
+    nodes = list(random_graph.nodes.values())
+    graph = KBNGraph(nodes[:90], max_cost=0.4)
+    neighbor_id = graph.edges[graph.neighborhood[0][0]].get_dest_node(0).id
+    graph.deactivate_node(0)
+
+    graph.add_nodes(nodes[90:])
+    graph.reactivate_node(0)
+
+    assert dict(graph.edges) == random_graph.edges
+    assert neighbor_id in [
+        graph.edges[edge_id].get_dest_node(0).id for edge_id in graph.neighborhood[0]
+    ]
+
+
+@pytest.mark.parametrize("soft_deactivation", [False, True])
+def test_add_nodes_after_a_chain_matches_built_graph(soft_deactivation):
+    nodes = list(RandomGraph(n=200, max_cost=0.2, random_seed=7).nodes.values())
+    built = KBNGraph(nodes, max_cost=0.2)
+    graph = KBNGraph(nodes[:150], max_cost=0.2, soft_deactivation=soft_deactivation)
+    get_k_best_nodes(graph, graph.get_node_with_max_score(), k=10)
+    assert graph.deactivated_nodes
+
+    graph.add_nodes(nodes[150:])
+    for node_id in list(graph.deactivated_nodes):
+        graph.reactivate_node(node_id)
+
+    assert dict(graph.edges) == built.edges
+    assert {
+        node_id: sorted(edges_ids) for node_id, edges_ids in graph.neighborhood.items()
+    } == {
+        node_id: sorted(edges_ids) for node_id, edges_ids in built.neighborhood.items()
+    }
+
+
+def test_add_nodes_rejects_existing_ids(random_graph):
+    with pytest.raises(ValueError):
+        random_graph.add_nodes([random_graph.nodes[0]])
+    random_graph.deactivate_node(1)
+    with pytest.raises(ValueError):
+        random_graph.add_nodes([Node(id=1, x=0, y=0, score=1)])
+
+
+@pytest.mark.parametrize("max_cost", [0.2, None])
+@pytest.mark.parametrize("soft_deactivation", [False, True])
+def test_remove_nodes_matches_built_graph(random_graph, max_cost, soft_deactivation):
+    nodes = list(random_graph.nodes.values())
+    graph = KBNGraph(nodes, max_cost=max_cost, soft_deactivation=soft_deactivation)
+    removed_ids = [3, 10, 50, 51]
+    kept = [node for node in nodes if node.id not in removed_ids]
+    built = KBNGraph(kept, max_cost=max_cost)
+    graph.get_neighbors_regional_scores(10, k=5)
+    graph.deactivate_node(50)
+    graph.deactivate_node(60)
+
+    graph.remove_nodes(removed_ids)
+    graph.reactivate_node(60)
+
+    assert graph.max_cost == built.max_cost
+    assert set(graph.nodes) == set(built.nodes)
+    assert not graph.deactivated_nodes
+    assert _edges_by_nodes(graph) == _edges_by_nodes(built)
+    for node_id, edges_ids in graph.neighborhood.items():
+        assert all(
+            node_id in [node.id for node in graph.edges[edge_id].nodes]
+            for edge_id in edges_ids
+        )
+    for node_id in [0, 11, 60]:
+        assert graph.get_node_regional_score(
+            node_id, k=5
+        ) == built.get_node_regional_score(node_id, k=5)
+    with pytest.raises(KeyError):
+        graph.remove_nodes([3])
+    with pytest.raises(KeyError):
+        graph.reactivate_node(50)
+
+
+def test_add_removed_nodes_again(random_graph):
+    nodes = list(random_graph.nodes.values())
+    table = NodeTable(
+        x=[node.x for node in nodes],
+        y=[node.y for node in nodes],
+        scores=[node.score for node in nodes],
+    )
+    graph = KBNGraph(table, max_cost=0.4)
+    node = graph.nodes[5]
+    graph.get_closest_node(node.x, node.y)
+
+    graph.remove_nodes([5])
+    moved = Node(id=5, x=node.x + 0.3, y=node.y, score=node.score)
+    graph.add_nodes([moved])
+
+    assert graph.get_closest_node(moved.x, moved.y) is moved
+    assert graph.get_closest_node(node.x, node.y) is not moved
+    assert _edges_by_nodes(graph) == _edges_by_nodes(
+        KBNGraph([graph.nodes[node_id] for node_id in graph.nodes], max_cost=0.4)
+    )
+
+
+def test_csr_graph_can_not_add_nodes(random_graph):
+    graph = CSRKBNGraph(list(random_graph.nodes.values()), max_cost=0.4)
+    with pytest.raises(NotImplementedError):
+        graph.add_nodes([Node(id=100, x=0, y=0, score=1)])
+
+
+@pytest.mark.parametrize("distance", ["euclidian", "haversine"])
+def test_nearest_neighbors_graph(random_graph, distance):
+    nodes = list(random_graph.nodes.values())
+    complete = KBNGraph(nodes, distance=distance)
+
+    graph = KBNGraph(nodes, distance=distance, n_neighbors=5)
+
+    assert all(len(edges_ids) >= 5 for edges_ids in graph.neighborhood.values())
+    assert len(graph.edges) <= 5 * len(nodes)
+    edges = _edges_by_nodes(graph)
+    complete_edges = _edges_by_nodes(complete)
+    assert all(complete_edges[pair] == cost for pair, cost in edges.items())
+    assert graph.max_cost == max(edges.values())
+    for node_id, edges_ids in graph.neighborhood.items():
+        nearest_cost = sorted(
+            complete.edges[edge_id].cost for edge_id in complete.neighborhood[node_id]
+        )[4]
+        assert max(graph.edges[edge_id].cost for edge_id in edges_ids) >= nearest_cost
+        assert (
+            sum(graph.edges[edge_id].cost <= nearest_cost for edge_id in edges_ids) == 5
+        )
+
+    csr_graph = CSRKBNGraph(nodes, distance=distance, n_neighbors=5)
+    assert dict(csr_graph.edges) == graph.edges
+    assert csr_graph.max_cost == graph.max_cost
+
+
+def test_nearest_neighbors_graph_requires_no_max_cost(random_graph):
+    nodes = list(random_graph.nodes.values())
+    with pytest.raises(ValueError):
+        KBNGraph(nodes, max_cost=0.4, n_neighbors=5)
+    with pytest.raises(ValueError):
+        KBNGraph(nodes, n_neighbors=0)
+    with pytest.raises(NotImplementedError):
+        KBNGraph(nodes[:90], n_neighbors=5).add_nodes(nodes[90:])
@@ -1,3 +1,11 @@
+import copy
+import pickle
+
+import pytest
+
+from src.structures.node import Node
+
+
 def test_hash(mock_node_pair):
     # Given
     node = mock_node_pair[0]
@@ -6,3 +14,29 @@ def test_hash(mock_node_pair):
     hash_value = hash(node)
     # Then
     assert expected_hash == hash_value
+
+
+def test_properties_are_attributes():
+    node = Node(id=0, x=0, y=1, score=2, properties={"cat": "A"})
+
+    assert node.cat == "A"
+    with pytest.raises(AttributeError):
+        node.unknown
+
+
+def test_equality_and_hash_ignore_identity():
+    node = Node(id=0, x=0, y=1, score=2, properties={"cat": "A"})
+    same_node = Node(id=0, x=0, y=1, score=2, properties={"cat": "A"})
+    other_node = Node(id=0, x=0, y=1, score=2, properties={"cat": "B"})
+
+    assert node == same_node and hash(node) == hash(same_node)
+    assert node != other_node
+    assert node != (0, 0, 1, 2, {"cat": "A"})
+
+
+def test_copy_and_pickle():
+    node = Node(id=0, x=0, y=1, score=2, properties={"cat": "A"})
+
+    assert pickle.loads(pickle.dumps(node)) == node
+    assert copy.deepcopy(node) == node
+    assert not hasattr(node, "__dict__")
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.kbn import get_groups_of_k_best_nodes_from_max_score
+from src.random_graph import RandomGraph
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.node import Node
+from src.structures.node_table import NodeTable, NodeTableMapping
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "score": [0, 1, 2, 3],
+            "x": [10.0, 5.0, 0.0, 1.0],
+            "y": [5.0, 10.0, 0.0, 1.0],
+            "prop": ["foo", "foo", "bar", "bar"],
+        },
+        index=[10, 11, 12, 13],
+    )
+
+
+@pytest.fixture
+def table_and_nodes():
+    nodes_list = RandomGraph(n=2, random_seed=42).gen_rand_node(n=150)
+    table = NodeTable(
+        x=[node.x for node in nodes_list],
+        y=[node.y for node in nodes_list],
+        scores=[node.score for node in nodes_list],
+        ids=[node.id for node in nodes_list],
+        properties={
+            name: [node.properties[name] for node in nodes_list]
+            for name in nodes_list[0].properties
+        },
+    )
+    return table, nodes_list
+
+
+def test_from_pandas_creates_nodes_lazily(df):
+    table = NodeTable.from_pandas(
+        df, score_col="score", x_col="x", y_col="y", properties_cols=["prop"]
+    )
+
+    assert len(table) == 4
+    assert table.materialized_count() == 0
+    node = table[2]
+    assert node == Node(id=12, x=0.0, y=0.0, score=2, properties={"prop": "bar"})
+    assert isinstance(node.id, int) and node.prop == "bar"
+    assert table[2] is node
+    assert table.materialized_count() == 1
+    assert table.index_of(13) == 3
+
+
+def test_columns_must_have_same_length():
+    with pytest.raises(ValueError):
+        NodeTable(x=[0, 1], y=[0], scores=[1, 2])
+
+
+def test_from_parquet(df, tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "nodes.parquet"
+    df.reset_index(names="id").to_parquet(path)
+
+    table = NodeTable.from_parquet(
+        path, score_col="score", x_col="x", y_col="y", id_col="id"
+    )
+
+    assert table.ids.tolist() == [10, 11, 12, 13]
+    np.testing.assert_array_equal(table.scores, df["score"].to_numpy())
+
+
+def test_mapping_keeps_dict_order(table_and_nodes):
+    table, nodes_list = table_and_nodes
+    mapping = NodeTableMapping(table)
+    expected = {node.id: node for node in nodes_list}
+
+    for container in [mapping, expected]:
+        node = container[3]
+        del container[3]
+        del container[7]
+        container[3] = node
+
+    assert list(mapping) == list(expected)
+    assert len(mapping) == len(expected)
+    assert 7 not in mapping and 3 in mapping
+    with pytest.raises(KeyError):
+        mapping[7]
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_graph_from_table_matches_graph_from_nodes(engine, table_and_nodes):
+    table, nodes_list = table_and_nodes
+    table_graph = engine(table, max_cost=0.2)
+    nodes_graph = engine(nodes_list, max_cost=0.2)
+
+    assert table_graph.edges == nodes_graph.edges
+    table_groups = get_groups_of_k_best_nodes_from_max_score(table_graph, 12, 3)
+    nodes_groups = get_groups_of_k_best_nodes_from_max_score(nodes_graph, 12, 3)
+    assert table_groups == nodes_groups
+
+
+def test_csr_graph_does_not_create_nodes(table_and_nodes):
+    table, _ = table_and_nodes
+    graph = CSRKBNGraph(table, max_cost=0.2)
+    graph.get_k_best_neighbors(0, 5)
+
+    assert table.materialized_count() == 0
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.kbn import get_k_best_nodes
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.structures.persistence import load_graph, save_graph
+
+
+@pytest.fixture
+def csr_graph(random_graph) -> CSRKBNGraph:
+    return CSRKBNGraph(list(random_graph.nodes.values()), max_cost=0.4)
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_save_and_load_graph(engine, random_graph, tmp_path):
+    graph = engine(list(random_graph.nodes.values()), max_cost=0.4)
+    save_graph(graph, tmp_path)
+    loaded_graph = load_graph(tmp_path)
+
+    assert isinstance(loaded_graph, CSRKBNGraph)
+    assert loaded_graph.max_cost == 0.4
+    assert dict(loaded_graph.nodes) == random_graph.nodes
+    assert dict(loaded_graph.edges) == random_graph.edges
+    assert get_k_best_nodes(loaded_graph, loaded_graph.nodes[0], k=5) == (
+        get_k_best_nodes(random_graph, random_graph.nodes[0], k=5)
+    )
+
+
+def test_save_and_load_nearest_neighbors_graph(random_graph, tmp_path):
+    nodes = list(random_graph.nodes.values())
+    graph = KBNGraph(nodes, n_neighbors=5)
+    save_graph(graph, tmp_path)
+    loaded_graph = load_graph(tmp_path)
+
+    assert loaded_graph.n_neighbors == 5
+    assert loaded_graph.max_cost == graph.max_cost
+    assert dict(loaded_graph.edges) == graph.edges
+    assert get_k_best_nodes(loaded_graph, loaded_graph.nodes[0], k=5) == (
+        get_k_best_nodes(graph, graph.nodes[0], k=5)
+    )
+
+
+def test_loaded_arrays_are_memory_mapped(csr_graph, tmp_path):
+    save_graph(csr_graph, tmp_path)
+    loaded_graph = load_graph(tmp_path)
+
+    assert isinstance(loaded_graph.indices, np.memmap)
+    assert not loaded_graph.costs.flags.writeable
+    assert isinstance(load_graph(tmp_path, mmap=False).indices, np.ndarray)
+    assert not isinstance(load_graph(tmp_path, mmap=False).indices, np.memmap)
+
+
+def test_deactivations_are_not_saved_in_the_files(csr_graph, tmp_path):
+    save_graph(csr_graph, tmp_path)
+    loaded_graph = load_graph(tmp_path)
+    loaded_graph.deactivate_node(0)
+
+    assert 0 not in loaded_graph.nodes
+    assert 0 in load_graph(tmp_path).nodes
+
+
+def test_load_unsupported_format_version_raises(csr_graph, tmp_path):
+    save_graph(csr_graph, tmp_path)
+    metadata = json.loads((tmp_path / "graph.json").read_text())
+    metadata["format_version"] += 1
+    (tmp_path / "graph.json").write_text(json.dumps(metadata))
+
+    with pytest.raises(ValueError):
+        load_graph(tmp_path)
@@ -0,0 +1,56 @@
+from benchmarks.suite import compare
+
+
+def _result(case, time_s=1.0, peak_memory_mb=10.0, error=None):
+    result = {"case": case, "n": 500, "max_cost": 0.1, "with_properties": False}
+    if error is not None:
+        result["error"] = error
+    else:
+        result.update(time_s=time_s, peak_memory_mb=peak_memory_mb)
+    return result
+
+
+def test_compare_flags_regressions():
+    baseline = [
+        _result("slower"),
+        _result("more_memory"),
+        _result("failing"),
+        _result("unchanged"),
+        _result("noise", time_s=0.001, peak_memory_mb=0.1),
+    ]
+    results = [
+        _result("slower", time_s=1.5),
+        _result("more_memory", peak_memory_mb=20.0),
+        _result("failing", error="ValueError"),
+        _result("unchanged", time_s=1.1, peak_memory_mb=10.5),
+        # Relative regressions under the minimal absolute deltas
+        _result("noise", time_s=0.004, peak_memory_mb=0.5),
+    ]
+
+    regressions = compare(baseline, results)
+
+    assert len(regressions) == 3
+    assert "slower" in regressions[0] and "time_s" in regressions[0]
+    assert "more_memory" in regressions[1] and "peak_memory_mb" in regressions[1]
+    assert "failing" in regressions[2] and "fails with ValueError" in regressions[2]
+
+
+def test_compare_minimal_deltas():
+    baseline = [_result("noise", time_s=0.001, peak_memory_mb=0.1)]
+    results = [_result("noise", time_s=0.004, peak_memory_mb=0.5)]
+
+    regressions = compare(baseline, results, min_time_delta=0.0, min_memory_delta=0.0)
+
+    assert len(regressions) == 2
+    assert "time_s 0.0010 -> 0.0040" in regressions[0]
+    assert "peak_memory_mb 0.1000 -> 0.5000" in regressions[1]
+
+
+def test_compare_flags_missing_cases():
+    baseline = [_result("kept"), _result("renamed")]
+    results = [_result("kept"), _result("new_name")]
+
+    regressions = compare(baseline, results)
+
+    assert len(regressions) == 1
+    assert "renamed" in regressions[0] and "missing" in regressions[0]
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+from benchmarks.import_time import CORE_MODULES, HEAVY_MODULES
+
+
+def test_core_modules_do_not_import_heavy_dependencies():
+    code = "import sys\n"
+    code += "".join(f"import {module}\n" for module in CORE_MODULES)
+    code += f"print(','.join(m for m in {HEAVY_MODULES} if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == ""
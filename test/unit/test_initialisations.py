@@ -2,7 +2,11 @@ import math
 
 import numpy as np
 
-from src.initialisations import from_closest_node, from_node_with_max_score
+from src.initialisations import (
+    from_closest_node,
+    from_closest_nodes,
+    from_node_with_max_score,
+)
 
 
 def test_from_node_with_max_score(random_graph):
@@ -20,10 +24,18 @@ def test_from_closest_node(random_graph):
     min_id = ids[
         np.argmin(
             [
-                math.sqrt(node.x ** 2 + node.y ** 2)
+                math.sqrt(node.x**2 + node.y**2)
                 for node in random_graph.nodes.values()
             ]
         )
     ]
 
     assert closed_node.id == min_id
+
+
+def test_from_closest_nodes(random_graph):
+    points = np.array([[0, 0], [1, 1], [0.5, 0.5]])
+
+    closest_nodes = from_closest_nodes(random_graph, points)
+
+    assert closest_nodes == [from_closest_node(random_graph, x, y) for x, y in points]
@@ -1,6 +1,17 @@
-from src.kbn import (find_next_best_neighbors, get_k_best_nodes,
-                     get_neighboor_with_max_regional_score)
-from src.structures.graph import Node
+import pytest
+
+from src.contraints.categorical_ratio import FlexibleCategoricalRatioConstraint
+from src.kbn import (
+    find_next_best_neighbors,
+    find_next_best_neighbors_beam,
+    get_groups_of_k_best_nodes_from_max_score,
+    get_k_best_nodes,
+    get_neighboor_with_max_regional_score,
+    score_neighbors,
+)
+from src.random_graph import RandomGraph
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph, Node
 
 
 def test_get_k_best_nodes(random_graph):
@@ -30,12 +41,149 @@ def test_find_next_best_neighbors(random_graph):
     assert final_selected_nodes[-1] == added_node
 
 
-def test_get_neighboor_with_max_regional_score(random_graph):
+def test_get_neighboor_with_max_regional_score():
+    # Node 0 only reaches nodes 1 and 2, whose regional scores are (10 + 0) / 2 and (20 + 0) / 2
+    graph = KBNGraph(
+        [
+            Node(id=0, x=0, y=0, score=0),
+            Node(id=1, x=1, y=0, score=10),
+            Node(id=2, x=-1, y=0, score=20),
+        ],
+        max_cost=1.5,
+    )
+
+    best_neighbor = get_neighboor_with_max_regional_score(
+        graph, node_id=0, excluded_node_ids_list=[], amount_of_neighbors_to_compare=1
+    )
+    assert best_neighbor.id == 2
+
     best_neighbor = get_neighboor_with_max_regional_score(
-        random_graph,
-        node_id=0,
-        excluded_node_ids_list=[],
-        amount_of_neighbors_to_compare=3,
+        graph, node_id=0, excluded_node_ids_list=[2], amount_of_neighbors_to_compare=1
+    )
+    assert best_neighbor.id == 1
+
+
+def test_get_groups_of_k_best_nodes_from_max_score(random_graph):
+    groups = get_groups_of_k_best_nodes_from_max_score(
+        random_graph, total_k=10, n_groups=3
+    )
+
+    assert [len(group) for group in groups] == [4, 3, 3]
+    selected_ids = [node.id for group in groups for node in group]
+    assert len(set(selected_ids)) == len(selected_ids)
+
+
+def _node_ids(nodes):
+    return [node.id for node in nodes]
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+@pytest.mark.parametrize("with_constraint", [False, True])
+def test_beam_width_1_matches_greedy_search(engine, with_constraint):
+    def graph_and_constraints():
+        graph = RandomGraph(n=100, max_cost=0.4, with_properties=True, random_seed=7)
+        if engine is CSRKBNGraph:
+            graph = CSRKBNGraph(list(graph.nodes.values()), max_cost=0.4)
+        constraints = (
+            [
+                FlexibleCategoricalRatioConstraint(
+                    "cat", {"A": 0.7, "B": 0.2, "C": 0.1}, graph, 5
+                )
+            ]
+            if with_constraint
+            else []
+        )
+        return graph, constraints
+
+    greedy_graph, greedy_constraints = graph_and_constraints()
+    beam_graph, beam_constraints = graph_and_constraints()
+
+    greedy_groups = get_groups_of_k_best_nodes_from_max_score(
+        greedy_graph, total_k=12, n_groups=3, constraints=greedy_constraints
+    )
+    beam_groups = get_groups_of_k_best_nodes_from_max_score(
+        beam_graph,
+        total_k=12,
+        n_groups=3,
+        constraints=beam_constraints,
+        beam_width=1,
+    )
+
+    assert [_node_ids(group) for group in beam_groups] == [
+        _node_ids(group) for group in greedy_groups
+    ]
+
+
+def test_beam_search_does_not_modify_graph_nor_constraints(random_graph):
+    constraint = FlexibleCategoricalRatioConstraint(
+        "cat", {"A": 0.7, "B": 0.2, "C": 0.1}, random_graph, 5
+    )
+    nodes_count = len(random_graph.nodes)
+
+    chain = find_next_best_neighbors_beam(
+        random_graph, [random_graph.nodes[0]], 4, [constraint], beam_width=3
+    )
+
+    assert len(chain) == 5
+    assert len(set(_node_ids(chain))) == 5
+    assert len(random_graph.nodes) == nodes_count
+    assert len(random_graph.deactivated_nodes) == 0
+    assert all(count == 0 for count in constraint.category_counts.values())
+
+
+def _chain_score(graph, chain):
+    """Sum of the step scores of a chain, as ranked by the beam search"""
+    total, visited = 0.0, set()
+    for position in range(1, len(chain)):
+        previous_node, node = chain[position - 1], chain[position]
+        neighbors_ids, scores = score_neighbors(
+            graph, previous_node.id, len(chain) - position, excluded_node_ids=visited
+        )
+        total += scores[neighbors_ids.index(node.id)]
+        visited.add(previous_node.id)
+    return total
+
+
+def test_wider_beam_finds_better_chain():
+    # Greedy picks node 1, the best next step, and ends in the low scores of node 4.
+    # Node 2 is worse at first but leads to node 3.
+    nodes = [
+        Node(id=0, x=0, y=0, score=0),
+        Node(id=1, x=-1, y=0, score=40),
+        Node(id=2, x=1, y=0, score=1),
+        Node(id=3, x=2, y=0, score=100),
+        Node(id=4, x=-2, y=0, score=1),
+    ]
+    graph = KBNGraph(nodes, max_cost=1.5)
+
+    narrow_chain = find_next_best_neighbors_beam(graph, [nodes[0]], 2, beam_width=1)
+    wide_chain = find_next_best_neighbors_beam(graph, [nodes[0]], 2, beam_width=2)
+
+    assert _node_ids(narrow_chain) == [0, 1, 4]
+    assert _node_ids(wide_chain) == [0, 2, 3]
+    assert _chain_score(graph, wide_chain) > _chain_score(graph, narrow_chain)
+
+
+def test_beam_search_long_chain():
+    graph = RandomGraph(n=1500, max_cost=0.1, random_seed=0)
+    chain = get_k_best_nodes(
+        graph, graph.get_node_with_max_score(), k=1100, beam_width=1
     )
 
-    assert best_neighbor.id == 44
+    assert len(set(_node_ids(chain))) == len(chain) > 1
+
+
+def test_beam_width_must_be_positive(random_graph):
+    with pytest.raises(ValueError):
+        find_next_best_neighbors_beam(
+            random_graph, [random_graph.nodes[0]], 2, beam_width=0
+        )
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_get_k_best_nodes_on_nearest_neighbors_graph(random_graph, engine):
+    graph = engine(list(random_graph.nodes.values()), n_neighbors=8)
+
+    chain = get_k_best_nodes(graph, graph.get_node_with_max_score(), k=5)
+
+    assert len(set(_node_ids(chain))) == len(chain) == 5
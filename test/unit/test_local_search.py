@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from src.kbn import get_groups_of_k_best_nodes_from_max_score, get_k_best_nodes
+from src.local_search import chain_cost, improve_chain, improve_chains
+from src.random_graph import RandomGraph
+from src.structures.graph import Node
+
+
+def _random_chain(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [
+        Node(id=i, x=x, y=y, score=1)
+        for i, (x, y) in enumerate(rng.random((n, 2)).tolist())
+    ]
+
+
+def test_chain_cost(random_graph):
+    nodes = [Node(id=i, x=x, y=0, score=1) for i, x in enumerate([0, 3, 1])]
+
+    assert chain_cost(random_graph, nodes) == 5
+    assert chain_cost(random_graph, nodes[:1]) == 0
+
+
+def test_improve_chain_uncrosses_chain(random_graph):
+    coordinates = [(0, 0), (1, 1), (1, 0), (0, 1)]
+    nodes = [Node(id=i, x=x, y=y, score=1) for i, (x, y) in enumerate(coordinates)]
+
+    improved_nodes, cost = improve_chain(random_graph, nodes)
+
+    assert improved_nodes[0] is nodes[0]
+    assert cost == pytest.approx(3)
+
+
+@pytest.mark.parametrize("distance", ["euclidian", "haversine"])
+@pytest.mark.parametrize("fixed_start", [True, False])
+def test_improve_chain_reorders_chain(distance, fixed_start):
+    graph = RandomGraph(n=10, max_cost=0.4, distance=distance, random_seed=0)
+    nodes = _random_chain(40)
+
+    improved_nodes, cost = improve_chain(graph, nodes, fixed_start=fixed_start)
+
+    assert sorted(node.id for node in improved_nodes) == list(range(40))
+    assert cost == pytest.approx(chain_cost(graph, improved_nodes))
+    assert cost < chain_cost(graph, nodes) / 2
+    if fixed_start:
+        assert improved_nodes[0] is nodes[0]
+
+
+def test_improve_chain_without_fixed_start_is_not_worse(random_graph):
+    nodes = _random_chain(20, seed=1)
+
+    _, cost = improve_chain(random_graph, nodes)
+    _, free_cost = improve_chain(random_graph, nodes, fixed_start=False)
+
+    assert free_cost <= cost + 1e-9
+
+
+def test_improve_short_chains(random_graph):
+    nodes = _random_chain(2)
+
+    assert improve_chains(random_graph, [nodes, nodes[:1], []]) == [
+        (nodes, chain_cost(random_graph, nodes)),
+        (nodes[:1], 0),
+        ([], 0),
+    ]
+
+
+def test_get_k_best_nodes_with_local_search():
+    graph = RandomGraph(n=500, max_cost=0.3, random_seed=0)
+    other_graph = RandomGraph(n=500, max_cost=0.3, random_seed=0)
+    first_node = graph.get_node_with_max_score()
+
+    chain = get_k_best_nodes(graph, first_node, k=15)
+    improved_chain = get_k_best_nodes(
+        other_graph, other_graph.nodes[first_node.id], k=15, local_search=True
+    )
+
+    assert improved_chain[0].id == first_node.id
+    assert {node.id for node in improved_chain} == {node.id for node in chain}
+    assert chain_cost(graph, improved_chain) <= chain_cost(graph, chain)
+
+
+def test_get_groups_with_local_search():
+    graph = RandomGraph(n=500, max_cost=0.3, random_seed=0)
+    other_graph = RandomGraph(n=500, max_cost=0.3, random_seed=0)
+
+    groups = get_groups_of_k_best_nodes_from_max_score(graph, total_k=20, n_groups=2)
+    improved_groups = get_groups_of_k_best_nodes_from_max_score(
+        other_graph, total_k=20, n_groups=2, local_search=True
+    )
+
+    for group, improved_group in zip(groups, improved_groups):
+        assert improved_group[0].id == group[0].id
+        assert {node.id for node in improved_group} == {node.id for node in group}
+        assert chain_cost(graph, improved_group) <= chain_cost(graph, group)
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from src.parallel import (
+    SharedCSRGraph,
+    attach_shared_graph,
+    get_groups_of_k_best_nodes_parallel,
+)
+from src.random_graph import RandomGraph
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+
+
+def _node_ids(groups):
+    return [[node.id for node in group] for group in groups]
+
+
+def test_shared_graph_matches_graph(random_graph):
+    csr_graph = CSRKBNGraph(list(random_graph.nodes.values()), max_cost=0.4)
+    with SharedCSRGraph(csr_graph) as shared_graph:
+        attached_graph, blocks = attach_shared_graph(
+            shared_graph.spec, shared_graph.max_cost, shared_graph.distance
+        )
+        attached_arrays = attached_graph.to_arrays()
+        assert attached_arrays.keys() == csr_graph.to_arrays().keys()
+        for name, array in csr_graph.to_arrays().items():
+            np.testing.assert_array_equal(attached_arrays[name], array)
+        assert attached_graph.get_k_best_neighbors(
+            0, 5
+        ) == csr_graph.get_k_best_neighbors(0, 5)
+
+        # The active mask is shared
+        shared_graph.graph.deactivate_node(44)
+        assert 44 not in attached_graph.nodes
+
+        del attached_graph
+        for block in blocks:
+            block.close()
+
+
+def test_get_groups_of_k_best_nodes_parallel():
+    graph = RandomGraph(n=300, max_cost=0.2, random_seed=1)
+    groups = get_groups_of_k_best_nodes_parallel(
+        graph, total_k=14, n_groups=3, n_workers=2
+    )
+
+    assert [len(group) for group in groups] == [5, 5, 4]
+    selected_ids = [node_id for group in _node_ids(groups) for node_id in group]
+    assert len(set(selected_ids)) == len(selected_ids)
+    assert not any(node_id in graph.nodes for node_id in selected_ids)
+
+
+def test_parallel_groups_do_not_depend_on_workers():
+    def groups(n_workers):
+        graph = RandomGraph(n=300, max_cost=0.2, random_seed=5)
+        return _node_ids(
+            get_groups_of_k_best_nodes_parallel(
+                graph, total_k=20, n_groups=4, n_workers=n_workers
+            )
+        )
+
+    assert groups(1) == groups(2) == groups(3)
+
+
+@pytest.mark.parametrize(
+    "graph_kwargs",
+    [{"max_cost": 0.2, "edge_cost_offset": 0.15}, {"n_neighbors": 6}],
+)
+def test_parallel_groups_keep_the_graph_edges(graph_kwargs):
+    nodes = list(RandomGraph(n=300, max_cost=0.2, random_seed=2).nodes.values())
+
+    def groups(engine):
+        return _node_ids(
+            get_groups_of_k_best_nodes_parallel(
+                engine(nodes, **graph_kwargs), total_k=12, n_groups=3, n_workers=2
+            )
+        )
+
+    assert groups(KBNGraph) == groups(CSRKBNGraph)
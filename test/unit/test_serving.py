@@ -0,0 +1,91 @@
+import pytest
+
+from src.contraints.categorical_ratio import FlexibleCategoricalRatioConstraint
+from src.kbn import get_k_best_nodes
+from src.random_graph import RandomGraph
+from src.serving import Query, QueryServer, solve_query
+from src.structures.csr_graph import CSRKBNGraph
+from src.structures.graph import KBNGraph
+from src.utils.profiling import SOLVE, recording
+
+
+def _node_ids(nodes):
+    return [node.id for node in nodes]
+
+
+@pytest.fixture
+def graph_nodes():
+    return list(RandomGraph(n=300, max_cost=0.2, random_seed=1).nodes.values())
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_solve_query_matches_get_k_best_nodes(engine, graph_nodes):
+    graph = engine(graph_nodes, max_cost=0.2)
+
+    chain = solve_query(graph, Query(first_node_id=7, k=8))
+
+    expected = get_k_best_nodes(engine(graph_nodes, max_cost=0.2), graph.nodes[7], k=8)
+    assert _node_ids(chain) == _node_ids(expected)
+    assert len(graph.nodes) == len(graph_nodes)
+    assert not graph.deactivated_nodes
+
+
+@pytest.mark.parametrize("engine", [KBNGraph, CSRKBNGraph])
+def test_query_server_matches_sequential_queries(engine, graph_nodes):
+    graph = engine(graph_nodes, max_cost=0.2)
+    constraint = FlexibleCategoricalRatioConstraint(
+        "cat", {"A": 0.7, "B": 0.2, "C": 0.1}, graph, k=6
+    )
+    queries = [
+        Query(
+            first_node_id=node_id, k=6, constraints=[constraint] if node_id % 2 else []
+        )
+        for node_id in range(0, 300, 5)
+    ]
+    expected = [_node_ids(solve_query(graph, query)) for query in queries]
+
+    with recording() as profiler:
+        with QueryServer(graph, max_workers=4) as server:
+            chains = server.map(queries)
+            future_chain = server.submit(queries[3]).result()
+
+    assert [_node_ids(chain) for chain in chains] == expected
+    assert _node_ids(future_chain) == expected[3]
+    assert profiler.stages[SOLVE].calls == len(queries) + 1
+    assert len(graph.nodes) == len(graph_nodes)
+    assert constraint.category_counts == {"A": 0, "B": 0, "C": 0}
+
+
+def test_query_server_with_local_search(graph_nodes):
+    graph = CSRKBNGraph(graph_nodes, max_cost=0.2)
+    query = Query(first_node_id=7, k=8, beam_width=2, local_search=True)
+
+    with QueryServer(graph, max_workers=2) as server:
+        (chain,) = server.map([query])
+
+    assert chain[0].id == 7
+    assert set(_node_ids(chain)) == set(
+        _node_ids(solve_query(graph, Query(first_node_id=7, k=8, beam_width=2)))
+    )
+
+
+def test_query_server_shares_the_kbn_graph_cache(graph_nodes):
+    graph = KBNGraph(graph_nodes, max_cost=0.2)
+    queries = [Query(first_node_id=node_id, k=6) for node_id in range(0, 300, 3)]
+    expected = [_node_ids(solve_query(graph, query)) for query in queries]
+    # Every lookup of the same queries now hits the cache
+    warm_stats = graph.regional_score_cache.stats()
+    for query in queries:
+        solve_query(graph, query)
+    lookups = graph.regional_score_cache.stats()["hits"] - warm_stats["hits"]
+
+    # Concurrent queries on a cold cache may compute the same entry twice
+    cold_graph = KBNGraph(graph_nodes, max_cost=0.2)
+    with QueryServer(cold_graph, max_workers=4) as server:
+        assert [_node_ids(chain) for chain in server.map(queries)] == expected
+        cold_stats = cold_graph.regional_score_cache.stats()
+        assert [_node_ids(chain) for chain in server.map(queries)] == expected
+
+    stats = cold_graph.regional_score_cache.stats()
+    assert stats["misses"] == cold_stats["misses"]
+    assert stats["hits"] - cold_stats["hits"] == lookups
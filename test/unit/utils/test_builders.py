@@ -2,7 +2,7 @@ import pandas as pd
 import pytest
 
 from src.structures.node import Node
-from src.utils.builders import build_nodes_from_pandas
+from src.utils.builders import build_node_table_from_pandas, build_nodes_from_pandas
 
 
 def test_build_nodes_from_pandas():
@@ -20,3 +20,13 @@ def test_build_nodes_from_pandas():
 
     assert len(nodes_list) == 3
     assert all([isinstance(item, Node) for item in nodes_list])
+
+
+def test_build_node_table_from_pandas():
+    df = pd.DataFrame({"score": [0, 1], "x": [10, 5], "y": [5, 10], "id": [7, 8]})
+    table = build_node_table_from_pandas(
+        df, x_col="x", y_col="y", score_col="score", id_col="id"
+    )
+
+    assert table.ids.tolist() == [7, 8]
+    assert table[1] == Node(id=8, x=5, y=10, score=1)
@@ -0,0 +1,58 @@
+import json
+
+from src.contraints.categorical_ratio import FlexibleCategoricalRatioConstraint
+from src.kbn import get_groups_of_k_best_nodes_from_max_score, get_k_best_nodes
+from src.random_graph import RandomGraph
+from src.utils.profiling import CallbackRecorder, Profiler, get_recorder, recording
+
+
+def test_recording_profiles_a_solve(tmp_path):
+    with recording() as profiler:
+        graph = RandomGraph(n=100, max_cost=0.4, random_seed=42)
+        constraint = FlexibleCategoricalRatioConstraint(
+            "cat", {"A": 0.5, "B": 0.3, "C": 0.2}, graph, 10
+        )
+        get_groups_of_k_best_nodes_from_max_score(
+            graph, total_k=10, n_groups=2, constraints=[constraint]
+        )
+
+    profile = json.loads(profiler.to_json(tmp_path / "profile.json"))
+    assert profile == json.loads((tmp_path / "profile.json").read_text())
+    assert set(profile["stages"]) == {
+        "edge_build",
+        "regional_scores",
+        "constraint_penalties",
+        "deactivation",
+        "solve",
+    }
+    assert profile["stages"]["solve"]["calls"] == 1
+    assert profile["stages"]["deactivation"]["calls"] == 10
+    assert profile["counters"]["edges"] == len(graph.edges) + sum(
+        len(edges) for _, edges in graph.deactivated_nodes.values()
+    )
+    assert profile["counters"]["regional_score_evaluations"] > 0
+
+
+def test_nothing_is_recorded_outside_recording(random_graph):
+    profiler = Profiler()
+    with recording(profiler):
+        assert get_recorder() is profiler
+    get_k_best_nodes(random_graph, random_graph.nodes[0], k=5)
+
+    assert get_recorder() is None
+    assert profiler.to_dict() == {"stages": {}, "counters": {}}
+
+
+def test_callback_recorder(random_graph):
+    measures = []
+    with recording(CallbackRecorder(lambda *measure: measures.append(measure))):
+        get_k_best_nodes(random_graph, random_graph.nodes[0], k=3)
+
+    assert any(
+        kind == "count" and name == "regional_score_evaluations"
+        for kind, name, _ in measures
+    )
+    assert [name for kind, name, _ in measures if kind == "time"].count(
+        "deactivation"
+    ) == 3
+    assert measures[-1][:2] == ("time", "solve")